@@ -0,0 +1,38 @@
+"""listing favorite_count
+
+Revision ID: 1a8013b0edba
+Revises: c4958e6c3d58
+Create Date: 2025-09-17 10:21:45.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1a8013b0edba'
+down_revision: Union[str, None] = 'c4958e6c3d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('listings', sa.Column('favorite_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        """
+        UPDATE listings l SET favorite_count = f.n
+        FROM (SELECT listing_id, count(*) AS n FROM favorites GROUP BY listing_id) f
+        WHERE f.listing_id = l.id
+        """
+    )
+    # sort_by=popularity, with and without a category filter
+    op.create_index('ix_listings_favorite_count', 'listings', ['favorite_count', 'id'], unique=False)
+    op.create_index('ix_listings_category_favorite_count', 'listings', ['category', 'favorite_count', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_listings_category_favorite_count', table_name='listings')
+    op.drop_index('ix_listings_favorite_count', table_name='listings')
+    op.drop_column('listings', 'favorite_count')
@@ -0,0 +1,62 @@
+"""conversation inbox
+
+Revision ID: 1bbb7266b051
+Revises: 721f93259a56
+Create Date: 2025-09-12 14:02:51.388120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1bbb7266b051'
+down_revision: Union[str, None] = '721f93259a56'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'conversations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('peer_id', sa.Integer(), nullable=False),
+        sa.Column('listing_id', sa.Integer(), nullable=False),
+        sa.Column('room_id', sa.String(length=64), nullable=False),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_message', sa.String(length=255), nullable=True),
+        sa.Column('last_message_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['listing_id'], ['listings.id'], ),
+        sa.ForeignKeyConstraint(['peer_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'room_id', name='uq_conversation_user_room'),
+    )
+    op.create_index('ix_conversations_user_last_message_at', 'conversations', ['user_id', 'last_message_at', 'id'], unique=False)
+
+    # Seed one row per participant from the latest message of every existing conversation.
+    # Delivery was never tracked before, so existing conversations start with nothing unread.
+    op.execute("""
+        WITH latest AS (
+            SELECT DISTINCT ON (listing_id, LEAST(sender_id, receiver_id), GREATEST(sender_id, receiver_id))
+                   id, listing_id, sender_id, receiver_id, content, timestamp
+            FROM chat_messages
+            WHERE deleted = false
+            ORDER BY listing_id, LEAST(sender_id, receiver_id), GREATEST(sender_id, receiver_id), id DESC
+        )
+        INSERT INTO conversations (user_id, peer_id, listing_id, room_id, last_message_id, last_message, last_message_at, unread_count)
+        SELECT p.user_id, p.peer_id, l.listing_id,
+               l.listing_id || '-' || LEAST(l.sender_id, l.receiver_id) || '-' || GREATEST(l.sender_id, l.receiver_id),
+               l.id, LEFT(l.content, 255), COALESCE(l.timestamp, now()), 0
+        FROM latest l
+        CROSS JOIN LATERAL (VALUES (l.sender_id, l.receiver_id), (l.receiver_id, l.sender_id)) AS p(user_id, peer_id)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversations_user_last_message_at', table_name='conversations')
+    op.drop_table('conversations')
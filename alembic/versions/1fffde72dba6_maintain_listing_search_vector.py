@@ -0,0 +1,77 @@
+"""maintain listing search_vector with trigger and GIN index
+
+Revision ID: 1fffde72dba6
+Revises: 5a001dd22510
+Create Date: 2025-09-02 10:12:44.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1fffde72dba6'
+down_revision: Union[str, None] = '5a001dd22510'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+# Title matches rank above category, which ranks above description
+SEARCH_VECTOR_EXPR = """
+    setweight(to_tsvector('english', coalesce({row}title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce({row}category, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce({row}description, '')), 'C')
+"""
+
+
+def upgrade() -> None:
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION listings_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR_EXPR.format(row='NEW.')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+    # DROP first: the steps below commit as they go, so a failed run may have left the trigger in place
+    op.execute("DROP TRIGGER IF EXISTS listings_search_vector_trigger ON listings")
+    op.execute("""
+        CREATE TRIGGER listings_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF title, description, category ON listings
+        FOR EACH ROW EXECUTE FUNCTION listings_search_vector_update();
+    """)
+
+    # Outside the migration transaction: each backfill batch commits on its own, so row
+    # locks are held for one batch at a time, and the index is built without blocking writes
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        max_id = conn.execute(sa.text("SELECT coalesce(max(id), 0) FROM listings")).scalar()
+        for start in range(0, max_id + 1, BACKFILL_BATCH_SIZE):
+            conn.execute(
+                sa.text(f"""
+                    UPDATE listings SET search_vector = {SEARCH_VECTOR_EXPR.format(row='')}
+                    WHERE id >= :start AND id < :stop
+                """),
+                {"start": start, "stop": start + BACKFILL_BATCH_SIZE},
+            )
+
+        # A failed concurrent build leaves an INVALID index behind; drop it before retrying
+        invalid = conn.execute(sa.text(
+            "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass('ix_listings_search_vector')"
+        )).scalar()
+        if invalid:
+            op.drop_index('ix_listings_search_vector', table_name='listings', postgresql_concurrently=True)
+        op.create_index(
+            'ix_listings_search_vector', 'listings', ['search_vector'], unique=False,
+            postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_listings_search_vector', table_name='listings', postgresql_concurrently=True, if_exists=True)
+    op.execute("DROP TRIGGER IF EXISTS listings_search_vector_trigger ON listings")
+    op.execute("DROP FUNCTION IF EXISTS listings_search_vector_update()")
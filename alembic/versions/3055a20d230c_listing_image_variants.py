@@ -0,0 +1,26 @@
+"""listing image variants
+
+Revision ID: 3055a20d230c
+Revises: 7be386d02506
+Create Date: 2025-09-14 16:20:43.906215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3055a20d230c'
+down_revision: Union[str, None] = '7be386d02506'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('listings', sa.Column('image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('listings', 'image_variants')
@@ -0,0 +1,51 @@
+"""composite and partial indexes for hot queries
+
+Revision ID: 3db22e448a37
+Revises: 1fffde72dba6
+Create Date: 2025-09-04 16:47:03.551972
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3db22e448a37'
+down_revision: Union[str, None] = '1fffde72dba6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # listings: search filters on category/status/price and sorts by created_at with an id tie-break.
+    # (category, created_at, id) has category as its prefix, so it replaces the single-column index.
+    op.drop_index(op.f('ix_listings_category'), table_name='listings')
+    op.create_index('ix_listings_created_at', 'listings', ['created_at', 'id'], unique=False)
+    op.create_index('ix_listings_category_created_at', 'listings', ['category', 'created_at', 'id'], unique=False)
+    op.create_index('ix_listings_category_price', 'listings', ['category', 'price', 'id'], unique=False)
+    op.create_index(
+        'ix_listings_active_category_created_at', 'listings', ['category', 'created_at', 'id'],
+        unique=False, postgresql_where=sa.text("status = 'ACTIVE'"),
+    )
+
+    # notifications: WHERE user_id = ? ORDER BY id DESC
+    op.drop_index(op.f('ix_notifications_user_id'), table_name='notifications')
+    op.create_index('ix_notifications_user_id_id', 'notifications', ['user_id', 'id'], unique=False)
+
+    # chat_messages: per-conversation lookups
+    op.create_index('ix_chat_messages_conversation', 'chat_messages', ['listing_id', 'sender_id', 'receiver_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_messages_conversation', table_name='chat_messages')
+
+    op.drop_index('ix_notifications_user_id_id', table_name='notifications')
+    op.create_index(op.f('ix_notifications_user_id'), 'notifications', ['user_id'], unique=False)
+
+    op.drop_index('ix_listings_active_category_created_at', table_name='listings', postgresql_where=sa.text("status = 'ACTIVE'"))
+    op.drop_index('ix_listings_category_price', table_name='listings')
+    op.drop_index('ix_listings_category_created_at', table_name='listings')
+    op.drop_index('ix_listings_created_at', table_name='listings')
+    op.create_index(op.f('ix_listings_category'), 'listings', ['category'], unique=False)
@@ -0,0 +1,47 @@
+"""saved searches
+
+Revision ID: 4c08c4bcf35c
+Revises: 8d2578e5abf7
+Create Date: 2025-09-19 09:37:26.804115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c08c4bcf35c'
+down_revision: Union[str, None] = '8d2578e5abf7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'saved_searches',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=True),
+        sa.Column('q', sa.String(length=255), nullable=True),
+        sa.Column('query', postgresql.TSQUERY(), nullable=True),
+        sa.Column('category', sa.String(length=100), nullable=True),
+        sa.Column('university', sa.String(length=255), nullable=True),
+        sa.Column('price_range', postgresql.NUMRANGE(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_saved_searches_user_id'), 'saved_searches', ['user_id'], unique=False)
+    # Matching a new listing: candidates by category (or none) and by price range containment
+    op.create_index('ix_saved_searches_category', 'saved_searches', ['category'], unique=False)
+    op.create_index('ix_saved_searches_price_range', 'saved_searches', ['price_range'], unique=False, postgresql_using='gist')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_saved_searches_price_range', table_name='saved_searches', postgresql_using='gist')
+    op.drop_index('ix_saved_searches_category', table_name='saved_searches')
+    op.drop_index(op.f('ix_saved_searches_user_id'), table_name='saved_searches')
+    op.drop_table('saved_searches')
@@ -0,0 +1,33 @@
+"""chat history keyset index
+
+Revision ID: 721f93259a56
+Revises: 3db22e448a37
+Create Date: 2025-09-11 09:25:37.104662
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '721f93259a56'
+down_revision: Union[str, None] = '3db22e448a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # History pages walk one direction of a conversation by id; deleted rows are never returned,
+    # so they are left out of the index. Supersedes ix_chat_messages_conversation.
+    op.drop_index('ix_chat_messages_conversation', table_name='chat_messages')
+    op.create_index(
+        'ix_chat_messages_conversation_id', 'chat_messages', ['listing_id', 'sender_id', 'receiver_id', 'id'],
+        unique=False, postgresql_where=sa.text('deleted = false'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_messages_conversation_id', table_name='chat_messages', postgresql_where=sa.text('deleted = false'))
+    op.create_index('ix_chat_messages_conversation', 'chat_messages', ['listing_id', 'sender_id', 'receiver_id'], unique=False)
@@ -0,0 +1,27 @@
+"""blocked_users blocked_by index
+
+Revision ID: 7be386d02506
+Revises: 1bbb7266b051
+Create Date: 2025-09-13 10:41:07.552903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7be386d02506'
+down_revision: Union[str, None] = '1bbb7266b051'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The block cache loads both directions for a user; uq_user_blocked_by only covers user_id first
+    op.create_index('ix_blocked_users_blocked_by', 'blocked_users', ['blocked_by'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_blocked_users_blocked_by', table_name='blocked_users')
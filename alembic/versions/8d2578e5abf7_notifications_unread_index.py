@@ -0,0 +1,30 @@
+"""notifications unread index
+
+Revision ID: 8d2578e5abf7
+Revises: 1a8013b0edba
+Create Date: 2025-09-18 14:52:09.473361
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2578e5abf7'
+down_revision: Union[str, None] = '1a8013b0edba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Unread counts and mark-read up to a watermark only ever touch unread rows
+    op.create_index(
+        'ix_notifications_user_unread', 'notifications', ['user_id', 'id'],
+        unique=False, postgresql_where=sa.text("NOT is_read"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notifications_user_unread', table_name='notifications', postgresql_where=sa.text("NOT is_read"))
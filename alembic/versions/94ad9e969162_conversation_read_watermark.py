@@ -0,0 +1,26 @@
+"""conversation read watermark
+
+Revision ID: 94ad9e969162
+Revises: 4c08c4bcf35c
+Create Date: 2025-09-19 15:02:11.417380
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '94ad9e969162'
+down_revision: Union[str, None] = '4c08c4bcf35c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('last_read_message_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'last_read_message_id')
@@ -2,9 +2,10 @@ from typing import Annotated
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import SessionLocal, AsyncSessionLocal
 from app.core.security import decode_token
-from app.models.user import User
+from app.core.principal import Principal, load_principal
 
 # Use HTTPBearer to show only a token field in Swagger
 bearer_scheme = HTTPBearer()
@@ -17,12 +18,18 @@ def get_db():
     finally:
         db.close()
 
+# Dependency to get an async DB session (used by the API routers)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # Type annotations for cleaner reuse
 TokenDep = Annotated[HTTPAuthorizationCredentials, Depends(bearer_scheme)]
 DbDep = Annotated[Session, Depends(get_db)]
+AsyncDbDep = Annotated[AsyncSession, Depends(get_async_db)]
 
-# Get the current user from token
-def get_current_user(credentials: TokenDep, db: DbDep) -> User:
+# Get the current user from token; served from the principal cache when possible
+async def get_current_user(credentials: TokenDep, db: AsyncDbDep) -> Principal:
     token = credentials.credentials  # Extract the raw token string
     payload = decode_token(token)
     if not payload or "sub" not in payload:
@@ -30,16 +37,18 @@ def get_current_user(credentials: TokenDep, db: DbDep) -> User:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
-    user = db.query(User).filter(User.id == int(payload["sub"])).first()
+    user = await load_principal(db, int(payload["sub"]))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
+    if not user.is_active:
+        raise HTTPException(status_code=403, detail="Inactive user")
     return user
 
 # Ensure current user is admin
-def get_current_admin(user: User = Depends(get_current_user)) -> User:
+async def get_current_admin(user: Principal = Depends(get_current_user)) -> Principal:
     if not user.is_admin:
         raise HTTPException(status_code=403, detail="Admin only")
     return user
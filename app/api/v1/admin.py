@@ -1,11 +1,24 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.api.deps import get_db, get_current_admin
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db, get_current_admin
+from app.db.session import pool_status
 from app.models.user import User
+from app.services.cache import response_cache
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
 @router.get("/users", dependencies=[Depends(get_current_admin)])
-def list_users(db: Session = Depends(get_db)):
-    rows = db.query(User).order_by(User.id).limit(100).all()
+async def list_users(db: AsyncSession = Depends(get_async_db)):
+    rows = (await db.scalars(select(User).order_by(User.id).limit(100))).all()
     return [{"id": u.id, "email": u.email, "is_admin": u.is_admin, "is_verified": u.is_verified} for u in rows]
+
+@router.get("/db-pool", dependencies=[Depends(get_current_admin)])
+async def db_pool():
+    # Per-process figures: each uvicorn worker reports its own pools
+    return pool_status()
+
+@router.get("/cache", dependencies=[Depends(get_current_admin)])
+async def cache_stats():
+    # Per-process figures, like /db-pool
+    return response_cache.stats()
@@ -1,31 +1,42 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from decimal import Decimal
 from typing import List
 
-from app.api.deps import get_db
+from app.api.deps import get_async_db
 from app.models.listing import Listing
+from app.services.cache import response_cache
 from app.schemas.ai import PriceSuggestIn, PriceSuggestOut, DuplicateCheckIn, DuplicateCheckOut, RecommendIn, RecommendOut
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
 
 @router.post("/predict-price", response_model=PriceSuggestOut)
-def predict_price(payload: PriceSuggestIn, db: Session = Depends(get_db)):
-    avg = db.query(func.avg(Listing.price)).filter(Listing.category == payload.category).scalar()
-    if avg is None:
-        return PriceSuggestOut(suggested_price=Decimal("0.00"), basis="no_category_data")
-    return PriceSuggestOut(
-        suggested_price=Decimal(avg).quantize(Decimal('0.01')),
-        basis="category_average"
+async def predict_price(payload: PriceSuggestIn, db: AsyncSession = Depends(get_async_db)):
+    async def render() -> bytes:
+        avg = await db.scalar(select(func.avg(Listing.price)).where(Listing.category == payload.category))
+        if avg is None:
+            out = PriceSuggestOut(suggested_price=Decimal("0.00"), basis="no_category_data")
+        else:
+            out = PriceSuggestOut(
+                suggested_price=Decimal(avg).quantize(Decimal('0.01')),
+                basis="category_average"
+            )
+        return out.model_dump_json().encode()
+
+    # The category average only changes when a listing in that category is written
+    body = await response_cache.get_or_render(
+        "predict_price", {"category": payload.category}, [f"category:{payload.category}"], render,
     )
+    return Response(body, media_type="application/json")
 
 
 @router.post("/check-duplicate", response_model=DuplicateCheckOut)
-def check_duplicate(payload: DuplicateCheckIn, db: Session = Depends(get_db)):
+async def check_duplicate(payload: DuplicateCheckIn, db: AsyncSession = Depends(get_async_db)):
     # Very simple duplicate check based on title similarity
-    duplicates = db.query(Listing).filter(Listing.title.ilike(f"%{payload.title}%")).all()
+    duplicates = (await db.scalars(select(Listing).where(Listing.title.ilike(f"%{payload.title}%")))).all()
     return DuplicateCheckOut(
         is_duplicate=len(duplicates) > 0,
         similar_items=[item.title for item in duplicates]
@@ -33,12 +44,12 @@ def check_duplicate(payload: DuplicateCheckIn, db: Session = Depends(get_db)):
 
 
 @router.post("/recommend", response_model=RecommendOut)
-def recommend_items(payload: RecommendIn, db: Session = Depends(get_db)):
+async def recommend_items(payload: RecommendIn, db: AsyncSession = Depends(get_async_db)):
     # Basic recommendation: same category but different item
-    items = db.query(Listing).filter(
+    items = (await db.scalars(select(Listing).where(
         Listing.category == payload.category,
         Listing.id != payload.current_item_id
-    ).limit(5).all()
+    ).limit(5))).all()
     return RecommendOut(
         recommendations=[{"id": item.id, "title": item.title, "price": item.price} for item in items]
     )
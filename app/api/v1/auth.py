@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, EmailStr
-from sqlalchemy.orm import Session
-from app.api.deps import get_db, get_current_user
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.api.deps import get_async_db, get_current_user
 from app.core.security import hash_password, verify_password, create_access_token
 from app.core.config import allowed_domains
 from app.models.user import User
+from app.core.principal import Principal
 from app.schemas.auth import Token, SignUpIn
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
@@ -20,12 +23,12 @@ class SignupResponse(BaseModel):
     message: str
 
 @router.post("/signup", response_model=SignupResponse)
-def signup(payload: SignUpIn, db: Session = Depends(get_db)):
+async def signup(payload: SignUpIn, db: AsyncSession = Depends(get_async_db)):
     domain = payload.email.split("@")[-1].lower()
     if domain not in allowed_domains():
         raise HTTPException(status_code=400, detail="Email domain not allowed")
 
-    if db.query(User).filter(User.email == payload.email).first():
+    if await db.scalar(select(User).where(User.email == payload.email)):
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # Auto-fill university if known
@@ -33,26 +36,26 @@ def signup(payload: SignUpIn, db: Session = Depends(get_db)):
 
     user = User(
         email=payload.email,
-        hashed_password=hash_password(payload.password),
+        hashed_password=await run_in_threadpool(hash_password, payload.password),  # bcrypt is CPU-bound
         university=university
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     return {"message": "Registration successful. Please login to get your token."}
 
 @router.post("/login", response_model=Token)
-def login(payload: SignUpIn, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.hashed_password):
+async def login(payload: SignUpIn, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == payload.email))
+    if not user or not await run_in_threadpool(verify_password, payload.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
     token = create_access_token(str(user.id))
     return Token(access_token=token)
 
 @router.get("/me")
-def me(user: User = Depends(get_current_user)):
+async def me(user: Principal = Depends(get_current_user)):
     return {
         "id": user.id,
         "email": user.email,
@@ -1,79 +1,208 @@
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status
-from sqlalchemy.orm import Session
-from starlette.websockets import WebSocketState
-from jose import JWTError, jwt
-from app.core.config import settings
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, select, tuple_, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db
+from app.api.deps import get_async_db, get_current_user
+from app.core.config import settings
+from app.core.principal import Principal, load_principal
+from app.db.session import AsyncSessionLocal
+from app.core.security import decode_token
 from app.models.chat import ChatMessage, BlockedUser
+from app.models.conversation import Conversation
 from app.models.listing import Listing
 from app.models.user import User
 from app.schemas.chat import ChatMessageOut
-from typing import Dict, List
+from app.services.block_cache import block_cache
+from app.services.chat_hub import chat_hub
+from app.services.chat_writer import WriteBehindUnavailable, chat_writer
+from app.services.conversations import forget_unread, mark_delivered, record_messages, room_id
+from app.services.notifications import notification_hub, notify_chat_messages
+from app.utils.pagination import decode_cursor, encode_cursor
+from datetime import datetime
+from typing import Optional
 import html
+import json
 import logging
 
 router = APIRouter()
-active_connections: Dict[str, List[WebSocket]] = {}
-
-
-JWT_SECRET = settings.JWT_SECRET
-JWT_ALGORITHM = settings.JWT_ALGORITHM
 
 logger = logging.getLogger("chat_ws")
 
-def room_id(listing_id: int, u1: int, u2: int):
-    return f"{listing_id}-{min(u1, u2)}-{max(u1, u2)}"
+def fits_broadcast(content: str) -> bool:
+    """
+    Whether escaped message content is within CHAT_MAX_MESSAGE_BYTES as the broker encodes
+    it (ASCII JSON), so the broadcast reaches peers on every worker. The Postgres broker
+    can only deliver an oversized payload on the sending worker.
+    """
+    return len(json.dumps(content)) <= settings.CHAT_MAX_MESSAGE_BYTES
 
-def create_message(db: Session, data: dict):
+async def create_message(db: AsyncSession, data: dict):
     msg = ChatMessage(**data)
     db.add(msg)
-    db.commit()
-    db.refresh(msg)
+    await db.flush()  # assigns the id for the inbox rows, same transaction
+    await record_messages(db, [{**data, "id": msg.id}])
+    events = await notify_chat_messages(db, [{**data, "id": msg.id}])
+    await db.commit()
+    await notification_hub.publish(events)
+    await db.refresh(msg)
     return msg
 
-def user_blocked(db: Session, user_id: int, blocked_by: int):
-    return db.query(BlockedUser).filter(
-        BlockedUser.user_id == user_id,
-        BlockedUser.blocked_by == blocked_by
-    ).first() is not None
-
-async def get_current_user_websocket(websocket: WebSocket, db: Session):
+async def get_current_user_websocket(websocket: WebSocket, db: AsyncSession):
     auth = websocket.headers.get("authorization")
     if not auth or not auth.lower().startswith("bearer "):
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         raise Exception("Missing or invalid authorization header")
     token = auth[7:]
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-            raise Exception("Invalid token: no subject")
-        # Optionally verify user in DB
-        user = db.query(User).filter(User.id == int(user_id)).first()
-        if not user:
-            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-            raise Exception("User not found")
-        return int(user_id)
-    except JWTError:
+    payload = decode_token(token)
+    if payload is None:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         raise Exception("Token decode error")
+    user_id = payload.get("sub")
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        raise Exception("Invalid token: no subject")
+    # Verify the user exists (served from the principal cache when possible)
+    user = await load_principal(db, int(user_id))
+    if not user or not user.is_active:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        raise Exception("User not found")
+    return user.id
 
-@router.websocket("/ws/chat/{listing_id}/{peer_id}")
-async def chat_ws(websocket: WebSocket, listing_id: int, peer_id: int, db: Session = Depends(get_db)):
-    try:
-        user_id = await get_current_user_websocket(websocket, db)
-    except Exception as e:
-        logger.error(f"Auth failed: {e}")
-        return  # connection already closed by helper
+@router.post("/chat/block/{user_id}", tags=["Chat"])
+async def block_user(user_id: int, db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user)):
+    if user_id == user.id:
+        raise HTTPException(status_code=400, detail="Cannot block yourself")
+    if not await db.get(User, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    await db.execute(
+        insert(BlockedUser).values(user_id=user_id, blocked_by=user.id)
+        .on_conflict_do_nothing(constraint="uq_user_blocked_by")
+    )
+    await db.commit()
+    await block_cache.changed(user.id, user_id)
+    return {"status": "ok"}
+
+@router.delete("/chat/block/{user_id}", tags=["Chat"])
+async def unblock_user(user_id: int, db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user)):
+    result = await db.execute(
+        delete(BlockedUser).where(BlockedUser.user_id == user_id, BlockedUser.blocked_by == user.id)
+    )
+    if not result.rowcount:
+        raise HTTPException(status_code=404, detail="Not blocked")
+    await db.commit()
+    await block_cache.changed(user.id, user_id)
+    return {"status": "ok"}
 
-    listing = db.query(Listing).filter(Listing.id == listing_id).first()
+@router.get("/chat/inbox", tags=["Chat"])
+async def chat_inbox(
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's next_cursor"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_user),
+):
+    # A single range read on ix_conversations_user_last_message_at; rows are kept current on write
+    stmt = select(Conversation).where(Conversation.user_id == user.id)
+    if cursor:
+        try:
+            c = decode_cursor(cursor)
+            last_at, last_id = datetime.fromisoformat(c["t"]), int(c["id"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.where(tuple_(Conversation.last_message_at, Conversation.id) < tuple_(last_at, last_id))
+    stmt = stmt.order_by(Conversation.last_message_at.desc(), Conversation.id.desc()).limit(limit)
+    rows = (await db.scalars(stmt)).all()
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor({"t": last.last_message_at.isoformat(), "id": last.id})
+    return JSONResponse({
+        "conversations": [
+            {
+                "room": c.room_id,
+                "listing_id": c.listing_id,
+                "peer_id": c.peer_id,
+                "last_message_id": c.last_message_id,
+                "last_message": c.last_message,
+                "last_message_at": c.last_message_at.isoformat() if c.last_message_at else None,
+                "unread_count": c.unread_count,
+            }
+            for c in rows
+        ],
+        "next_cursor": next_cursor,
+    })
+
+@router.get("/chat/{listing_id}/{peer_id}/history", tags=["Chat"])
+async def chat_history(
+    listing_id: int,
+    peer_id: int,
+    before: Optional[int] = Query(None, description="Only messages with a lower id (pass next_before from the previous page)"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_user),
+):
+    listing = await db.get(Listing, listing_id)
     if not listing:
-        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-        return
+        raise HTTPException(status_code=404, detail="Listing not found")
+    if peer_id == user.id or listing.owner_id not in (user.id, peer_id):
+        raise HTTPException(status_code=403, detail="Not a participant in this conversation")
+
+    if settings.CHAT_WRITE_BEHIND:
+        await chat_writer.flush()  # include messages still waiting for their batch insert
+
+    # One keyset range per direction, each served by ix_chat_messages_conversation_id,
+    # merged and cut to a single page.
+    def direction(sender_id: int, receiver_id: int):
+        stmt = select(
+            ChatMessage.id, ChatMessage.sender_id, ChatMessage.content, ChatMessage.timestamp, ChatMessage.edited,
+        ).where(
+            ChatMessage.listing_id == listing_id,
+            ChatMessage.sender_id == sender_id,
+            ChatMessage.receiver_id == receiver_id,
+            ChatMessage.deleted == False,  # noqa: E712 (must match the partial index predicate)
+        )
+        if before is not None:
+            stmt = stmt.where(ChatMessage.id < before)
+        return stmt.order_by(ChatMessage.id.desc()).limit(limit)
+
+    page = union_all(direction(user.id, peer_id), direction(peer_id, user.id)).subquery()
+    rows = (await db.execute(select(page).order_by(page.c.id.desc()).limit(limit))).all()
 
-    if user_blocked(db, user_id, peer_id) or user_blocked(db, peer_id, user_id):
+    # Plain dicts straight into JSONResponse: no ORM objects or response-model validation per row
+    return JSONResponse({
+        "room": room_id(listing_id, user.id, peer_id),
+        "messages": [
+            {
+                "id": r.id,
+                "sender_id": r.sender_id,
+                "content": r.content,
+                "timestamp": r.timestamp.isoformat() if r.timestamp else None,
+                "edited": r.edited,
+            }
+            for r in rows
+        ],
+        "next_before": rows[-1].id if len(rows) == limit else None,
+    })
+
+@router.websocket("/ws/chat/{listing_id}/{peer_id}")
+async def chat_ws(websocket: WebSocket, listing_id: int, peer_id: int):
+    # Sessions are opened per operation so an idle socket never holds a pooled connection
+    async with AsyncSessionLocal() as db:
+        try:
+            user_id = await get_current_user_websocket(websocket, db)
+        except Exception as e:
+            logger.error(f"Auth failed: {e}")
+            return  # connection already closed by helper
+
+        listing = await db.get(Listing, listing_id)
+        if not listing:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+
+    if await block_cache.is_blocked(user_id, peer_id):
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
@@ -83,7 +212,7 @@ async def chat_ws(websocket: WebSocket, listing_id: int, peer_id: int, db: Sessi
 
     rid = room_id(listing_id, user_id, peer_id)
     await websocket.accept()
-    active_connections.setdefault(rid, []).append(websocket)
+    conn = chat_hub.join(rid, websocket)
     logger.info(f"User {user_id} connected to room {rid}")
 
     try:
@@ -91,49 +220,67 @@ async def chat_ws(websocket: WebSocket, listing_id: int, peer_id: int, db: Sessi
             data = await websocket.receive_json()
 
             if "typing" in data and data["typing"]:
-                for conn in active_connections.get(rid, []):
-                    if conn != websocket and conn.application_state == WebSocketState.CONNECTED:
-                        await conn.send_json({"typing": True, "user": user_id})
+                await chat_hub.broadcast(rid, {"typing": True, "user": user_id}, skip=conn.id)
 
             elif "delivery_receipt" in data:
                 message_id = data["delivery_receipt"]
-                for conn in active_connections.get(rid, []):
-                    if conn != websocket and conn.application_state == WebSocketState.CONNECTED:
-                        await conn.send_json({"delivery_receipt": message_id, "user": user_id})
+                if not isinstance(message_id, int):
+                    continue
+                if settings.CHAT_WRITE_BEHIND:
+                    await chat_writer.ensure_written(message_id)  # counted before the watermark passes it
+                async with AsyncSessionLocal() as db:
+                    await mark_delivered(db, user_id, rid, message_id)
+                    await db.commit()
+                await chat_hub.broadcast(rid, {"delivery_receipt": message_id, "user": user_id}, skip=conn.id)
 
             elif "edit_message" in data:
                 edit_data = data["edit_message"]
-                msg_db = db.query(ChatMessage).filter(ChatMessage.id == edit_data["message_id"]).first()
-                if msg_db and msg_db.sender_id == user_id:
-                    new_text = html.escape(edit_data["new_content"].strip())
-                    if new_text:
-                        msg_db.content = new_text + " (edited)"
-                        msg_db.edited = True
-                        db.commit()
-                        msg_out = ChatMessageOut.from_orm(msg_db).dict()
-                        msg_out["timestamp"] = msg_out["timestamp"].isoformat()
-                        for conn in active_connections.get(rid, []):
-                            if conn.application_state == WebSocketState.CONNECTED:
-                                await conn.send_json({"edit_message": msg_out})
-                else:
-                    await websocket.send_json({"error": "Edit not allowed or message not found."})
+                if settings.CHAT_WRITE_BEHIND:
+                    await chat_writer.ensure_written(edit_data["message_id"])  # it may still be pending
+                async with AsyncSessionLocal() as db:
+                    msg_db = await db.get(ChatMessage, edit_data["message_id"])
+                    if msg_db and msg_db.sender_id == user_id:
+                        new_text = html.escape(edit_data["new_content"].strip())
+                        if not fits_broadcast(new_text):
+                            conn.send_json({"error": "Message is too long."})
+                        elif new_text:
+                            msg_db.content = new_text + " (edited)"
+                            msg_db.edited = True
+                            await db.commit()
+                            msg_out = ChatMessageOut.from_orm(msg_db).dict()
+                            msg_out["timestamp"] = msg_out["timestamp"].isoformat()
+                            await chat_hub.broadcast(rid, {"edit_message": msg_out})
+                    else:
+                        conn.send_json({"error": "Edit not allowed or message not found."})
 
             elif "delete_message" in data:
                 message_id = data["delete_message"]
-                msg_db = db.query(ChatMessage).filter(ChatMessage.id == message_id).first()
-                if msg_db and msg_db.sender_id == user_id:
-                    msg_db.deleted = True
-                    db.commit()
-                    for conn in active_connections.get(rid, []):
-                        if conn.application_state == WebSocketState.CONNECTED:
-                            await conn.send_json({"delete_message": message_id})
-                else:
-                    await websocket.send_json({"error": "Delete not allowed or message not found."})
+                if settings.CHAT_WRITE_BEHIND:
+                    await chat_writer.ensure_written(message_id)  # it may still be pending
+                async with AsyncSessionLocal() as db:
+                    msg_db = await db.get(ChatMessage, message_id)
+                    if msg_db and msg_db.sender_id == user_id:
+                        if not msg_db.deleted:
+                            await forget_unread(db, msg_db.receiver_id, rid, msg_db.id)
+                        msg_db.deleted = True
+                        await db.commit()
+                        await chat_hub.broadcast(rid, {"delete_message": message_id})
+                    else:
+                        conn.send_json({"error": "Delete not allowed or message not found."})
 
             elif "content" in data:
+                # Re-checked per message (a set lookup) so a block also ends conversations already open
+                if await block_cache.is_blocked(user_id, peer_id):
+                    chat_hub.leave(rid, conn)
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                    logger.info(f"User {user_id} blocked in room {rid}; closing")
+                    return
                 content = html.escape(data["content"].strip())
                 if not content:
                     continue
+                if not fits_broadcast(content):
+                    conn.send_json({"error": "Message is too long."})
+                    continue
 
                 msg_in = {
                     "listing_id": listing_id,
@@ -141,26 +288,38 @@ async def chat_ws(websocket: WebSocket, listing_id: int, peer_id: int, db: Sessi
                     "receiver_id": peer_id,
                     "content": content
                 }
-                msg = create_message(db, msg_in)
-                msg_out = ChatMessageOut.from_orm(msg).dict()
+                msg_out = None
+                if settings.CHAT_WRITE_BEHIND:
+                    # Broadcast now; the row is inserted by the next batch flush
+                    try:
+                        msg_out = ChatMessageOut(**await chat_writer.add(msg_in)).dict()
+                    except WriteBehindUnavailable as e:
+                        logger.warning(f"Chat write-behind unavailable ({e}); writing synchronously")
+                if msg_out is None:
+                    try:
+                        async with AsyncSessionLocal() as db:
+                            msg = await create_message(db, msg_in)
+                    except SQLAlchemyError as e:
+                        # Never broadcast a message that was not saved
+                        logger.error(f"Chat message from user {user_id} could not be saved: {e}")
+                        conn.send_json({"error": "Message could not be saved; please retry."})
+                        continue
+                    msg_out = ChatMessageOut.from_orm(msg).dict()
                 msg_out["timestamp"] = msg_out["timestamp"].isoformat()
-                for conn in list(active_connections.get(rid, [])):
-                    if conn.application_state == WebSocketState.CONNECTED:
-                        await conn.send_json(msg_out)
+                await chat_hub.broadcast(rid, msg_out)
 
             else:
-                await websocket.send_json({"error": "Invalid payload."})
+                conn.send_json({"error": "Invalid payload."})
 
     except WebSocketDisconnect:
-        active_connections[rid].remove(websocket)
-        if not active_connections[rid]:
-            del active_connections[rid]
+        chat_hub.leave(rid, conn)
+        if settings.CHAT_WRITE_BEHIND:
+            await chat_writer.flush()
         logger.info(f"User {user_id} disconnected from room {rid}")
 
     except Exception as e:
         logger.error(f"Unexpected error in websocket: {e}", exc_info=True)
-        if rid in active_connections and websocket in active_connections[rid]:
-            active_connections[rid].remove(websocket)
-            if not active_connections[rid]:
-                del active_connections[rid]
+        chat_hub.leave(rid, conn)
+        if settings.CHAT_WRITE_BEHIND:
+            await chat_writer.flush()
         await websocket.close()
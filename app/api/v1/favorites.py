@@ -1,29 +1,89 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.api.deps import get_db, get_current_user
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db, get_current_user
 from app.models.favorite import Favorite
 from app.models.listing import Listing
+from app.schemas.favorite import FavoriteBatch, FavoriteBatchResult, FavoriteContains
+from app.services.cache import response_cache
+from app.services.favorites import add_favorites as add_favorite_rows, remove_favorites as remove_favorite_rows
+from app.services.notifications import create_notifications, notification_hub
 
 router = APIRouter(prefix="/favorites", tags=["Favorites"])
 
+MAX_BATCH = 100
+
+
+async def _notify_owners(db: AsyncSession, user_id: int, added: dict):
+    # Tell each owner their listing was favorited (not when they favorite their own)
+    return await create_notifications(db, [
+        (owner_id, "favorite", {"listing_id": listing_id, "user_id": user_id})
+        for listing_id, owner_id in added.items() if owner_id != user_id
+    ])
+
+
+async def _invalidate(listing_ids):
+    # Listing detail shows favorite_count exactly; cached search pages (popularity order
+    # included) are not invalidated per favorite and may lag by up to CACHE_TTL_SECONDS.
+    await response_cache.invalidate(*(f"listing:{i}" for i in listing_ids))
+
+
+# Static routes first so they are not captured by /{listing_id}
+@router.get("/contains", response_model=FavoriteContains)
+async def favorites_contains(
+    ids: List[int] = Query(..., description="Listing ids to check, e.g. those of a search results page"),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user),
+):
+    """Which of `ids` the user has favorited, in one query."""
+    if len(ids) > MAX_BATCH:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH} ids")
+    rows = await db.scalars(
+        select(Favorite.listing_id).where(Favorite.user_id == user.id, Favorite.listing_id.in_(set(ids)))
+    )
+    return FavoriteContains(favorited=sorted(rows))
+
+
+@router.post("/batch", response_model=FavoriteBatchResult)
+async def add_favorites(payload: FavoriteBatch, db: AsyncSession = Depends(get_async_db), user=Depends(get_current_user)):
+    """Favorite several listings in one statement. Unknown listing ids are ignored."""
+    added = await add_favorite_rows(db, user.id, payload.listing_ids)
+    events = await _notify_owners(db, user.id, added)
+    await db.commit()
+    await _invalidate(added)
+    await notification_hub.publish(events)
+    return FavoriteBatchResult(listing_ids=list(added))
+
+
+@router.delete("/batch", response_model=FavoriteBatchResult)
+async def remove_favorites(payload: FavoriteBatch, db: AsyncSession = Depends(get_async_db), user=Depends(get_current_user)):
+    removed = await remove_favorite_rows(db, user.id, payload.listing_ids)
+    await db.commit()
+    await _invalidate(removed)
+    return FavoriteBatchResult(listing_ids=removed)
+
+
 @router.post("/{listing_id}")
-def add_favorite(listing_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    listing = db.query(Listing).filter(Listing.id == listing_id).first()
-    if not listing:
+async def add_favorite(listing_id: int, db: AsyncSession = Depends(get_async_db), user=Depends(get_current_user)):
+    added = await add_favorite_rows(db, user.id, [listing_id])
+    events = await _notify_owners(db, user.id, added)
+    await db.commit()
+    if added:
+        await _invalidate(added)
+        await notification_hub.publish(events)
+        return {"status": "ok"}
+    # Nothing inserted: either already favorited or no such listing
+    if not await db.get(Listing, listing_id):
         raise HTTPException(status_code=404, detail="Listing not found")
-    fav = db.query(Favorite).filter(Favorite.user_id == user.id, Favorite.listing_id == listing_id).first()
-    if fav:
-        return {"status": "already_favorited"}
-    fav = Favorite(user_id=user.id, listing_id=listing_id)
-    db.add(fav)
-    db.commit()
-    return {"status": "ok"}
+    return {"status": "already_favorited"}
+
 
 @router.delete("/{listing_id}")
-def remove_favorite(listing_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    fav = db.query(Favorite).filter(Favorite.user_id == user.id, Favorite.listing_id == listing_id).first()
-    if not fav:
+async def remove_favorite(listing_id: int, db: AsyncSession = Depends(get_async_db), user=Depends(get_current_user)):
+    removed = await remove_favorite_rows(db, user.id, [listing_id])
+    if not removed:
         raise HTTPException(status_code=404, detail="Not favorited")
-    db.delete(fav)
-    db.commit()
+    await db.commit()
+    await _invalidate(removed)
     return {"status": "ok"}
@@ -1,91 +1,251 @@
+import asyncio
+import logging
+import re
+import time
 import uuid
 from typing import List, Optional
 from decimal import Decimal
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request, UploadFile, File, Form
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 from app.api import deps
 from app.core.config import settings
+from app.db.session import AsyncSessionLocal
 from app.models.listing import Listing
-from app.models.user import User
-from app.schemas.listing import ListingOut, ListingUpdate, ListingStatusPatch
+from app.core.principal import Principal
+from app.services.cache import listing_scopes, response_cache
+from app.services.listing_events import listing_events
+from app.services.saved_searches import notify_matches
+from app.schemas.listing import ListingOut, ListingUpdate, ListingStatusPatch, UploadSlot, UploadSlotsRequest
+from app.utils.images import InvalidImage, sniff_image_type
+from app.utils.sse import sse_response, stream
 from app.utils.storage import (
-    save_upload,
+    UploadTooLarge,
+    create_presigned_put,
+    delete_key,
+    delete_renditions,
     gen_object_key,
-    public_url_for_key,
-    get_s3_client,
+    head_key,
+    ingest_image,
+    save_uploads,
+    sign_local_put,
+    verify_local_put,
+    write_stream,
 )
 
 router = APIRouter(prefix="/listings", tags=["Listings"])
 
+logger = logging.getLogger("listings")
+
+# Accepted image types and the extension their keys get
+IMAGE_CONTENT_TYPES = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}
+
+
+def _listing_key_prefix(user_id: int) -> str:
+    return f"listings/{user_id}"
+
+
+def _incoming_key_prefix(user_id: int) -> str:
+    # Uploads wait here, never served, until ingest publishes a sanitized copy under listings/
+    return f"incoming/{user_id}"
+
+
+async def _ingest_listing_images(listing_id: int, owner_id: int, university: Optional[str], keys: List[str]) -> None:
+    """
+    Background stage after create_listing: publish a sanitized copy of each upload under
+    a new key, with its variants, and only then set the listing's images and manifests.
+    Objects that are not decodable images are deleted and dropped from the listing.
+    """
+    dest_prefix = _listing_key_prefix(owner_id)
+    results = await asyncio.gather(*(ingest_image(key, dest_prefix) for key in keys), return_exceptions=True)
+    for key, r in zip(keys, results):
+        if isinstance(r, InvalidImage):
+            await run_in_threadpool(delete_key, key)
+        elif isinstance(r, BaseException):
+            logger.error(f"Image ingest failed for {key}: {r}")
+    published = [r[0] for r in results if not isinstance(r, BaseException)]
+    manifests = [r[1] for r in results if not isinstance(r, BaseException)]
+
+    async with AsyncSessionLocal() as db:
+        obj = await db.get(Listing, listing_id)
+        if not obj or obj.images:
+            # Deleted, or the owner set images in the meantime: these copies are unreferenced
+            await asyncio.gather(*(delete_renditions(key) for key in published))
+            return
+        obj.images = [m["url"] for m in manifests]
+        obj.image_variants = manifests
+        await db.commit()
+        await db.refresh(obj)
+    await response_cache.invalidate(*listing_scopes(listing_id, obj.category))
+    await listing_events.publish("updated", obj, university)
+
+
+# -------- Direct-to-storage uploads (phase 1 of create_listing) --------
+@router.post("/uploads", response_model=List[UploadSlot])
+async def create_upload_slots(
+    payload: UploadSlotsRequest,
+    request: Request,
+    user: Principal = Depends(deps.get_current_user),
+):
+    """
+    Reserve keys for the listing's images and return where to PUT each one. The client
+    uploads straight to storage, then passes the keys to POST /listings as image_keys.
+    """
+    if not user.is_verified:
+        raise HTTPException(status_code=403, detail="User must be verified")
+
+    ttl = settings.UPLOAD_URL_TTL_SECONDS
+    slots = []
+    for f in payload.files:
+        ext = IMAGE_CONTENT_TYPES.get(f.content_type)
+        if ext is None:
+            raise HTTPException(status_code=415, detail=f"Unsupported content type {f.content_type}")
+        if f.size > settings.MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {settings.MAX_UPLOAD_BYTES} bytes")
+        key = gen_object_key(_incoming_key_prefix(user.id), f"upload.{ext}")
+        url = await run_in_threadpool(create_presigned_put, key, f.content_type, ttl, f.size)
+        if url is None:
+            expires_at = int(time.time()) + ttl
+            url = str(request.url_for("put_local_upload", key=key).include_query_params(
+                expires=expires_at, sig=sign_local_put(key, f.content_type, f.size, expires_at),
+            ))
+        slots.append(UploadSlot(key=key, upload_url=url, headers={"Content-Type": f.content_type}, expires_in=ttl))
+    return slots
+
+
+@router.put("/uploads/{key:path}", status_code=204, name="put_local_upload")
+async def put_local_upload(
+    key: str,
+    request: Request,
+    expires: int = Query(...),
+    sig: str = Query(...),
+    content_type: str = Header(""),
+    content_length: Optional[int] = Header(None),
+):
+    """Signed upload target standing in for S3 presigned PUTs when STORAGE_BACKEND is LOCAL or MEMORY."""
+    if settings.STORAGE_BACKEND == "S3":
+        raise HTTPException(status_code=404, detail="Not found")
+    if content_length is None:
+        raise HTTPException(status_code=411, detail="Content-Length required")
+    if expires < time.time() or not verify_local_put(key, content_type, content_length, expires, sig):
+        raise HTTPException(status_code=403, detail="Invalid or expired upload URL")
+    try:
+        written = await write_stream(key, request.stream(), limit=content_length)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if written != content_length:
+        await run_in_threadpool(delete_key, key)
+        raise HTTPException(status_code=400, detail="Body shorter than Content-Length")
+
 
 # -------- Create listing (LOCAL or S3 based on settings) --------
 @router.post("", response_model=ListingOut)
 async def create_listing(
+    background_tasks: BackgroundTasks,
     title: str = Form(...),
     description: str = Form(...),
     category: str = Form(...),
     price: Decimal = Form(...),
     images: Optional[List[UploadFile]] = File(None),
-    db: Session = Depends(deps.get_db),
-    user: User = Depends(deps.get_current_user),
+    image_keys: Optional[List[str]] = Form(None, description="Keys from POST /listings/uploads, already uploaded"),
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: Principal = Depends(deps.get_current_user),
 ):
     if not user.is_verified:
         raise HTTPException(status_code=403, detail="User must be verified")
 
-    urls = []
-
-    if settings.STORAGE_BACKEND == "LOCAL":
-        # Save files locally
-        for f in images or []:
-            url = save_upload(f, subdir="listings")
-            urls.append(url)
+    # Pre-uploaded keys must be this user's and must exist in storage
+    own_key = re.compile(rf"^{_incoming_key_prefix(user.id)}/[0-9a-f-]{{36}}\.(?:{'|'.join(IMAGE_CONTENT_TYPES.values())})$")
+    keys = list(image_keys or [])
+    for key in keys:
+        if not own_key.match(key):
+            raise HTTPException(status_code=400, detail=f"Invalid image key {key}")
+    sizes = await asyncio.gather(*(run_in_threadpool(head_key, key) for key in keys))
+    for key, size in zip(keys, sizes):
+        if size is None:
+            raise HTTPException(status_code=400, detail=f"Image {key} has not been uploaded")
+        if size > settings.MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image {key} exceeds {settings.MAX_UPLOAD_BYTES} bytes")
 
-
-    elif settings.STORAGE_BACKEND == "S3":
-        # Upload files to S3 directly
-        s3_client = get_s3_client()
-        for f in images or []:
-            key = gen_object_key("listings", f.filename)
-            s3_client.upload_fileobj(f.file, settings.S3_BUCKET, key)
-            urls.append(public_url_for_key(key))
-
-    else:
-        raise HTTPException(status_code=500, detail="Invalid storage backend")
+    # Images sent in the form itself still stream through this worker. Their key extension
+    # comes from the sniffed content, never from the client's filename or declared type.
+    extensions = []
+    for f in images or []:
+        head = await f.read(12)
+        await f.seek(0)
+        ext = IMAGE_CONTENT_TYPES.get(sniff_image_type(head))
+        if ext is None:
+            raise HTTPException(status_code=415, detail=f"Unsupported image type for {f.filename}")
+        extensions.append(ext)
+    try:
+        stored = await save_uploads(images or [], subdir=_incoming_key_prefix(user.id), extensions=extensions)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    keys += [key for key, _ in stored]
 
     obj = Listing(
         title=title,
         description=description,
         category=category,
         price=float(price),
-        images=urls,
+        images=[],  # set by _ingest_listing_images once sanitized copies are published
         owner_id=user.id,
         status="ACTIVE",
     )
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
+    await response_cache.invalidate(*listing_scopes(None, obj.category))
+    await listing_events.publish("created", obj, user.university)
+    # Saved-search matching and image variants both run after the response is sent
+    background_tasks.add_task(notify_matches, obj.id, user.university)
+    if keys:
+        # images and image_variants fill in shortly after, announced as an `updated` event
+        background_tasks.add_task(_ingest_listing_images, obj.id, user.id, user.university, keys)
     return obj
 
 
+# -------- Live changes (before /{listing_id} so "stream" is not taken for an id) --------
+@router.get("/stream")
+async def stream_listings(
+    category: Optional[str] = Query(None, description="Only listings in this category"),
+    university: Optional[str] = Query(None, description="Only listings whose owner is at this university"),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events feed of listing writes: `created`, `updated`, `status` and `deleted`
+    events carrying a summary of the listing. EventSource resumes after Last-Event-ID on
+    reconnect; a `resync` event means the gap was too long and the client should search again.
+    """
+    subscriber, backlog = listing_events.connect(category, university, last_event_id)
+    return sse_response(
+        stream(subscriber.queue, settings.SSE_HEARTBEAT_SECONDS, backlog),
+        on_close=lambda: listing_events.disconnect(subscriber),
+    )
+
+
 # -------- Get listing --------
 @router.get("/{listing_id}", response_model=ListingOut)
-def get_listing(listing_id: int, db: Session = Depends(deps.get_db)):
-    obj = db.query(Listing).filter(Listing.id == listing_id).first()
-    if not obj:
-        raise HTTPException(status_code=404, detail="Listing not found")
-    return obj
+async def get_listing(listing_id: int, request: Request, db: AsyncSession = Depends(deps.get_async_db)):
+    async def render() -> bytes:
+        obj = await db.get(Listing, listing_id)
+        if not obj:
+            raise HTTPException(status_code=404, detail="Listing not found")
+        return ListingOut.model_validate(obj).model_dump_json().encode()
+
+    return await response_cache.respond(request, "listing", {"id": listing_id}, [f"listing:{listing_id}"], render)
 
 
 # -------- Update listing --------
 @router.patch("/{listing_id}", response_model=ListingOut)
-def update_listing(
+async def update_listing(
     listing_id: int,
     payload: ListingUpdate,
-    db: Session = Depends(deps.get_db),
-    user: User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: Principal = Depends(deps.get_current_user),
 ):
-    obj = db.query(Listing).filter(Listing.id == listing_id).first()
+    obj = await db.get(Listing, listing_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Listing not found")
     if obj.owner_id != user.id:
@@ -93,23 +253,29 @@ def update_listing(
     if not user.is_verified:
         raise HTTPException(status_code=403, detail="User must be verified")
 
-    for f, v in payload.model_dump(exclude_unset=True).items():
+    old_category = obj.category
+    changes = payload.model_dump(exclude_unset=True)
+    for f, v in changes.items():
         setattr(obj, f, v)
+    if "images" in changes:
+        obj.image_variants = None  # derived from the previous images
 
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
+    await response_cache.invalidate(*listing_scopes(listing_id, old_category, obj.category))
+    await listing_events.publish("updated", obj, user.university, old_category=old_category)
     return obj
 
 
 # -------- Patch status --------
 @router.patch("/{listing_id}/status", response_model=ListingOut)
-def patch_status(
+async def patch_status(
     listing_id: int,
     payload: ListingStatusPatch,
-    db: Session = Depends(deps.get_db),
-    user: User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: Principal = Depends(deps.get_current_user),
 ):
-    obj = db.query(Listing).filter(Listing.id == listing_id).first()
+    obj = await db.get(Listing, listing_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Listing not found")
     if obj.owner_id != user.id:
@@ -118,19 +284,21 @@ def patch_status(
         raise HTTPException(status_code=422, detail="Invalid status")
 
     obj.status = payload.status
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
+    await response_cache.invalidate(*listing_scopes(listing_id, obj.category))
+    await listing_events.publish("status", obj, user.university)
     return obj
 
 
 # -------- Delete listing --------
 @router.delete("/{listing_id}", status_code=204)
-def delete_listing(
+async def delete_listing(
     listing_id: int,
-    db: Session = Depends(deps.get_db),
-    user: User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: Principal = Depends(deps.get_current_user),
 ):
-    obj = db.query(Listing).filter(Listing.id == listing_id).first()
+    obj = await db.get(Listing, listing_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Listing not found")
     if obj.owner_id != user.id:
@@ -138,5 +306,7 @@ def delete_listing(
     if not user.is_verified:
         raise HTTPException(status_code=403, detail="User must be verified")
 
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
+    await response_cache.invalidate(*listing_scopes(listing_id, obj.category))
+    await listing_events.publish("deleted", obj, user.university)
@@ -1,11 +1,84 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.api.deps import get_db, get_current_user
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db, get_current_user
+from app.core.config import settings
 from app.models.notification import Notification
+from app.schemas.notification import MarkRead, UnreadCount
+from app.services.notifications import mark_read, notification_hub, notification_out
+from app.utils.sse import format_event, sse_response, stream
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
 @router.get("")
-def list_notifications(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    rows = db.query(Notification).filter(Notification.user_id == user.id).order_by(Notification.id.desc()).limit(50).all()
-    return [{"id": n.id, "type": n.type, "payload": n.payload, "is_read": n.is_read, "created_at": n.created_at.isoformat()} for n in rows]
+async def list_notifications(
+    before: Optional[int] = Query(None, description="Only notifications with a lower id (pass the last id of the previous page)"),
+    limit: int = Query(50, ge=1, le=100),
+    unread_only: bool = Query(False),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user),
+):
+    # Keyset over (user_id, id): ix_notifications_user_id_id, or the unread partial index
+    stmt = select(Notification).where(Notification.user_id == user.id)
+    if before is not None:
+        stmt = stmt.where(Notification.id < before)
+    if unread_only:
+        stmt = stmt.where(~Notification.is_read)
+    rows = (await db.scalars(stmt.order_by(Notification.id.desc()).limit(limit))).all()
+    return [{k: v for k, v in notification_out(n).items() if k != "user_id"} for n in rows]
+
+@router.get("/unread-count", response_model=UnreadCount)
+async def unread_count(user=Depends(get_current_user)):
+    return UnreadCount(unread=await notification_hub.unread_count(user.id))
+
+@router.post("/mark-read", response_model=UnreadCount)
+async def mark_notifications_read(payload: MarkRead, db: AsyncSession = Depends(get_async_db), user=Depends(get_current_user)):
+    """Mark everything up to a watermark id as read (e.g. the newest one the client has shown)."""
+    # The count before (cached, or loaded outside this uncommitted transaction) minus what was marked
+    unread = await notification_hub.unread_count(user.id)
+    remaining = max(unread - await mark_read(db, user.id, payload.up_to_id), 0)
+    await db.commit()
+    await notification_hub.read(user.id, payload.up_to_id, remaining)
+    return UnreadCount(unread=remaining)
+
+@router.get("/stream")
+async def notification_stream(
+    last_event_id: Optional[int] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user),
+):
+    """
+    Server-Sent Events: an `unread` event with the current count, then a `notification`
+    event per new notification and a `read` event per mark-read. On reconnect the browser
+    sends Last-Event-ID and the notifications created in between are replayed first.
+    """
+    # Subscribe before reading the backlog so nothing falls in between; stream() skips the overlap
+    queue = notification_hub.connect(user.id)
+    sent_through = None
+    try:
+        initial = [format_event({"unread": await notification_hub.unread_count(user.id)}, event="unread")]
+        if last_event_id is not None:
+            limit = settings.NOTIFICATION_REPLAY_LIMIT
+            missed = (await db.scalars(
+                select(Notification)
+                .where(Notification.user_id == user.id, Notification.id > last_event_id)
+                .order_by(Notification.id)
+                .limit(limit + 1)
+            )).all()
+            if len(missed) > limit:
+                # Too far behind to replay; the client reloads the list with GET /notifications
+                initial.append(format_event({}, event="resync", id=missed[-1].id))
+            else:
+                initial += [format_event(notification_out(n), event="notification", id=n.id) for n in missed]
+            sent_through = missed[-1].id if missed else last_event_id
+    except BaseException:
+        notification_hub.disconnect(user.id, queue)
+        raise
+    finally:
+        await db.close()  # return the connection to the pool; the stream may stay open for hours
+
+    return sse_response(
+        stream(queue, settings.SSE_HEARTBEAT_SECONDS, initial, sent_through),
+        on_close=lambda: notification_hub.disconnect(user.id, queue),
+    )
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.api.deps import get_db, get_current_user, get_current_admin
+from app.api.deps import get_async_db, get_current_user, get_current_admin
 from app.models.report import Report, ReportStatus
 from app.models.listing import Listing
 from app.schemas.report import ReportCreate, ReportOut
@@ -11,9 +12,9 @@ router = APIRouter(prefix="/reports", tags=["Reports"])
 
 
 @router.post("/", response_model=ReportOut)
-def create_report(
+async def create_report(
     payload: ReportCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user)
 ):
     # Require at least reported_listing_id or reported_user_id
@@ -22,7 +23,7 @@ def create_report(
 
     # Validate listing existence if listing_id present
     if payload.reported_listing_id:
-        listing_exists = db.query(Listing).filter(Listing.id == payload.reported_listing_id).first()
+        listing_exists = await db.get(Listing, payload.reported_listing_id)
         if not listing_exists:
             raise HTTPException(status_code=400, detail="Reported listing does not exist.")
 
@@ -33,36 +34,36 @@ def create_report(
         reason=payload.reason,
     )
     db.add(report)
-    db.commit()
-    db.refresh(report)
+    await db.commit()
+    await db.refresh(report)
     return report
 
 
 @router.get("/", response_model=List[ReportOut], dependencies=[Depends(get_current_admin)])
-def list_reports(
-    db: Session = Depends(get_db),
+async def list_reports(
+    db: AsyncSession = Depends(get_async_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, le=200),
 ):
-    reports = db.query(Report).order_by(Report.created_at.desc()).offset(skip).limit(limit).all()
+    reports = (await db.scalars(select(Report).order_by(Report.created_at.desc()).offset(skip).limit(limit))).all()
     return reports
 
 
 @router.post("/{report_id}/action", response_model=ReportOut, dependencies=[Depends(get_current_admin)])
-def review_report(
+async def review_report(
     report_id: int,
     status: ReportStatus,
     audit_log: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_admin=Depends(get_current_admin),
 ):
-    report = db.query(Report).filter(Report.id == report_id).first()
+    report = await db.get(Report, report_id)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     report.status = status
     report.audit_log = audit_log
     report.reviewed_by = current_admin.id
     report.reviewed_at = datetime.utcnow()
-    db.commit()
-    db.refresh(report)
+    await db.commit()
+    await db.refresh(report)
     return report
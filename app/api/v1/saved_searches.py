@@ -0,0 +1,40 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db, get_current_user
+from app.core.config import settings
+from app.core.principal import Principal
+from app.models.saved_search import SavedSearch
+from app.models.user import User
+from app.schemas.saved_search import SavedSearchCreate, SavedSearchOut
+from app.services.saved_searches import build_saved_search
+
+router = APIRouter(prefix="/saved-searches", tags=["Saved searches"])
+
+@router.post("", response_model=SavedSearchOut, status_code=201)
+async def create_saved_search(payload: SavedSearchCreate, db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user)):
+    """Save search filters; new listings matching them arrive as `saved_search` notifications."""
+    # Lock the user's row so concurrent creates are counted one after another and cannot overshoot the limit
+    await db.execute(select(User.id).where(User.id == user.id).with_for_update())
+    count = await db.scalar(select(func.count()).select_from(SavedSearch).where(SavedSearch.user_id == user.id))
+    if count >= settings.SAVED_SEARCH_MAX_PER_USER:
+        raise HTTPException(status_code=409, detail=f"At most {settings.SAVED_SEARCH_MAX_PER_USER} saved searches")
+    obj = build_saved_search(user.id, payload)
+    db.add(obj)
+    await db.commit()
+    await db.refresh(obj)
+    return obj
+
+@router.get("", response_model=List[SavedSearchOut])
+async def list_saved_searches(db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user)):
+    rows = await db.scalars(select(SavedSearch).where(SavedSearch.user_id == user.id).order_by(SavedSearch.id.desc()))
+    return rows.all()
+
+@router.delete("/{search_id}", status_code=204)
+async def delete_saved_search(search_id: int, db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user)):
+    obj = await db.get(SavedSearch, search_id)
+    if not obj or obj.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Saved search not found")
+    await db.delete(obj)
+    await db.commit()
@@ -1,60 +1,167 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, tuple_
 from typing import Optional
 
-from app.api.deps import get_db
+from app.api.deps import get_async_db
+from app.core.config import settings
 from app.models.listing import Listing
+from app.services.cache import dumps, response_cache
+from app.utils.pagination import encode_cursor, decode_cursor, coerce_cursor_value, estimate_count
 
 router = APIRouter(tags=["Search"])
 
+# Columns a client may sort by; every sort is tie-broken on id so keyset cursors are stable
+SORT_FIELDS = {
+    "id": Listing.id,
+    "title": Listing.title,
+    "category": Listing.category,
+    "price": Listing.price,
+    "status": Listing.status,
+    "owner_id": Listing.owner_id,
+    "created_at": Listing.created_at,
+    "updated_at": Listing.updated_at,
+    "popularity": Listing.favorite_count,
+}
+
 @router.get("/listings/search")
-def search_listings(
+async def search_listings(
+    request: Request,
     q: Optional[str] = Query(None, description="Search keyword"),
     category: Optional[str] = Query(None, description="Filter by category"),
     min_price: Optional[float] = Query(None, ge=0, description="Minimum price"),
     max_price: Optional[float] = Query(None, ge=0, description="Maximum price"),
     university: Optional[str] = Query(None, description="Filter by university"),
-    sort_by: str = Query("created_at", description="Sort field"),
+    status: Optional[str] = Query(None, regex="^(ACTIVE|SOLD|ARCHIVED)$", description="Filter by listing status"),
+    sort_by: str = Query("created_at", description="Sort field (e.g. created_at, price, popularity), or relevance when q is given"),
     sort_order: str = Query("desc", regex="^(asc|desc)$", description="Sort order"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=100, description="Page size"),
-    db: Session = Depends(get_db)
+    pagination: str = Query("offset", regex="^(offset|cursor)$", description="offset (page numbers) or cursor (keyset, for infinite scroll)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous response; implies cursor pagination"),
+    total: Optional[str] = Query(None, regex="^(exact|estimate|none)$", description="Total count mode; defaults to exact for offset and none for cursor pagination"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Listing)
+    params = dict(
+        # plainto_tsquery folds case and whitespace anyway; normalizing here lets equivalent searches share a cache entry
+        q=" ".join(q.lower().split()) if q else None,
+        category=category, min_price=min_price, max_price=max_price, university=university, status=status,
+        sort_by=sort_by, sort_order=sort_order, page=page, page_size=page_size,
+        pagination=pagination, cursor=cursor, total=total,
+    )
+    cursor_mode = pagination == "cursor" or cursor is not None
+    first_pages = cursor is None if cursor_mode else page <= settings.SEARCH_CACHE_MAX_PAGE
+    if not first_pages:
+        return await _run_search(db, **params)
+
+    async def render() -> bytes:
+        return dumps(await _run_search(db, **params))
+
+    # A category filter limits the result to listings of that category, so only their writes matter
+    scopes = [f"category:{category}"] if category else ["search"]
+    return await response_cache.respond(request, "search", params, scopes, render)
+
+
+async def _run_search(
+    db: AsyncSession,
+    q: Optional[str],
+    category: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    university: Optional[str],
+    status: Optional[str],
+    sort_by: str,
+    sort_order: str,
+    page: int,
+    page_size: int,
+    pagination: str,
+    cursor: Optional[str],
+    total: Optional[str],
+) -> dict:
+    query = select(Listing)
 
     # Full-text search
+    ts_query = None
     if q:
         ts_query = func.plainto_tsquery('english', q)
-        query = query.filter(Listing.search_vector.op('@@')(ts_query))
+        query = query.where(Listing.search_vector.op('@@')(ts_query))
 
     # Filters
     if category:
-        query = query.filter(Listing.category == category)
+        query = query.where(Listing.category == category)
+    if status:
+        query = query.where(Listing.status == status)
     if university:
-        query = query.filter(Listing.owner.has(university=university))  # Assuming university on User model; adjust if different
+        query = query.where(Listing.owner.has(university=university))  # Assuming university on User model; adjust if different
     if min_price is not None:
-        query = query.filter(Listing.price >= min_price)
+        query = query.where(Listing.price >= min_price)
     if max_price is not None:
-        query = query.filter(Listing.price <= max_price)
+        query = query.where(Listing.price <= max_price)
 
     # Sorting
-    sort_column = getattr(Listing, sort_by, None)
-    if not sort_column:
-        raise HTTPException(status_code=400, detail=f"Invalid sort field: {sort_by}")
+    if sort_by == "relevance":
+        if ts_query is None:
+            raise HTTPException(status_code=400, detail="Sorting by relevance requires q")
+        sort_column = func.ts_rank(Listing.search_vector, ts_query)
+        sort_type = float
+    else:
+        sort_column = SORT_FIELDS.get(sort_by)
+        if sort_column is None:
+            raise HTTPException(status_code=400, detail=f"Invalid sort field: {sort_by}")
+        sort_type = sort_column.type.python_type
 
     if sort_order == 'desc':
-        query = query.order_by(sort_column.desc())
+        order_by = [sort_column.desc(), Listing.id.desc()]
     else:
-        query = query.order_by(sort_column.asc())
+        order_by = [sort_column.asc(), Listing.id.asc()]
+
+    cursor_mode = pagination == "cursor" or cursor is not None
+    total_mode = total or ("none" if cursor_mode else "exact")
+
+    # Count before the keyset predicate is applied so it reflects the whole result set
+    count = None
+    if total_mode == "exact":
+        count = await db.scalar(select(func.count()).select_from(query.subquery()))
+    elif total_mode == "estimate":
+        count = await estimate_count(db, query)
+
+    if not cursor_mode:
+        result = await db.scalars(query.order_by(*order_by).offset((page - 1) * page_size).limit(page_size))
+        listings = result.all()
+        return {
+            "total": count,
+            "page": page,
+            "page_size": page_size,
+            "results": [listing.to_dict() for listing in listings]
+        }
+
+    # Keyset pagination: seek past the last row seen instead of counting skipped rows
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+            if position["s"] != sort_by or position["o"] != sort_order:
+                raise ValueError("Cursor does not match sort")
+            last_value = coerce_cursor_value(position["v"], sort_type)
+            last_id = int(position["id"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+        key = tuple_(sort_column, Listing.id)
+        bound = tuple_(last_value, last_id)
+        query = query.where(key < bound if sort_order == 'desc' else key > bound)
 
-    # Pagination
-    total = query.count()
-    listings = query.offset((page - 1) * page_size).limit(page_size).all()
+    result = await db.execute(query.add_columns(sort_column.label("sort_key")).order_by(*order_by).limit(page_size + 1))
+    rows = result.all()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor({"s": sort_by, "o": sort_order, "v": last.sort_key, "id": last.Listing.id})
+    listings = [row.Listing for row in rows]
 
     return {
-        "total": total,
-        "page": page,
+        "total": count,
         "page_size": page_size,
+        "next_cursor": next_cursor,
         "results": [listing.to_dict() for listing in listings]
     }
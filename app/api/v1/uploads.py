@@ -0,0 +1,146 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.utils.storage_backends import LocalStorage, MemoryStorage, storage
+
+# Mounted at the site root (not under /api/v1) so the URLs from public_url_for_key resolve
+router = APIRouter(tags=["Uploads"])
+
+mimetypes.add_type("image/webp", ".webp")
+
+# Objects under listings/ are written once: ingest publishes each sanitized image under a
+# fresh UUID key and never rewrites it (uploads wait under incoming/, not served here), so
+# any cache may keep them forever
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 64 * 1024
+# Precompressed siblings (<file>.br, <file>.gz) served when the client accepts them
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _resolve_key(path: str) -> str:
+    """
+    Map a URL path to a storage key under listings/, rejecting anything else. URLs issued
+    before keys kept their listings/ prefix (/uploads/<uuid>.jpg) map to the same objects.
+    ID documents and any other prefix are never served here.
+    """
+    key = posixpath.normpath(path)
+    if path != key or key.startswith(("/", "..")) or "\x00" in key:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not key.startswith("listings/"):
+        key = f"listings/{key}"
+    return key
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single byte range; None to ignore the header, ValueError if unsatisfiable."""
+    m = _RANGE.match(header.strip())
+    if not m or m.group(1) == m.group(2) == "":
+        return None  # malformed or multi-range: serve the whole file
+    if m.group(1) == "":
+        length = int(m.group(2))  # suffix range: the last N bytes
+        if length == 0:
+            raise ValueError
+        return max(size - length, 0), size - 1
+    start = int(m.group(1))
+    end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+async def _read_range(path: str, start: int, length: int):
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        while length > 0:
+            data = await f.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+@router.api_route("/uploads/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_upload(path: str, request: Request):
+    """
+    Serve listing images when STORAGE_BACKEND is LOCAL (or MEMORY). Responses are cacheable
+    forever and revalidate with ETag/If-None-Match; single byte ranges are honoured.
+    """
+    key = _resolve_key(path)
+    media_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+    headers = {"Cache-Control": CACHE_CONTROL, "Accept-Ranges": "bytes"}
+
+    if isinstance(storage, MemoryStorage):
+        try:
+            data = await run_in_threadpool(storage.get_bytes, key)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Not found")
+        headers["ETag"] = f'"{hashlib.md5(data).hexdigest()}"'
+        if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return Response(data, media_type=media_type, headers=headers)
+
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=404, detail="Not found")  # S3 objects are served by S3/CDN
+
+    root = os.path.realpath(storage.root)
+    file_path = os.path.realpath(storage.path(key))
+    if not file_path.startswith(root + os.sep):
+        raise HTTPException(status_code=404, detail="Not found")  # symlink out of the upload dir
+    try:
+        st = await run_in_threadpool(os.stat, file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    # A precompressed sibling is its own representation (own ETag); ranges always address the identity file
+    range_header = request.headers.get("range")
+    encoding, serve_path = None, file_path
+    if not range_header:
+        accept = request.headers.get("accept-encoding", "")
+        for candidate, suffix in ENCODINGS:
+            if candidate in accept and await run_in_threadpool(os.path.isfile, file_path + suffix):
+                encoding, serve_path = candidate, file_path + suffix
+                break
+
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    headers["ETag"] = f'"{st.st_mtime_ns:x}-{st.st_size:x}-{encoding}"' if encoding else etag
+    headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if range_header and request.headers.get("if-range") in (None, etag):
+        try:
+            byte_range = _parse_range(range_header, st.st_size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{st.st_size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{st.st_size}"
+            headers["Content-Length"] = str(length)
+            body = _read_range(file_path, start, length) if request.method == "GET" else iter(())
+            return StreamingResponse(body, status_code=206, media_type=media_type, headers=headers)
+
+    # Zero-copy (sendfile where the server supports it) for whole files
+    return FileResponse(serve_path, media_type=media_type, headers=headers, stat_result=None if encoding else st)
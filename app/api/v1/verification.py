@@ -1,26 +1,37 @@
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from pydantic import BaseModel, EmailStr
-from sqlalchemy.orm import Session
-from app.api.deps import get_db, get_current_user, get_current_admin
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.api.deps import get_async_db, get_current_user, get_current_admin
 from app.core.config import settings, allowed_domains
 from app.models.user import User
+from app.core.principal import Principal, principal_cache
 from app.models.verification import Verification
 from app.schemas.verification import OTPVerify, VerificationRequest
-from app.utils.emailer import send_email
-from app.utils.storage import save_upload
+from app.services.jobs import enqueue_email
+from app.services.notifications import create_notifications, notification_hub
+from app.utils.storage import UploadTooLarge, save_upload
 
 router = APIRouter(prefix="/verification", tags=["Verification"])
 
 
+def _decision_key(ver: Verification, decision: str) -> str:
+    """One decision email per verification request; a retried admin call does not send it twice."""
+    cycle = int(ver.otp_expires_at.timestamp()) if ver.otp_expires_at else 0
+    return f"verification-{decision}:{ver.user_id}:{cycle}"
+
+
 
 @router.post("/request")
-def request_verification(payload: VerificationRequest, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+async def request_verification(payload: VerificationRequest, db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user)):
     domain = payload.university_email.split("@")[-1].lower()
     if domain not in allowed_domains():
         raise HTTPException(status_code=400, detail="Email domain not allowed")
-    ver = db.query(Verification).filter(Verification.user_id == user.id).first()
+    ver = await db.scalar(select(Verification).where(Verification.user_id == user.id))
     now = datetime.now(timezone.utc)
     expires = now + timedelta(seconds=settings.OTP_TTL_SECONDS)
     import random
@@ -41,13 +52,18 @@ def request_verification(payload: VerificationRequest, db: Session = Depends(get
         ver.status = "pending"
         ver.otp_code = otp
         ver.otp_expires_at = expires
-    db.commit()
-    send_email(payload.university_email, "Your OTP Code", f"Your verification code is: {otp}. It expires in {settings.OTP_TTL_SECONDS//60} minutes.")
+    # Sent by the job worker once this transaction commits
+    await enqueue_email(
+        db, payload.university_email, "Your OTP Code",
+        f"Your verification code is: {otp}. It expires in {settings.OTP_TTL_SECONDS//60} minutes.",
+        idempotency_key=f"verification-otp:{user.id}:{uuid.uuid4().hex}",  # one email per issued code
+    )
+    await db.commit()
     return {"message": "OTP sent to university email"}
 
 @router.post("/verify-otp")
-def verify_otp(payload: OTPVerify, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    ver = db.query(Verification).filter(Verification.user_id == user.id).first()
+async def verify_otp(payload: OTPVerify, db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user)):
+    ver = await db.scalar(select(Verification).where(Verification.user_id == user.id))
     if not ver or not ver.otp_code:
         raise HTTPException(status_code=400, detail="No verification request found")
     now = datetime.now(timezone.utc)
@@ -56,62 +72,70 @@ def verify_otp(payload: OTPVerify, db: Session = Depends(get_db), user: User = D
     if payload.otp_code != ver.otp_code:
         raise HTTPException(status_code=400, detail="Invalid OTP")
     ver.otp_code = None
-    db.commit()
+    await db.commit()
     return {"message": "OTP verified. You can now upload your ID."}
 
 @router.post("/upload-id")
-def upload_id(file: UploadFile = File(...), db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    ver = db.query(Verification).filter(Verification.user_id == user.id).first()
+async def upload_id(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user)):
+    ver = await db.scalar(select(Verification).where(Verification.user_id == user.id))
     if not ver:
         raise HTTPException(status_code=400, detail="No verification request found")
-    path = save_upload(file, subdir="ids")
+    try:
+        path = await run_in_threadpool(save_upload, file, subdir="ids")
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     ver.id_document_url = path
-    db.commit()
+    await db.commit()
     return {"message": "ID uploaded. Waiting for admin review."}
 
 @router.get("/status")
-def status(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    ver = db.query(Verification).filter(Verification.user_id == user.id).first()
+async def status(db: AsyncSession = Depends(get_async_db), user: Principal = Depends(get_current_user)):
+    ver = await db.scalar(select(Verification).where(Verification.user_id == user.id))
     return {"status": ver.status if ver else "unverified", "id_document_url": ver.id_document_url if ver else None}
 
 @router.get("/pending")
-def pending(db: Session = Depends(get_db), admin: User = Depends(get_current_admin)):
-    items = db.query(Verification).filter(Verification.status == "pending").all()
+async def pending(db: AsyncSession = Depends(get_async_db), admin: Principal = Depends(get_current_admin)):
+    items = (await db.scalars(select(Verification).where(Verification.status == "pending"))).all()
     return [{"user_id": v.user_id, "email": v.university_email, "student_id": v.student_id, "id_document_url": v.id_document_url} for v in items]
 
 @router.post("/approve/{user_id}")
-def approve(user_id: int, db: Session = Depends(get_db), admin: User = Depends(get_current_admin)):
-    ver = db.query(Verification).filter(Verification.user_id == user_id).first()
-    user = db.query(User).filter(User.id == user_id).first()
+async def approve(user_id: int, db: AsyncSession = Depends(get_async_db), admin: Principal = Depends(get_current_admin)):
+    ver = await db.scalar(select(Verification).where(Verification.user_id == user_id))
+    user = await db.get(User, user_id)
     if not ver or not user:
         raise HTTPException(status_code=404, detail="Verification or user not found")
     
     ver.status = "verified"
     user.is_verified = True
-    db.commit()
-    
-    # Send email notification to the user
+
+    # Send email notification to the user (queued in the same transaction)
     subject = "Your Verification Has Been Approved"
     body = f"Hello {user.email},\n\nYour university email verification has been approved. You are now a verified member of Campus Exchange.\n\nThank you,\nThe Campus Exchange Team"
-    send_email(user.email, subject, body) # 📧
+    await enqueue_email(db, user.email, subject, body, idempotency_key=_decision_key(ver, "approved")) # 📧
+    events = await create_notifications(db, [(user_id, "verification", {"status": "verified"})])
+    await db.commit()
+    await principal_cache.changed(user_id)
+    await notification_hub.publish(events)
     
     return {"message": "User verified"}
 
 @router.post("/reject/{user_id}")
-def reject(user_id: int, db: Session = Depends(get_db), admin: User = Depends(get_current_admin)):
-    ver = db.query(Verification).filter(Verification.user_id == user_id).first()
+async def reject(user_id: int, db: AsyncSession = Depends(get_async_db), admin: Principal = Depends(get_current_admin)):
+    ver = await db.scalar(select(Verification).where(Verification.user_id == user_id))
     
     if not ver:
         raise HTTPException(status_code=404, detail="Verification not found")
         
-    user = db.query(User).filter(User.id == user_id).first() # Fetch user to get email for notification
+    user = await db.get(User, user_id) # Fetch user to get email for notification
     ver.status = "rejected"
-    db.commit()
 
-    # Send email notification to the user if user object exists
+    # Send email notification to the user if user object exists (queued in the same transaction)
     if user: # Only attempt to send email if user was found
         subject = "Your Verification Has Been Rejected"
         body = f"Hello {user.email},\n\nYour university email verification has been rejected. Please review your submission and try again if necessary.\n\nThank you,\nThe Campus Exchange Team"
-        send_email(user.email, subject, body) # 📧
+        await enqueue_email(db, user.email, subject, body, idempotency_key=_decision_key(ver, "rejected")) # 📧
+    events = await create_notifications(db, [(user_id, "verification", {"status": "rejected"})] if user else [])
+    await db.commit()
+    await notification_hub.publish(events)
 
     return {"message": "Verification rejected"}
\ No newline at end of file
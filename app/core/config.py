@@ -1,6 +1,11 @@
 from typing import List, Literal, Optional
 from pydantic import AnyHttpUrl, field_validator
 from pydantic_settings import BaseSettings
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# DATABASE_URL is written for psycopg2 (libpq); see Settings.SQLALCHEMY_ASYNC_DATABASE_URI
+_ASYNCPG_PARAM_NAMES = {"sslmode": "ssl"}
+_LIBPQ_ONLY_PARAMS = {"connect_timeout", "application_name", "keepalives", "keepalives_idle", "keepalives_interval", "keepalives_count"}
 
 
 class Settings(BaseSettings):
@@ -13,6 +18,20 @@ class Settings(BaseSettings):
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRE_MINUTES: int = 60
+    # Connection pool, applied per engine in each worker process.
+    # DB_POOL_MODE=NULL disables app-side pooling (and asyncpg prepared-statement
+    # caching) so the app can sit behind pgbouncer in transaction pooling mode.
+    DB_POOL_MODE: Literal["QUEUE", "NULL"] = "QUEUE"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800  # seconds; -1 disables recycling
+    DB_POOL_PRE_PING: bool = True
+
+    # Per-process cache of authenticated users' flags; 0 disables it.
+    # Changes are fanned out over the broker; the TTL bounds staleness if a message is missed.
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_SIZE: int = 10000
 
     # CORS
     CORS_ORIGINS: List[AnyHttpUrl] | List[str] = []
@@ -30,14 +49,99 @@ class Settings(BaseSettings):
     MAIL_FROM_NAME: str = "Campus Exchange"
     MAIL_STARTTLS: bool = True
     MAIL_SSL_TLS: bool = False
+    # Authenticated SMTP sessions kept open and reused across messages (per process)
+    MAIL_POOL_SIZE: int = 4
+    MAIL_POOL_MAX_MESSAGES: int = 100  # then reconnect; many providers cap messages per session
+    MAIL_POOL_IDLE_SECONDS: float = 60.0  # servers drop idle clients; older sessions are not reused
 
     # Verification
     ALLOWED_EMAIL_DOMAINS: str = "uni.edu,college.edu,cuiatk.edu,cuiatk.edu.pk"
     OTP_TTL_SECONDS: int = 600
 
+    # Pub/sub broker for cross-worker fan-out (chat rooms, etc.)
+    # MEMORY: single process only. POSTGRES: LISTEN/NOTIFY; LISTEN needs a session-level
+    # connection, so behind pgbouncer point BROKER_DATABASE_URL at Postgres directly.
+    BROKER_BACKEND: Literal["MEMORY", "POSTGRES", "REDIS"] = "MEMORY"
+    BROKER_DATABASE_URL: Optional[str] = None
+    REDIS_URL: Optional[str] = None
+
+    # Chat delivery: each socket has a bounded outbound queue drained by its own writer.
+    # When a queue is full the message is dropped (DROP) or the socket is closed (DISCONNECT);
+    # a send that takes longer than the timeout always closes the socket.
+    CHAT_SEND_QUEUE_SIZE: int = 256
+    CHAT_SEND_TIMEOUT_SECONDS: float = 10.0
+    CHAT_SLOW_CONSUMER_POLICY: Literal["DROP", "DISCONNECT"] = "DISCONNECT"
+    # Longest message content accepted, measured escaped and JSON-encoded as the broker sends
+    # it; keeps every broadcast well under the 7900-byte NOTIFY payload limit
+    CHAT_MAX_MESSAGE_BYTES: int = 4000
+
+    # Chat write-behind: when enabled, message ids are reserved from the id sequence up front,
+    # messages are broadcast immediately and inserted in batches at most every
+    # CHAT_FLUSH_INTERVAL_MS (or as soon as CHAT_FLUSH_BATCH_SIZE are pending).
+    CHAT_WRITE_BEHIND: bool = False
+    CHAT_FLUSH_INTERVAL_MS: int = 100
+    CHAT_FLUSH_BATCH_SIZE: int = 500
+    CHAT_ID_BLOCK_SIZE: int = 100
+    # After this many failed flushes in a row, new messages bypass write-behind and are
+    # inserted synchronously (or rejected) instead of being acknowledged unsaved.
+    CHAT_FLUSH_MAX_FAILURES: int = 5
+
+    # Per-process cache of each user's block relations, loaded on first use. Changes are
+    # pushed to every worker over the broker; the TTL bounds staleness if one is missed.
+    BLOCK_CACHE_TTL_SECONDS: int = 300
+    BLOCK_CACHE_MAX_SIZE: int = 10000
+
+    # Server-Sent Events streams send a comment line after this many idle seconds so
+    # proxies and load balancers keep the connection open.
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+
+    # Notifications pushed over GET /notifications/stream (SSE). A stream whose queue fills up
+    # is closed; the client reconnects with Last-Event-ID and up to NOTIFICATION_REPLAY_LIMIT
+    # missed notifications are replayed. Unread counts are cached per process.
+    NOTIFICATION_QUEUE_SIZE: int = 100
+    NOTIFICATION_REPLAY_LIMIT: int = 200
+    NOTIFICATION_UNREAD_TTL_SECONDS: int = 60
+    NOTIFICATION_UNREAD_CACHE_SIZE: int = 10000
+
+    # Saved searches are matched against every new listing (app/services/saved_searches.py)
+    SAVED_SEARCH_MAX_PER_USER: int = 20
+
+    # Listing changes pushed over GET /listings/stream (SSE). Each worker keeps the last
+    # LISTING_STREAM_BUFFER_SIZE events so a reconnecting client can resume from Last-Event-ID.
+    LISTING_STREAM_BUFFER_SIZE: int = 1000
+    LISTING_STREAM_QUEUE_SIZE: int = 100
+
+    # Response cache for hot reads (app/services/cache.py). MEMORY is per worker, with
+    # invalidations fanned out over the broker; REDIS (REDIS_URL) is shared; NONE disables it.
+    CACHE_BACKEND: Literal["MEMORY", "REDIS", "NONE"] = "MEMORY"
+    CACHE_TTL_SECONDS: int = 300
+    CACHE_MAX_ENTRIES: int = 10000
+    SEARCH_CACHE_MAX_PAGE: int = 3  # only the first pages of a search are cached
+
+    # Background jobs (app/services/jobs.py, run by `python -m app.worker`).
+    # Failed jobs are retried after JOB_RETRY_BASE_SECONDS * 2^(attempt-1), capped;
+    # a handler running longer than JOB_LOCK_TIMEOUT_SECONDS is cancelled and the attempt counts
+    # as failed; a job whose worker died is requeued by the others once its lease is that old
+    # (or failed, if that was its last attempt), and a late outcome is discarded.
+    JOB_WORKER_CONCURRENCY: int = 4
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_SECONDS: int = 10
+    JOB_RETRY_MAX_SECONDS: int = 3600
+    JOB_LOCK_TIMEOUT_SECONDS: int = 600
+    # Listing.favorite_count is kept in step by the favorites endpoints and recomputed
+    # by a periodic job in case anything writes favorites behind their back.
+    FAVORITE_RECONCILE_INTERVAL_SECONDS: int = 6 * 3600
+    FAVORITE_RECONCILE_BATCH_SIZE: int = 5000
+
     # Storage
-    STORAGE_BACKEND: Literal["LOCAL", "S3"] = "LOCAL"
+    STORAGE_BACKEND: Literal["LOCAL", "S3", "MEMORY"] = "LOCAL"  # MEMORY: process-local, for tests
     UPLOAD_DIR: str = "./uploads"  # used when STORAGE_BACKEND=LOCAL
+    # Uploads are streamed in chunks of this size and rejected (413) once they exceed the limit
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024
+    IMAGE_WORKERS: int = 2  # processes deriving thumbnails/WebP variants of listing images
+    UPLOAD_URL_TTL_SECONDS: int = 900  # validity of presigned (or LOCAL signed) upload URLs
 
     # AWS S3 settings (for production)
     S3_BUCKET: Optional[str] = None
@@ -45,6 +149,15 @@ class Settings(BaseSettings):
     S3_ACCESS_KEY: Optional[str] = None
     S3_SECRET_KEY: Optional[str] = None
     S3_PUBLIC_BASE_URL: Optional[str] = None  # e.g. https://bucket.s3.ap-south-1.amazonaws.com
+    S3_ENDPOINT_URL: Optional[str] = None  # S3-compatible endpoint (MinIO, moto server); None for AWS
+    # One client per process is shared by every request thread; its connection pool should
+    # cover the thread pool plus multipart concurrency.
+    S3_MAX_POOL_CONNECTIONS: int = 50
+    S3_MAX_ATTEMPTS: int = 5
+    S3_RETRY_MODE: Literal["legacy", "standard", "adaptive"] = "standard"
+    S3_MULTIPART_THRESHOLD: int = 8 * 1024 * 1024
+    S3_MULTIPART_CHUNKSIZE: int = 8 * 1024 * 1024
+    S3_MAX_CONCURRENCY: int = 4  # parts uploaded in parallel per multipart upload
 
     @field_validator("CORS_ORIGINS", mode="before")
     @classmethod
@@ -60,6 +173,23 @@ class Settings(BaseSettings):
             uri = uri.replace("postgres://", "postgresql://", 1)
         return uri
 
+    @property
+    def SQLALCHEMY_ASYNC_DATABASE_URI(self) -> str:
+        uri = self.SQLALCHEMY_DATABASE_URI
+        for prefix in ("postgresql+psycopg2://", "postgresql://"):
+            if uri.startswith(prefix):
+                parts = urlsplit(uri.replace(prefix, "postgresql+asyncpg://", 1))
+                # libpq parameters asyncpg does not take: sslmode is `ssl` there (same values);
+                # the client-side tuning ones have no asyncpg counterpart and are dropped.
+                # Anything else is passed through so asyncpg rejects it loudly.
+                query = [
+                    (_ASYNCPG_PARAM_NAMES.get(k, k), v)
+                    for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                    if k not in _LIBPQ_ONLY_PARAMS
+                ]
+                return urlunsplit(parts._replace(query=urlencode(query)))
+        return uri
+
     class Config:
         env_file = ".env"
         extra = "ignore"
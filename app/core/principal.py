@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.user import User
+from app.services.broker import Broker, broker
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Identity of the authenticated user plus the flags endpoints check."""
+    id: int
+    email: str
+    is_active: bool
+    is_admin: bool
+    is_verified: bool
+    university: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=bool(user.is_active),
+            is_admin=bool(user.is_admin),
+            is_verified=bool(user.is_verified),
+            university=user.university,
+        )
+
+
+class PrincipalCache:
+    """
+    Thread-safe, per-process TTL + LRU cache of principals keyed by user id.
+    When a user's flags change, `changed` drops the entry here and publishes the id on
+    the broker so every worker drops it too; the TTL bounds staleness if a message is
+    ever missed.
+
+    Each invalidation also moves the user's generation, so a load that read the database
+    before the change (see load_principal) cannot put the stale principal back.
+    """
+
+    CHANNEL = "principals"
+
+    def __init__(self, broker: Broker, ttl_seconds: int, max_size: int):
+        self.broker = broker
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Generations of recently invalidated users; trimmed by starting a new epoch,
+        # which only makes loads in flight at that moment skip caching their result
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def generation(self, user_id: int) -> Tuple[int, int]:
+        with self._lock:
+            return self._epoch, self._generations.get(user_id, 0)
+
+    def set(self, principal: Principal, generation: Optional[Tuple[int, int]] = None) -> None:
+        """Cache `principal`, unless it was invalidated since `generation` was taken."""
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(principal.id, 0)):
+                return
+            self._entries[principal.id] = (time.monotonic() + self.ttl_seconds, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+            if len(self._generations) >= self.max_size and user_id not in self._generations:
+                self._generations.clear()
+                self._epoch += 1
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    async def start(self) -> None:
+        await self.broker.subscribe(self.CHANNEL, self._on_change)
+
+    async def changed(self, *user_ids: int) -> None:
+        """Announce that these users' flags changed (call after commit)."""
+        for user_id in user_ids:
+            self.invalidate(user_id)  # this worker sees the change even before the broker echoes it
+        await self.broker.publish(self.CHANNEL, {"users": list(user_ids)})
+
+    async def _on_change(self, event: dict) -> None:
+        for user_id in event.get("users", []):
+            self.invalidate(user_id)
+
+
+principal_cache = PrincipalCache(broker, settings.AUTH_CACHE_TTL_SECONDS, settings.AUTH_CACHE_MAX_SIZE)
+
+
+async def load_principal(db: AsyncSession, user_id: int) -> Optional[Principal]:
+    """Return the principal for `user_id`, hitting the database only on a cache miss."""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    generation = principal_cache.generation(user_id)
+    user = await db.get(User, user_id)
+    if not user:
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.set(principal, generation)
+    return principal
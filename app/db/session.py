@@ -1,8 +1,126 @@
-from sqlalchemy import create_engine
+import threading
+import time
+import uuid
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from app.core.config import settings
 
+
+class PoolMetrics:
+    """Checkout wait times and in-use counts for one engine's pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+    def observe_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += int(timed_out)
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def on_checkout(self, *args) -> None:
+        with self._lock:
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def on_checkin(self, *args) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+            }
+
+
+def _timed_pool(pool_cls, metrics: PoolMetrics):
+    """Subclass `pool_cls` so every checkout records how long it waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = pool_cls._do_get(self)
+        except exc.TimeoutError:
+            metrics.observe_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        metrics.observe_wait(time.perf_counter() - start)
+        return conn
+
+    return type(f"Timed{pool_cls.__name__}", (pool_cls,), {"_do_get": _do_get})
+
+
+def _pool_options(queue_pool_cls, metrics: PoolMetrics) -> dict:
+    if settings.DB_POOL_MODE == "NULL":
+        return {"poolclass": _timed_pool(NullPool, metrics)}
+    return {
+        "poolclass": _timed_pool(queue_pool_cls, metrics),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _async_connect_args() -> dict:
+    if settings.DB_POOL_MODE != "NULL":
+        return {}
+    # pgbouncer in transaction mode may hand each transaction a different server
+    # connection, so asyncpg must not rely on named prepared statements surviving.
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+
+
+sync_pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
 # Use normalized URI so Railway's postgres:// works
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True, future=True)
+engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, future=True, **_pool_options(QueuePool, sync_pool_metrics))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+
+# Async engine (asyncpg) used by the API routers; the sync engine above serves
+# startup tasks, Alembic and scripts.
+# expire_on_commit=False: attributes stay loaded after commit, since lazy
+# refreshes are not possible outside an awaited call.
+async_engine = create_async_engine(
+    settings.SQLALCHEMY_ASYNC_DATABASE_URI,
+    connect_args=_async_connect_args(),
+    **_pool_options(AsyncAdaptedQueuePool, async_pool_metrics),
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+for _engine, _metrics in ((engine, sync_pool_metrics), (async_engine.sync_engine, async_pool_metrics)):
+    event.listen(_engine, "checkout", _metrics.on_checkout)
+    event.listen(_engine, "checkin", _metrics.on_checkin)
+
+
+def pool_status() -> dict:
+    """Pool configuration and live metrics for both engines in this process."""
+    return {
+        "mode": settings.DB_POOL_MODE,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "sync": {"status": engine.pool.status(), **sync_pool_metrics.snapshot()},
+        "async": {"status": async_engine.sync_engine.pool.status(), **async_pool_metrics.snapshot()},
+    }
+
+
 Base = declarative_base()
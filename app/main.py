@@ -3,8 +3,17 @@ import sys
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api.v1 import auth, reports, verification, listings, search, favorites, notifications, admin, ai, chat
-from app.db.session import SessionLocal
+from app.api.v1 import auth, reports, verification, listings, search, favorites, notifications, admin, ai, chat, uploads, saved_searches
+from app.core.principal import principal_cache
+from app.db.session import SessionLocal, async_engine
+from app.services.block_cache import block_cache
+from app.services.cache import response_cache
+from app.services.broker import broker
+from app.services.chat_hub import chat_hub
+from app.services.chat_writer import chat_writer
+from app.services.listing_events import listing_events
+from app.services.notifications import notification_hub
+from app.utils.images import shutdown_image_pool
 from app.models.user import User
 from app.core.security import hash_password
 
@@ -60,6 +69,45 @@ def create_single_admin():
         # Re-raising ensures the container truly exits with an error for Railway to potentially catch better
         raise e 
 
+
+@app.on_event("startup")
+async def start_broker():
+    await broker.start()
+    await chat_hub.start()
+    await block_cache.start()
+    await principal_cache.start()
+    await response_cache.start()
+    await notification_hub.start()
+    await listing_events.start()
+
+
+@app.on_event("startup")
+async def start_chat_writer():
+    if settings.CHAT_WRITE_BEHIND:
+        await chat_writer.start()
+
+
+@app.on_event("shutdown")
+async def stop_chat_writer():
+    # Flush pending chat messages before the engine is disposed
+    if settings.CHAT_WRITE_BEHIND:
+        await chat_writer.stop()
+
+
+@app.on_event("shutdown")
+async def stop_broker():
+    await broker.stop()
+
+
+@app.on_event("shutdown")
+def stop_image_pool():
+    shutdown_image_pool()
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    await async_engine.dispose()
+
 app.include_router(admin.router, prefix="/api/v1")
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(verification.router, prefix="/api/v1")
@@ -67,9 +115,11 @@ app.include_router(search.router, prefix="/api/v1")
 app.include_router(listings.router, prefix="/api/v1")
 app.include_router(favorites.router, prefix="/api/v1")
 app.include_router(notifications.router, prefix="/api/v1")
+app.include_router(saved_searches.router, prefix="/api/v1")
 app.include_router(ai.router, prefix="/api/v1")
 app.include_router(chat.router, prefix="/api/v1")
 app.include_router(reports.router, prefix="/api/v1")
+app.include_router(uploads.router)  # /uploads/... URLs issued by public_url_for_key
 
 @app.get("/healthz", tags=["Health"])
 def health():
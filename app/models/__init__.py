@@ -6,5 +6,8 @@ from app.models.message import Message
 from app.models.verification import Verification
 from app.models.report import Report, ReportStatus
 from app.models.chat import ChatMessage,BlockedUser
+from app.models.conversation import Conversation
+from app.models.job import Job
+from app.models.saved_search import SavedSearch
 
-__all__ = ["User","Listing","Favorite","Notification","Message","Verification","Report","ReportStatus","ChatMessage","BlockedUser"]
+__all__ = ["User","Listing","Favorite","Notification","Message","Verification","Report","ReportStatus","ChatMessage","BlockedUser","Conversation","Job","SavedSearch"]
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, Boolean, UniqueConstraint
+from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, Boolean, UniqueConstraint, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index(
+            "ix_chat_messages_conversation_id", "listing_id", "sender_id", "receiver_id", "id",
+            postgresql_where=text("deleted = false"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     listing_id = Column(Integer, ForeignKey('listings.id'), nullable=False)
@@ -28,4 +34,7 @@ class BlockedUser(Base):
     blocked_by = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    __table_args__ = (UniqueConstraint('user_id', 'blocked_by', name='uq_user_blocked_by'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'blocked_by', name='uq_user_blocked_by'),
+        Index('ix_blocked_users_blocked_by', 'blocked_by'),  # reverse direction of the block graph
+    )
@@ -0,0 +1,24 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, ForeignKey, DateTime, Index, UniqueConstraint, func
+from datetime import datetime
+from typing import Optional
+from app.db.session import Base
+
+class Conversation(Base):
+    """One participant's inbox entry for a chat room, updated as messages are written."""
+    __tablename__ = "conversations"
+    __table_args__ = (
+        UniqueConstraint("user_id", "room_id", name="uq_conversation_user_room"),
+        Index("ix_conversations_user_last_message_at", "user_id", "last_message_at", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    peer_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    listing_id: Mapped[int] = mapped_column(ForeignKey("listings.id"), nullable=False)
+    room_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    last_message_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    last_message: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)  # preview
+    last_message_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    unread_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    last_read_message_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # newest delivery receipt
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import JSON, String, Integer, ForeignKey, Numeric, Text, DateTime, func
+from sqlalchemy import JSON, String, Integer, ForeignKey, Numeric, Text, DateTime, Index, func, text
 from datetime import datetime
 from typing import List as SAList, Optional
 from app.db.session import Base
@@ -9,13 +9,30 @@ from sqlalchemy.dialects.postgresql import TSVECTOR
 
 class Listing(Base):
     __tablename__ = "listings"
+    __table_args__ = (
+        # Kept up to date by the listings_search_vector_trigger (see alembic migration 1fffde72dba6)
+        Index("ix_listings_search_vector", "search_vector", postgresql_using="gin"),
+        # Composite indexes matching search filters + sort (see alembic migration 3db22e448a37)
+        Index("ix_listings_created_at", "created_at", "id"),
+        Index("ix_listings_category_created_at", "category", "created_at", "id"),
+        Index("ix_listings_category_price", "category", "price", "id"),
+        Index(
+            "ix_listings_active_category_created_at", "category", "created_at", "id",
+            postgresql_where=text("status = 'ACTIVE'"),
+        ),
+        # sort_by=popularity (see alembic migration 1a8013b0edba)
+        Index("ix_listings_favorite_count", "favorite_count", "id"),
+        Index("ix_listings_category_favorite_count", "category", "favorite_count", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     title: Mapped[str] = mapped_column(String(255), index=True)
     description: Mapped[str] = mapped_column(Text)
-    category: Mapped[str] = mapped_column(String(100), index=True)
+    category: Mapped[str] = mapped_column(String(100))
     price: Mapped[float] = mapped_column(Numeric(10, 2))
     images: Mapped[Optional[list[str]]] = mapped_column(JSON, nullable=True)  # store as list of URLs
+    image_variants: Mapped[Optional[list[dict]]] = mapped_column(JSON, nullable=True)  # one manifest per image, see storage.ingest_image
+    favorite_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")  # maintained by services.favorites
     search_vector: Mapped[Optional[str]] = deferred(mapped_column(TSVECTOR, nullable=True))
 
     status: Mapped[str] = mapped_column(String(20), index=True, default="ACTIVE")  # ACTIVE | SOLD | ARCHIVED
@@ -37,6 +54,8 @@ class Listing(Base):
             "category": self.category,
             "price": float(self.price),
             "images": self.images or [],
+            "image_variants": self.image_variants or [],
+            "favorite_count": self.favorite_count or 0,
             "status": self.status,
             "owner_id": self.owner_id,
             "created_at": self.created_at.isoformat() if self.created_at else None,
@@ -1,13 +1,18 @@
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import Integer, String, Boolean, ForeignKey, DateTime, func
+from sqlalchemy import Integer, String, Boolean, ForeignKey, DateTime, Index, func, text
 from datetime import datetime
 from app.db.session import Base
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_id_id", "user_id", "id"),
+        # Unread counts and mark-read (see alembic migration 8d2578e5abf7)
+        Index("ix_notifications_user_unread", "user_id", "id", postgresql_where=text("NOT is_read")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True, nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     type: Mapped[str] = mapped_column(String(50), nullable=False)
     payload: Mapped[str] = mapped_column(String(500), default="{}")
     is_read: Mapped[bool] = mapped_column(Boolean, default=False)
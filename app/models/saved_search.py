@@ -0,0 +1,37 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, ForeignKey, DateTime, Index, func
+from sqlalchemy.dialects.postgresql import NUMRANGE, TSQUERY, Range
+from datetime import datetime
+from typing import Optional
+from app.db.session import Base
+
+class SavedSearch(Base):
+    """
+    A user's stored search filters, matched against each new listing (see
+    app/services/saved_searches.py). Missing filters are stored so that they match
+    everything: NULL category/university/query, and an unbounded price range.
+    """
+    __tablename__ = "saved_searches"
+    __table_args__ = (
+        # Candidate lookup for a new listing: its category (or none) and its price
+        Index("ix_saved_searches_category", "category"),
+        Index("ix_saved_searches_price_range", "price_range", postgresql_using="gist"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
+    name: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    q: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)  # normalized keywords as entered
+    query: Mapped[Optional[str]] = mapped_column(TSQUERY, nullable=True)  # plainto_tsquery('english', q)
+    category: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    university: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    price_range: Mapped[Range] = mapped_column(NUMRANGE, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    @property
+    def min_price(self):
+        return self.price_range.lower if self.price_range is not None else None
+
+    @property
+    def max_price(self):
+        return self.price_range.upper if self.price_range is not None else None
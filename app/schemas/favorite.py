@@ -0,0 +1,15 @@
+from typing import List
+from pydantic import BaseModel, Field
+
+
+class FavoriteBatch(BaseModel):
+    listing_ids: List[int] = Field(..., min_length=1, max_length=100)
+
+
+class FavoriteBatchResult(BaseModel):
+    # Only the rows this request changed; ids already in (or already out of) favorites are left out
+    listing_ids: List[int]
+
+
+class FavoriteContains(BaseModel):
+    favorited: List[int]
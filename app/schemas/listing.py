@@ -1,5 +1,5 @@
-from pydantic import BaseModel, field_validator
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, Optional, List
 from decimal import Decimal
 
 
@@ -28,6 +28,20 @@ class ListingStatusPatch(BaseModel):
     status: str  # ACTIVE, SOLD, ARCHIVED
 
 
+class ImageRendition(BaseModel):
+    url: str
+    width: int
+    height: int
+
+
+class ImageManifest(BaseModel):
+    url: str
+    width: int
+    height: int
+    blurhash: Optional[str] = None
+    variants: Dict[str, ImageRendition] = {}  # thumb, medium
+
+
 class ListingOut(BaseModel):
     id: int
     title: str
@@ -35,8 +49,28 @@ class ListingOut(BaseModel):
     category: str
     price: Decimal
     images: Optional[List[str]] = None
+    image_variants: Optional[List[ImageManifest]] = None
+    favorite_count: int = 0
     status: str
     owner_id: int
 
     class Config:
         from_attributes = True
+
+
+class UploadSlotRequest(BaseModel):
+    filename: str
+    content_type: str
+    size: int = Field(..., gt=0)  # bytes; the upload URL only accepts a body of exactly this size
+
+
+class UploadSlotsRequest(BaseModel):
+    files: List[UploadSlotRequest] = Field(..., min_length=1, max_length=10)
+
+
+class UploadSlot(BaseModel):
+    key: str  # pass back to POST /listings as image_keys
+    upload_url: str
+    method: str = "PUT"
+    headers: Dict[str, str]
+    expires_in: int
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+
+
+class MarkRead(BaseModel):
+    up_to_id: int = Field(..., gt=0)  # every notification up to and including this id is marked read
+
+
+class UnreadCount(BaseModel):
+    unread: int
@@ -0,0 +1,48 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+
+class SavedSearchCreate(BaseModel):
+    name: Optional[str] = Field(None, max_length=100)
+    q: Optional[str] = Field(None, max_length=255)
+    category: Optional[str] = Field(None, max_length=100)
+    min_price: Optional[Decimal] = Field(None, ge=0)
+    max_price: Optional[Decimal] = Field(None, ge=0)
+    university: Optional[str] = Field(None, max_length=255)
+
+    @field_validator("q", "category", "university", "name")
+    @classmethod
+    def blank_to_none(cls, v):
+        if v is not None:
+            v = " ".join(v.split())
+        return v or None
+
+    @field_validator("q")
+    @classmethod
+    def normalize_q(cls, v):
+        # Same normalization as /listings/search, so equal searches are stored equally
+        return v.lower() if v else v
+
+    @model_validator(mode="after")
+    def check_price_range(self):
+        if self.min_price is not None and self.max_price is not None and self.min_price > self.max_price:
+            raise ValueError("min_price must not exceed max_price")
+        if self.q is None and self.category is None and self.min_price is None and self.max_price is None and self.university is None:
+            raise ValueError("A saved search needs at least one filter")
+        return self
+
+
+class SavedSearchOut(BaseModel):
+    id: int
+    name: Optional[str]
+    q: Optional[str]
+    category: Optional[str]
+    min_price: Optional[Decimal]
+    max_price: Optional[Decimal]
+    university: Optional[str]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
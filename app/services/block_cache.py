@@ -0,0 +1,78 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import FrozenSet, Iterable
+
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.chat import BlockedUser
+from app.services.broker import Broker, broker
+
+logger = logging.getLogger("chat_ws")
+
+
+class BlockCache:
+    """
+    Per-process view of the block graph. For each user it holds the ids of everyone
+    they blocked or were blocked by, so "are these two blocked" is a set lookup.
+
+    A user's entry is loaded on first use (one query for both directions). When block
+    rows change, the affected users are published on the broker and every worker drops
+    their entries; the TTL bounds staleness if a message is ever missed.
+    """
+
+    CHANNEL = "blocks"
+
+    def __init__(self, broker: Broker, session_factory: async_sessionmaker, ttl_seconds: int, max_size: int):
+        self.broker = broker
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, tuple[float, FrozenSet[int]]]" = OrderedDict()
+
+    async def start(self) -> None:
+        await self.broker.subscribe(self.CHANNEL, self._on_change)
+
+    async def is_blocked(self, a: int, b: int) -> bool:
+        """True if either user has blocked the other."""
+        return b in await self.related(a)
+
+    async def related(self, user_id: int) -> FrozenSet[int]:
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] >= time.monotonic():
+            self._entries.move_to_end(user_id)
+            return entry[1]
+        async with self.session_factory() as db:
+            rows = await db.execute(
+                select(BlockedUser.user_id, BlockedUser.blocked_by)
+                .where(or_(BlockedUser.user_id == user_id, BlockedUser.blocked_by == user_id))
+            )
+            ids = frozenset(blocked_by if blocked == user_id else blocked for blocked, blocked_by in rows)
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, ids)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return ids
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        for user_id in user_ids:
+            self._entries.pop(user_id, None)
+
+    async def changed(self, *user_ids: int) -> None:
+        """Announce that block rows involving these users changed (call after commit)."""
+        self.invalidate(user_ids)  # this worker sees the change even before the broker echoes it
+        await self.broker.publish(self.CHANNEL, {"users": list(user_ids)})
+
+    async def _on_change(self, event: dict) -> None:
+        self.invalidate(event.get("users", []))
+
+
+block_cache = BlockCache(
+    broker,
+    AsyncSessionLocal,
+    ttl_seconds=settings.BLOCK_CACHE_TTL_SECONDS,
+    max_size=settings.BLOCK_CACHE_MAX_SIZE,
+)
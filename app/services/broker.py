@@ -0,0 +1,188 @@
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger("broker")
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class Broker:
+    """
+    Publish/subscribe of JSON messages on named channels.
+    A message published on any worker reaches the handlers subscribed on every worker.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def publish(self, channel: str, message: dict) -> None:
+        raise NotImplementedError
+
+    async def _dispatch(self, channel: str, message: dict) -> None:
+        for handler in self._handlers.get(channel, []):
+            try:
+                await handler(message)
+            except Exception:
+                logger.exception("Broker handler failed on channel %s", channel)
+
+
+class InMemoryBroker(Broker):
+    """Single-process backend: delivers straight to the local subscribers."""
+
+    async def publish(self, channel: str, message: dict) -> None:
+        await self._dispatch(channel, message)
+
+
+class PostgresBroker(Broker):
+    """LISTEN/NOTIFY backend; every worker connected to the database receives every message."""
+
+    # NOTIFY payloads must stay below 8000 bytes
+    MAX_PAYLOAD_BYTES = 7900
+
+    def __init__(self, dsn: str):
+        super().__init__()
+        self.dsn = dsn
+        self._listen_conn = None
+        self._publish_conn = None
+        self._publish_lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+        self._stopping = False
+
+    async def start(self) -> None:
+        import asyncpg
+
+        self._asyncpg = asyncpg
+        self._stopping = False
+        await self._connect_listener()
+        self._publish_conn = await asyncpg.connect(self.dsn)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for conn in (self._listen_conn, self._publish_conn):
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        self._listen_conn = self._publish_conn = None
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        first = channel not in self._handlers
+        await super().subscribe(channel, handler)
+        if first and self._listen_conn is not None:
+            await self._listen_conn.add_listener(channel, self._on_notify)
+
+    async def publish(self, channel: str, message: dict) -> None:
+        payload = json.dumps(message, separators=(",", ":"), default=str)
+        if len(payload.encode()) > self.MAX_PAYLOAD_BYTES:
+            logger.warning("Payload on %s too large for NOTIFY; delivering on this worker only", channel)
+            await self._dispatch(channel, message)
+            return
+        async with self._publish_lock:
+            if self._publish_conn is None or self._publish_conn.is_closed():
+                self._publish_conn = await self._asyncpg.connect(self.dsn)
+            await self._publish_conn.execute("SELECT pg_notify($1, $2)", channel, payload)
+
+    async def _connect_listener(self) -> None:
+        self._listen_conn = await self._asyncpg.connect(self.dsn)
+        self._listen_conn.add_termination_listener(self._on_terminated)
+        for channel in self._handlers:
+            await self._listen_conn.add_listener(channel, self._on_notify)
+
+    def _on_notify(self, conn, pid, channel, payload) -> None:
+        self._spawn(self._dispatch(channel, json.loads(payload)))
+
+    def _on_terminated(self, conn) -> None:
+        if not self._stopping:
+            logger.warning("Broker LISTEN connection lost; reconnecting")
+            self._spawn(self._reconnect_listener())
+
+    async def _reconnect_listener(self) -> None:
+        delay = 0.5
+        while not self._stopping:
+            try:
+                await self._connect_listener()
+                return
+            except Exception:
+                logger.exception("Broker reconnect failed; retrying in %.1fs", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+class RedisBroker(Broker):
+    """Redis pub/sub backend (requires the optional `redis` package)."""
+
+    def __init__(self, url: str):
+        super().__init__()
+        self.url = url
+        self._redis = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("BROKER_BACKEND=REDIS requires the 'redis' package") from e
+        self._redis = redis.from_url(self.url)
+        self._pubsub = self._redis.pubsub()
+        if self._handlers:
+            await self._pubsub.subscribe(*self._handlers)
+            self._reader = asyncio.create_task(self._read_loop())
+
+    async def stop(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        if self._redis is not None:
+            await self._redis.aclose()
+        self._redis = self._pubsub = None
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        first = channel not in self._handlers
+        await super().subscribe(channel, handler)
+        if first and self._pubsub is not None:
+            await self._pubsub.subscribe(channel)
+            if self._reader is None:
+                self._reader = asyncio.create_task(self._read_loop())
+
+    async def publish(self, channel: str, message: dict) -> None:
+        await self._redis.publish(channel, json.dumps(message, separators=(",", ":"), default=str))
+
+    async def _read_loop(self) -> None:
+        async for item in self._pubsub.listen():
+            if item["type"] != "message":
+                continue
+            channel = item["channel"].decode() if isinstance(item["channel"], bytes) else item["channel"]
+            await self._dispatch(channel, json.loads(item["data"]))
+
+
+def create_broker() -> Broker:
+    if settings.BROKER_BACKEND == "POSTGRES":
+        dsn = settings.BROKER_DATABASE_URL or settings.SQLALCHEMY_DATABASE_URI
+        return PostgresBroker(dsn.replace("postgresql+psycopg2://", "postgresql://", 1))
+    if settings.BROKER_BACKEND == "REDIS":
+        if not settings.REDIS_URL:
+            raise RuntimeError("BROKER_BACKEND=REDIS requires REDIS_URL")
+        return RedisBroker(settings.REDIS_URL)
+    return InMemoryBroker()
+
+
+broker = create_broker()
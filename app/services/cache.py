@@ -0,0 +1,218 @@
+"""
+Response cache for hot read endpoints.
+
+Entries are keyed by endpoint, normalized parameters and the current version of every
+scope the response depends on ("listing:12", "category:Books", "search"). Writes bump
+the versions of the scopes they touch, so stale entries are never read again and simply
+age out; nothing has to enumerate or delete keys.
+"""
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.core.config import settings
+from app.services.broker import Broker, broker
+
+logger = logging.getLogger("cache")
+
+
+class CacheBackend:
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        raise NotImplementedError
+
+    async def versions(self, scopes: Sequence[str]) -> List[int]:
+        raise NotImplementedError
+
+    async def bump(self, scopes: Sequence[str]) -> None:
+        raise NotImplementedError
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU with TTL. Version bumps reach the other workers through the broker."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def versions(self, scopes: Sequence[str]) -> List[int]:
+        return [self._versions.get(s, 0) for s in scopes]
+
+    async def bump(self, scopes: Sequence[str]) -> None:
+        for s in scopes:
+            self._versions[s] = self._versions.get(s, 0) + 1
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Shared by every worker (requires the optional `redis` package)."""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=REDIS requires the 'redis' package") from e
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(f"cache:{key}")
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self._redis.set(f"cache:{key}", value, ex=ttl)
+
+    async def versions(self, scopes: Sequence[str]) -> List[int]:
+        values = await self._redis.mget([f"cache:v:{s}" for s in scopes])
+        return [int(v) if v is not None else 0 for v in values]
+
+    async def bump(self, scopes: Sequence[str]) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for s in scopes:
+                pipe.incr(f"cache:v:{s}")
+            await pipe.execute()
+
+
+class ResponseCache:
+    CHANNEL = "cache"
+
+    def __init__(self, backend: Optional[CacheBackend], broker: Broker, ttl_seconds: int):
+        self.backend = backend  # None disables caching
+        self.broker = broker
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    async def start(self) -> None:
+        if isinstance(self.backend, MemoryCacheBackend):
+            await self.broker.subscribe(self.CHANNEL, self._on_invalidate)
+
+    async def invalidate(self, *scopes: str) -> None:
+        """Make every cached response that depends on any of `scopes` unreachable (call after commit)."""
+        if self.backend is None or not scopes:
+            return
+        await self.backend.bump(scopes)
+        if isinstance(self.backend, MemoryCacheBackend):
+            await self.broker.publish(self.CHANNEL, {"scopes": list(scopes)})
+
+    async def _on_invalidate(self, event: dict) -> None:
+        # Also runs for this worker's own bumps; an extra bump only costs one more miss
+        await self.backend.bump(event.get("scopes", []))
+
+    async def get_or_render(
+        self,
+        namespace: str,
+        params: dict,
+        scopes: Sequence[str],
+        render: Callable[[], Awaitable[bytes]],
+    ) -> bytes:
+        """Return the cached body for these parameters, rendering and storing it on a miss."""
+        if self.backend is None:
+            return await render()
+        started = time.perf_counter()
+        try:
+            versions = await self.backend.versions(scopes)
+            normalized = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+            digest = hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+            key = f"{namespace}:{digest}:{'.'.join(map(str, versions))}"
+            body = await self.backend.get(key)
+        except Exception:
+            logger.exception("Cache lookup failed; serving uncached")
+            return await render()
+
+        if body is not None:
+            self.hits += 1
+            self.hit_seconds += time.perf_counter() - started
+            return body
+        body = await render()
+        try:
+            await self.backend.set(key, body, self.ttl_seconds)
+        except Exception:
+            logger.exception("Cache store failed")
+        self.misses += 1
+        self.miss_seconds += time.perf_counter() - started
+        return body
+
+    async def respond(
+        self,
+        request: Request,
+        namespace: str,
+        params: dict,
+        scopes: Sequence[str],
+        render: Callable[[], Awaitable[bytes]],
+    ) -> Response:
+        """Cached JSON response with an ETag; a matching If-None-Match gets a bodiless 304."""
+        body = await self.get_or_render(namespace, params, scopes, render)
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}  # clients may store it but must revalidate
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "entries": self.backend.size() if self.backend else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "avg_hit_ms": round(self.hit_seconds / self.hits * 1000, 3) if self.hits else None,
+            "avg_miss_ms": round(self.miss_seconds / self.misses * 1000, 3) if self.misses else None,
+        }
+
+
+def dumps(data) -> bytes:
+    """Serialize like JSONResponse does."""
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def create_cache_backend() -> Optional[CacheBackend]:
+    if settings.CACHE_BACKEND == "REDIS":
+        if not settings.REDIS_URL:
+            raise RuntimeError("CACHE_BACKEND=REDIS requires REDIS_URL")
+        return RedisCacheBackend(settings.REDIS_URL)
+    if settings.CACHE_BACKEND == "MEMORY":
+        return MemoryCacheBackend(settings.CACHE_MAX_ENTRIES)
+    return None
+
+
+response_cache = ResponseCache(create_cache_backend(), broker, settings.CACHE_TTL_SECONDS)
+
+
+def listing_scopes(listing_id: Optional[int], *categories: Optional[str]) -> List[str]:
+    """Scopes a write to a listing invalidates: the listing, its categories and every search."""
+    scopes = [f"listing:{listing_id}"] if listing_id is not None else []
+    scopes += [f"category:{c}" for c in dict.fromkeys(categories) if c]
+    return scopes + ["search"]
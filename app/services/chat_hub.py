@@ -0,0 +1,128 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Coroutine, Dict, Optional, Set
+
+from fastapi import WebSocket, status
+from starlette.websockets import WebSocketState
+
+from app.core.config import settings
+from app.services.broker import Broker, broker
+
+logger = logging.getLogger("chat_ws")
+
+# The event loop keeps only weak references to tasks; hold disconnects here until they finish
+_disconnects: Set[asyncio.Task] = set()
+
+
+def _spawn_disconnect(coro: Coroutine) -> None:
+    task = asyncio.create_task(coro)
+    _disconnects.add(task)
+    task.add_done_callback(_disconnects.discard)
+
+
+class ChatConnection:
+    """
+    A socket joined to a room. Outbound frames go through a bounded queue drained by
+    a dedicated writer task, so one slow client never stalls delivery to the others.
+    """
+
+    def __init__(self, websocket: WebSocket, queue_size: int, send_timeout: float):
+        self.id = uuid.uuid4().hex
+        self.websocket = websocket
+        self.send_timeout = send_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer = asyncio.create_task(self._write_loop())
+
+    def offer(self, text: str) -> bool:
+        """Queue an already-serialized frame; False if the queue is full."""
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def send_json(self, data: dict) -> bool:
+        return self.offer(json.dumps(data))
+
+    def close(self) -> None:
+        self.writer.cancel()
+
+    async def disconnect(self, code: int = status.WS_1008_POLICY_VIOLATION) -> None:
+        """Close a consumer that cannot keep up; the receive loop then cleans up."""
+        self.close()
+        if self.websocket.application_state == WebSocketState.CONNECTED:
+            try:
+                await asyncio.wait_for(self.websocket.close(code=code), timeout=1)
+            except Exception:
+                pass
+
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                text = await self.queue.get()
+                if self.websocket.application_state != WebSocketState.CONNECTED:
+                    return
+                await asyncio.wait_for(self.websocket.send_text(text), timeout=self.send_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Chat connection {self.id} timed out sending; disconnecting")
+            _spawn_disconnect(self.disconnect(code=status.WS_1013_TRY_AGAIN_LATER))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.info(f"Chat connection {self.id} writer stopped: {e}")
+
+
+class ChatHub:
+    """
+    Chat room membership for this worker's sockets, with fan-out through the broker.
+    Broadcasts are published to every worker; each one delivers to its own sockets in the room.
+    """
+
+    CHANNEL = "chat"
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        # room id -> connection id -> connection
+        self.rooms: Dict[str, Dict[str, ChatConnection]] = {}
+
+    async def start(self) -> None:
+        await self.broker.subscribe(self.CHANNEL, self._deliver)
+
+    def join(self, rid: str, websocket: WebSocket) -> ChatConnection:
+        """Register a socket in a room and start its writer."""
+        conn = ChatConnection(websocket, settings.CHAT_SEND_QUEUE_SIZE, settings.CHAT_SEND_TIMEOUT_SECONDS)
+        self.rooms.setdefault(rid, {})[conn.id] = conn
+        return conn
+
+    def leave(self, rid: str, conn: ChatConnection) -> None:
+        conn.close()
+        room = self.rooms.get(rid)
+        if room is None:
+            return
+        room.pop(conn.id, None)
+        if not room:
+            del self.rooms[rid]
+
+    async def broadcast(self, rid: str, data: dict, skip: Optional[str] = None) -> None:
+        """Send `data` to every socket in the room on every worker, except connection `skip`."""
+        await self.broker.publish(self.CHANNEL, {"room": rid, "skip": skip, "data": data})
+
+    async def _deliver(self, event: dict) -> None:
+        room = self.rooms.get(event["room"])
+        if not room:
+            return
+        text = json.dumps(event["data"])  # serialized once, shared by every recipient
+        for conn_id, conn in list(room.items()):
+            if conn_id == event.get("skip") or conn.offer(text):
+                continue
+            if settings.CHAT_SLOW_CONSUMER_POLICY == "DISCONNECT":
+                logger.warning(f"Chat connection {conn_id} outbound queue full; disconnecting")
+                self.leave(event["room"], conn)
+                _spawn_disconnect(conn.disconnect(code=status.WS_1013_TRY_AGAIN_LATER))
+            else:
+                logger.warning(f"Chat connection {conn_id} outbound queue full; dropping message")
+
+
+chat_hub = ChatHub(broker)
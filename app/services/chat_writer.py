@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional, Set
+
+from sqlalchemy import insert, text
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.chat import ChatMessage
+from app.services.conversations import record_messages
+from app.services.notifications import notification_hub, notify_chat_messages
+
+logger = logging.getLogger("chat_ws")
+
+
+class WriteBehindUnavailable(Exception):
+    """The writer cannot take more messages until the database accepts its backlog."""
+
+
+class ChatMessageWriter:
+    """
+    Write-behind persistence for chat messages.
+
+    Ids are taken from blocks reserved on the chat_messages id sequence, so a message
+    can be broadcast before its row exists. Pending rows are inserted in one statement
+    per batch, at most `interval` seconds after they were added. Ids stay unique but are
+    only roughly time-ordered across workers, since each worker holds its own block.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, interval: float, batch_size: int, id_block_size: int, max_failures: int):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.id_block_size = id_block_size
+        # Writers wait for a flush instead of buffering without bound when the DB falls behind
+        self.max_pending = batch_size * 10
+        # Consecutive failed flushes; at max_failures new messages are refused (written synchronously instead)
+        self.failures = 0
+        self.max_failures = max_failures
+        self._pending: List[dict] = []
+        # Ids added but not yet committed (pending or in a batch being written)
+        self._unwritten: Set[int] = set()
+        self._ids: Deque[int] = deque()
+        self._id_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task  # a batch interrupted mid-insert is back in _pending once this returns
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if not await self.flush():
+            for row in self._pending:
+                logger.error("Chat message lost at shutdown: %s", json.dumps(row, default=str))
+            self._pending.clear()
+            self._unwritten.clear()
+
+    async def add(self, data: dict) -> dict:
+        """
+        Assign an id and timestamp to a new message and queue it for insertion. Raises
+        WriteBehindUnavailable instead of accepting a message that cannot be persisted;
+        the caller should then write it synchronously.
+        """
+        if self.failures >= self.max_failures:
+            raise WriteBehindUnavailable(f"{self.failures} consecutive flushes failed")
+        if len(self._pending) >= self.max_pending and not await self.flush():
+            raise WriteBehindUnavailable(f"{len(self._pending)} messages waiting and the flush failed")
+        row = {
+            **data,
+            "id": await self._next_id(),
+            "timestamp": datetime.now(timezone.utc),
+            "edited": False,
+            "deleted": False,
+        }
+        self._pending.append(row)
+        self._unwritten.add(row["id"])
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return row
+
+    async def ensure_written(self, message_id: int) -> None:
+        """
+        Flush first if `message_id` was added on this worker and is not committed yet, so an
+        edit, delete or receipt referencing it finds the row. Otherwise returns at once, so
+        those frames do not defeat batching.
+        """
+        if message_id in self._unwritten:
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """
+        Insert every pending message. Returns False if the database failed and the rest was
+        re-queued. A batch rejected for its data (a deleted listing or user, say) is retried
+        row by row, and the rows that still fail are logged as dead letters and dropped, so
+        one bad row never holds back the messages after it.
+        """
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                try:
+                    events = await self._write(batch)
+                except (IntegrityError, DataError):
+                    rest = await self._write_each(batch)
+                    if rest:
+                        self._pending[:0] = rest
+                        return self._failed(len(rest))
+                except Exception as e:
+                    self._pending[:0] = batch
+                    return self._failed(len(batch), e)
+                except BaseException:
+                    self._pending[:0] = batch  # cancelled mid-insert (shutdown): nothing was committed
+                    raise
+                else:
+                    await self._publish(events)
+            self.failures = 0
+            return True
+
+    async def _write(self, rows: List[dict]) -> List[dict]:
+        """Insert rows with their inbox and notification rows in one transaction; returns the notifications to publish."""
+        async with self.session_factory() as db:
+            await db.execute(insert(ChatMessage), rows)
+            await record_messages(db, rows)
+            events = await notify_chat_messages(db, rows)
+            await db.commit()
+        self._unwritten.difference_update(row["id"] for row in rows)
+        return events
+
+    async def _publish(self, events: List[dict]) -> None:
+        try:
+            await notification_hub.publish(events)
+        except Exception:
+            logger.exception("Publishing chat notifications failed; the messages are saved")
+
+    async def _write_each(self, rows: List[dict]) -> List[dict]:
+        """Insert rows one at a time, dead-lettering the ones the database rejects. Returns the unwritten rest on an outage."""
+        for i, row in enumerate(rows):
+            try:
+                events = await self._write([row])
+            except (IntegrityError, DataError) as e:
+                logger.error("Chat message dropped (dead letter): %s; %s", json.dumps(row, default=str), e.orig)
+                self._unwritten.discard(row["id"])
+            except Exception as e:
+                logger.error(f"Chat write-behind flush failed mid-batch: {e}")
+                return rows[i:]
+            except BaseException:
+                self._pending[:0] = rows[i:]  # cancelled: put back what was not committed
+                raise
+            else:
+                await self._publish(events)
+        return []
+
+    def _failed(self, count: int, error: Optional[Exception] = None) -> bool:
+        self.failures += 1
+        log = logger.critical if self.failures >= self.max_failures else logger.error
+        log(f"Chat write-behind flush failed ({self.failures} in a row); {count} messages re-queued: {error}")
+        return False
+
+    async def _next_id(self) -> int:
+        async with self._id_lock:
+            if not self._ids:
+                async with self.session_factory() as db:
+                    result = await db.execute(
+                        text("SELECT nextval(pg_get_serial_sequence('chat_messages', 'id')) FROM generate_series(1, :n)"),
+                        {"n": self.id_block_size},
+                    )
+                    self._ids.extend(row[0] for row in result)
+            return self._ids.popleft()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Chat write-behind flusher error; continuing")
+
+
+chat_writer = ChatMessageWriter(
+    AsyncSessionLocal,
+    interval=settings.CHAT_FLUSH_INTERVAL_MS / 1000,
+    batch_size=settings.CHAT_FLUSH_BATCH_SIZE,
+    id_block_size=settings.CHAT_ID_BLOCK_SIZE,
+    max_failures=settings.CHAT_FLUSH_MAX_FAILURES,
+)
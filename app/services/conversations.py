@@ -0,0 +1,116 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import and_, case, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chat import ChatMessage
+from app.models.conversation import Conversation
+
+PREVIEW_LENGTH = 255
+
+
+def room_id(listing_id: int, u1: int, u2: int) -> str:
+    return f"{listing_id}-{min(u1, u2)}-{max(u1, u2)}"
+
+
+async def record_messages(db: AsyncSession, messages: Iterable[dict]) -> None:
+    """
+    Upsert both participants' inbox rows for newly written messages, in the caller's
+    transaction. Messages are folded per room first, so a batch costs one statement
+    no matter how many messages it holds.
+    """
+    # (user_id, room) -> row; the latest message wins and the receiver's unread count accumulates
+    rows: Dict[Tuple[int, str], dict] = {}
+    for m in messages:
+        rid = room_id(m["listing_id"], m["sender_id"], m["receiver_id"])
+        sent_at = m.get("timestamp") or datetime.now(timezone.utc)
+        for user_id, peer_id in ((m["sender_id"], m["receiver_id"]), (m["receiver_id"], m["sender_id"])):
+            row = rows.setdefault((user_id, rid), {
+                "user_id": user_id,
+                "peer_id": peer_id,
+                "listing_id": m["listing_id"],
+                "room_id": rid,
+                "last_message_id": None,
+                "unread_count": 0,
+            })
+            if row["last_message_id"] is None or m["id"] > row["last_message_id"]:
+                row["last_message_id"] = m["id"]
+                row["last_message"] = m["content"][:PREVIEW_LENGTH]
+                row["last_message_at"] = sent_at
+            if user_id == m["receiver_id"]:
+                row["unread_count"] += 1
+    if not rows:
+        return
+
+    stmt = insert(Conversation).values(list(rows.values()))
+    # Batches from different workers can land out of order; only a newer message replaces the preview
+    newer = stmt.excluded.last_message_id > func.coalesce(Conversation.last_message_id, 0)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_conversation_user_room",
+        set_={
+            "last_message_id": case((newer, stmt.excluded.last_message_id), else_=Conversation.last_message_id),
+            "last_message": case((newer, stmt.excluded.last_message), else_=Conversation.last_message),
+            "last_message_at": case((newer, stmt.excluded.last_message_at), else_=Conversation.last_message_at),
+            # A receipt can overtake a write-behind batch; if the whole batch is at or below the
+            # watermark it was already delivered. (A batch straddling it overcounts until the next receipt.)
+            "unread_count": case(
+                (
+                    stmt.excluded.last_message_id > func.coalesce(Conversation.last_read_message_id, 0),
+                    Conversation.unread_count + stmt.excluded.unread_count,
+                ),
+                else_=Conversation.unread_count,
+            ),
+        },
+    )
+    await db.execute(stmt)
+
+
+def _received(message_ids):
+    # The peer's messages to this participant, as counted in unread_count
+    return (
+        select(func.count(ChatMessage.id))
+        .where(
+            ChatMessage.listing_id == Conversation.listing_id,
+            ChatMessage.sender_id == Conversation.peer_id,
+            ChatMessage.receiver_id == Conversation.user_id,
+            ChatMessage.deleted == False,  # noqa: E712 (must match the partial index predicate)
+            message_ids,
+        )
+        .scalar_subquery()
+    )
+
+
+async def mark_delivered(db: AsyncSession, user_id: int, rid: str, message_id: int) -> None:
+    """
+    Record that the user has received everything up to `message_id` in a room: move the
+    watermark forward and take off the counter only the messages it crossed (a short range
+    on ix_chat_messages_conversation_id). A repeated or out-of-order receipt changes nothing.
+    """
+    crossed = _received(and_(
+        ChatMessage.id > func.coalesce(Conversation.last_read_message_id, 0),
+        ChatMessage.id <= message_id,
+    ))
+    await db.execute(
+        update(Conversation)
+        .where(
+            Conversation.user_id == user_id,
+            Conversation.room_id == rid,
+            func.coalesce(Conversation.last_read_message_id, 0) < message_id,
+        )
+        .values(last_read_message_id=message_id, unread_count=func.greatest(Conversation.unread_count - crossed, 0))
+    )
+
+
+async def forget_unread(db: AsyncSession, receiver_id: int, rid: str, message_id: int) -> None:
+    """Take a message that is being deleted off the receiver's counter if it was still unread. Does not commit."""
+    await db.execute(
+        update(Conversation)
+        .where(
+            Conversation.user_id == receiver_id,
+            Conversation.room_id == rid,
+            func.coalesce(Conversation.last_read_message_id, 0) < message_id,
+        )
+        .values(unread_count=func.greatest(Conversation.unread_count - 1, 0))
+    )
@@ -0,0 +1,91 @@
+"""
+Favorites and the denormalized Listing.favorite_count.
+
+Every change to the favorites table goes through `add_favorites`/`remove_favorites`,
+which adjust the counters in the same statement (a data-modifying CTE), so the count
+can only drift through writes made outside this module. The `reconcile_favorite_counts`
+job, scheduled periodically by the worker, recomputes the counters and fixes any drift.
+"""
+import logging
+from typing import Dict, List, Sequence
+
+from sqlalchemy import delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.favorite import Favorite
+from app.models.listing import Listing
+from app.services.jobs import job_handler
+
+logger = logging.getLogger("favorites")
+
+
+def _adjust_counts(changed, delta: int):
+    # updated_at is kept as is: a new favorite is not an edit of the listing
+    return (
+        update(Listing)
+        .where(Listing.id.in_(select(changed.c.listing_id)))
+        .values(favorite_count=Listing.favorite_count + delta, updated_at=Listing.updated_at)
+        .returning(Listing.id, Listing.owner_id)
+        .cte("counted")
+    )
+
+
+async def add_favorites(db: AsyncSession, user_id: int, listing_ids: Sequence[int]) -> Dict[int, int]:
+    """
+    Favorite the listings that exist among `listing_ids` and bump their counters, in one
+    statement. Returns {listing id: owner id} for the ones actually added (not those already
+    favorited). Does not commit.
+    """
+    added = (
+        insert(Favorite)
+        .from_select(
+            ["user_id", "listing_id"],
+            select(literal(user_id), Listing.id).where(Listing.id.in_(sorted(set(listing_ids)))),
+        )
+        .on_conflict_do_nothing(constraint="uq_user_listing")
+        .returning(Favorite.listing_id)
+        .cte("added")
+    )
+    counted = _adjust_counts(added, 1)
+    rows = await db.execute(select(counted.c.id, counted.c.owner_id))
+    return dict(sorted(rows.tuples()))
+
+
+async def remove_favorites(db: AsyncSession, user_id: int, listing_ids: Sequence[int]) -> List[int]:
+    """Remove favorites and decrement their counters in one statement; returns the ids removed. Does not commit."""
+    removed = (
+        delete(Favorite)
+        .where(Favorite.user_id == user_id, Favorite.listing_id.in_(sorted(set(listing_ids))))
+        .returning(Favorite.listing_id)
+        .cte("removed")
+    )
+    counted = _adjust_counts(removed, -1)
+    return sorted(await db.scalars(select(counted.c.id)))
+
+
+@job_handler("reconcile_favorite_counts", every=settings.FAVORITE_RECONCILE_INTERVAL_SECONDS)
+async def reconcile_favorite_counts(payload: dict) -> None:
+    """Recompute favorite_count in id ranges, one short transaction per range, touching only rows that drifted."""
+    batch = settings.FAVORITE_RECONCILE_BATCH_SIZE
+    fixed = 0
+    async with AsyncSessionLocal() as db:
+        last_id = await db.scalar(select(func.max(Listing.id))) or 0
+        for start in range(0, last_id, batch):
+            actual = (
+                select(func.count(Favorite.id))
+                .where(Favorite.listing_id == Listing.id)
+                .scalar_subquery()
+            )
+            result = await db.execute(
+                update(Listing)
+                .where(Listing.id > start, Listing.id <= start + batch, Listing.favorite_count != actual)
+                .values(favorite_count=actual, updated_at=Listing.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            fixed += result.rowcount
+    if fixed:
+        logger.warning("Reconciled favorite_count on %s listings", fixed)
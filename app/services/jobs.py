@@ -0,0 +1,221 @@
+"""
+Durable background jobs stored in Postgres.
+
+Request handlers call `enqueue` inside their own transaction, so a job exists if and
+only if the write that caused it was committed. `python -m app.worker` claims runnable
+jobs with FOR UPDATE SKIP LOCKED (any number of workers can poll the same table),
+runs them and retries failures with exponential backoff.
+"""
+import asyncio
+import inspect
+import logging
+import random
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+from sqlalchemy import case, func, update, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.models.job import Job
+
+logger = logging.getLogger("jobs")
+
+JobHandler = Callable[[dict], Union[None, Awaitable[None]]]
+
+# kind -> handler; sync handlers run in a worker thread
+HANDLERS: Dict[str, JobHandler] = {}
+# kind -> interval in seconds, for jobs the worker enqueues on a schedule
+PERIODIC: Dict[str, int] = {}
+
+
+def job_handler(kind: str, every: Optional[int] = None):
+    """
+    Register the function that runs jobs of `kind`. It receives the job payload.
+    With `every`, workers also enqueue one job of this kind per `every` seconds.
+    """
+    def register(fn: JobHandler) -> JobHandler:
+        HANDLERS[kind] = fn
+        if every:
+            PERIODIC[kind] = every
+        return fn
+    return register
+
+
+async def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: dict,
+    idempotency_key: Optional[str] = None,
+    run_at: Optional[datetime] = None,
+    max_attempts: Optional[int] = None,
+) -> None:
+    """
+    Add a job in the caller's transaction (it becomes visible on commit). A job whose
+    idempotency_key already exists is silently not added again.
+    """
+    values = {"kind": kind, "payload": payload, "idempotency_key": idempotency_key}
+    if run_at is not None:
+        values["run_at"] = run_at
+    values["max_attempts"] = max_attempts or settings.JOB_MAX_ATTEMPTS
+    await db.execute(insert(Job).values(**values).on_conflict_do_nothing(index_elements=["idempotency_key"]))
+
+
+def backoff(attempts: int) -> timedelta:
+    """Delay before retry number `attempts`: exponential, capped, with jitter."""
+    delay = min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+class JobWorker:
+    """Polls the jobs table and runs up to `concurrency` jobs at a time."""
+
+    def __init__(self, session_factory: async_sessionmaker, concurrency: int, poll_interval: float, lock_timeout: int):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lock_timeout = lock_timeout
+        self._stopping = asyncio.Event()
+        self._next_schedule: Dict[str, float] = {}
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        logger.info("Job worker started (%s handlers: %s)", len(HANDLERS), ", ".join(sorted(HANDLERS)))
+        while not self._stopping.is_set():
+            await self.requeue_stale()
+            await self.schedule_periodic()
+            jobs = await self.claim(self.concurrency)
+            if jobs:
+                await asyncio.gather(*(self.execute(job) for job in jobs))
+                continue  # there may be more work queued; poll again right away
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Job worker stopped")
+
+    async def claim(self, limit: int) -> List[Job]:
+        """Mark up to `limit` runnable jobs as running and return them; concurrent workers never get the same job."""
+        runnable = (
+            select(Job.id)
+            .where(Job.status == "queued", Job.run_at <= func.now())
+            .order_by(Job.run_at, Job.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        async with self.session_factory() as db:
+            result = await db.scalars(
+                update(Job)
+                .where(Job.id.in_(runnable.scalar_subquery()))
+                .values(status="running", locked_at=func.now(), attempts=Job.attempts + 1)
+                .returning(Job)
+                .execution_options(synchronize_session=False)
+            )
+            jobs = list(result.all())
+            await db.commit()
+        return jobs
+
+    async def schedule_periodic(self) -> None:
+        """
+        Enqueue each periodic job once per interval. The idempotency key names the interval,
+        so however many workers run, each interval gets a single job.
+        """
+        now = time.time()
+        due = [kind for kind in PERIODIC if self._next_schedule.get(kind, 0) <= now]
+        if not due:
+            return
+        async with self.session_factory() as db:
+            for kind in due:
+                interval = PERIODIC[kind]
+                slot = int(now // interval)
+                await enqueue(db, kind, {}, idempotency_key=f"periodic:{kind}:{slot}")
+                self._next_schedule[kind] = (slot + 1) * interval
+            await db.commit()
+
+    async def requeue_stale(self) -> None:
+        """
+        Return jobs whose worker died mid-run (or outlived its lease) to the queue. Attempts
+        are counted at claim time, so a job that keeps killing its worker fails once it has
+        used up max_attempts instead of being requeued forever.
+        """
+        exhausted = Job.attempts >= Job.max_attempts
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(Job)
+                .where(Job.status == "running", Job.locked_at < func.now() - timedelta(seconds=self.lock_timeout))
+                .values(
+                    status=case((exhausted, "failed"), else_="queued"),
+                    finished_at=case((exhausted, func.now()), else_=None),
+                    last_error=case((exhausted, "Lease expired: the worker died or timed out"), else_=Job.last_error),
+                    locked_at=None,
+                )
+                .returning(Job.id, Job.kind, Job.status)
+            )
+            for job_id, kind, status in result.all():
+                if status == "failed":
+                    logger.error("Job %s (%s) failed permanently: lease expired on its last attempt", job_id, kind)
+                else:
+                    logger.warning("Job %s (%s) requeued after its lease expired", job_id, kind)
+            await db.commit()
+
+    async def execute(self, job: Job) -> None:
+        handler = HANDLERS.get(job.kind)
+        error = None
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind {job.kind!r}")
+            if inspect.iscoroutinefunction(handler):
+                run = handler(job.payload)
+            else:
+                run = run_in_threadpool(handler, job.payload)
+            # Bounded by the lease, so a hung handler fails its attempt and is retried instead of
+            # holding a worker slot forever. A sync handler's thread cannot be interrupted and
+            # runs on in the background; only its outcome is abandoned.
+            started = time.monotonic()
+            await asyncio.wait_for(run, timeout=self.lock_timeout)
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError) and time.monotonic() - started >= self.lock_timeout:
+                error = f"Handler timed out after {self.lock_timeout}s"  # not a timeout raised by the handler itself
+            else:
+                error = traceback.format_exc(limit=5)
+
+        now = datetime.now(timezone.utc)
+        if error is None:
+            values = {"status": "done", "finished_at": now, "locked_at": None, "last_error": None}
+        elif job.attempts >= job.max_attempts:
+            logger.error("Job %s (%s) failed permanently after %s attempts", job.id, job.kind, job.attempts)
+            values = {"status": "failed", "finished_at": now, "locked_at": None, "last_error": error}
+        else:
+            retry_at = now + backoff(job.attempts)
+            logger.warning("Job %s (%s) failed, attempt %s; retrying at %s", job.id, job.kind, job.attempts, retry_at)
+            values = {"status": "queued", "run_at": retry_at, "locked_at": None, "last_error": error}
+        # Fenced on the lease: if it expired and the job was requeued (or claimed again), this
+        # run's outcome is stale and must not overwrite the newer one
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(Job)
+                .where(Job.id == job.id, Job.status == "running", Job.locked_at == job.locked_at)
+                .values(**values)
+            )
+            await db.commit()
+        if result.rowcount == 0:
+            logger.warning("Job %s (%s) lost its lease while running; outcome discarded", job.id, job.kind)
+
+
+# --- Built-in handlers ---
+
+@job_handler("send_email")
+def _send_email(payload: dict) -> None:
+    from app.utils.emailer import send_email  # raises on failure, so the job is retried
+
+    send_email(payload["to"], payload["subject"], payload["body"])
+
+
+async def enqueue_email(db: AsyncSession, to: str, subject: str, body: str, idempotency_key: Optional[str] = None) -> None:
+    await enqueue(db, "send_email", {"to": to, "subject": subject, "body": body}, idempotency_key=idempotency_key)
@@ -0,0 +1,118 @@
+"""
+Live feed of listing changes for GET /listings/stream.
+
+The listings router publishes a compact event after each committed write; the broker
+(LISTEN/NOTIFY or Redis when several workers run) hands it to every worker, which keeps
+the most recent events in a ring buffer and offers each one to its own subscribers whose
+filters match. Brokers deliver in the same order everywhere, so a client can reconnect
+to any worker and resume after its Last-Event-ID from that worker's buffer.
+"""
+import logging
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.models.listing import Listing
+from app.services.broker import Broker, broker
+from app.utils.sse import EventQueue, format_event
+
+logger = logging.getLogger("listings")
+
+
+class ListingSubscriber:
+    def __init__(self, queue: EventQueue, category: Optional[str], university: Optional[str]):
+        self.queue = queue
+        self.category = category
+        self.university = university
+
+
+class ListingEventStream:
+    CHANNEL = "listings"
+
+    def __init__(self, broker: Broker, buffer_size: int, queue_size: int):
+        self.broker = broker
+        self.queue_size = queue_size
+        self._recent: Deque[Tuple[dict, str]] = deque(maxlen=buffer_size)  # (event, formatted frame)
+        # category filter (None: every category) -> subscribers
+        self._subscribers: Dict[Optional[str], Set[ListingSubscriber]] = {}
+
+    async def start(self) -> None:
+        await self.broker.subscribe(self.CHANNEL, self._on_event)
+
+    async def publish(self, kind: str, listing: Listing, university: Optional[str], old_category: Optional[str] = None) -> None:
+        """
+        Announce a committed write; `kind` is created, updated, status or deleted. Events stay
+        small (well under the NOTIFY payload limit); clients fetch the full listing if they need it.
+        """
+        event = {
+            "id": uuid.uuid4().hex,
+            "type": kind,
+            "listing": {
+                "id": listing.id,
+                "title": listing.title,
+                "category": listing.category,
+                "price": float(listing.price),
+                "status": listing.status,
+                "owner_id": listing.owner_id,
+                "university": university,
+            },
+        }
+        if old_category and old_category != listing.category:
+            event["old_category"] = old_category  # so streams filtered on it see the listing leave
+        await self.broker.publish(self.CHANNEL, event)
+
+    def connect(
+        self, category: Optional[str], university: Optional[str], last_event_id: Optional[str],
+    ) -> Tuple[ListingSubscriber, List[str]]:
+        """
+        Register a subscriber and return it with the frames to send first: the buffered events
+        after `last_event_id`, or a `resync` event if that id is no longer buffered. Nothing
+        awaits in between, so no event can fall between the replay and the live queue.
+        """
+        subscriber = ListingSubscriber(EventQueue(self.queue_size), category, university)
+        self._subscribers.setdefault(category, set()).add(subscriber)
+
+        backlog: List[str] = []
+        if last_event_id:
+            ids = [event["id"] for event, _ in self._recent]
+            if last_event_id in ids:
+                start = ids.index(last_event_id) + 1
+                backlog = [frame for event, frame in list(self._recent)[start:] if self._matches(subscriber, event)]
+            else:
+                # Too old for the buffer (or from before a restart): re-run the search instead
+                latest = self._recent[-1][0]["id"] if self._recent else None
+                backlog = [format_event({}, event="resync", id=latest)]
+        return subscriber, backlog
+
+    def disconnect(self, subscriber: ListingSubscriber) -> None:
+        subscribers = self._subscribers.get(subscriber.category)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.category]
+
+    @staticmethod
+    def _matches(subscriber: ListingSubscriber, event: dict) -> bool:
+        listing = event["listing"]
+        if subscriber.category is not None and subscriber.category not in (listing["category"], event.get("old_category")):
+            return False
+        return subscriber.university is None or subscriber.university == listing["university"]
+
+    async def _on_event(self, event: dict) -> None:
+        frame = format_event(event, event=event["type"], id=event["id"])
+        self._recent.append((event, frame))
+        categories = {None, event["listing"]["category"], event.get("old_category")}
+        for category in categories:
+            for subscriber in list(self._subscribers.get(category, ())):
+                if subscriber.queue.overflowed or not self._matches(subscriber, event):
+                    continue
+                if not subscriber.queue.offer(frame):
+                    logger.info("Listing stream subscriber fell behind; closing it")
+
+
+listing_events = ListingEventStream(
+    broker,
+    buffer_size=settings.LISTING_STREAM_BUFFER_SIZE,
+    queue_size=settings.LISTING_STREAM_QUEUE_SIZE,
+)
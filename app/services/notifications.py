@@ -0,0 +1,179 @@
+"""
+In-app notifications: rows in the notifications table, pushed live to connected clients.
+
+Writers call `create_notifications` inside their own transaction and hand the returned
+events to `notification_hub.publish` after commit. The hub fans events out over the
+broker; each worker delivers them to its own SSE streams and keeps per-user unread
+counts current, so neither the stream nor the badge has to poll the database.
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.notification import Notification
+from app.services.broker import Broker, broker
+from app.utils.sse import EventQueue, format_event
+
+logger = logging.getLogger("notifications")
+
+CHAT_PREVIEW_LENGTH = 100
+
+
+def notification_out(n) -> dict:
+    """API shape of a notification (a Notification or a row with the same columns)."""
+    return {
+        "id": n.id,
+        "type": n.type,
+        "payload": n.payload,
+        "is_read": n.is_read,
+        "created_at": n.created_at.isoformat() if n.created_at else None,
+        "user_id": n.user_id,
+    }
+
+
+async def create_notifications(db: AsyncSession, items: Iterable[Tuple[int, str, dict]]) -> List[dict]:
+    """
+    Insert one notification per (user_id, type, payload) in the caller's transaction, in one
+    statement. Returns the events to pass to `notification_hub.publish` once committed.
+    """
+    values = [
+        {"user_id": user_id, "type": kind, "payload": json.dumps(payload, ensure_ascii=False), "is_read": False}
+        for user_id, kind, payload in items
+    ]
+    if not values:
+        return []
+    result = await db.execute(
+        insert(Notification).values(values).returning(
+            Notification.id, Notification.user_id, Notification.type, Notification.payload,
+            Notification.is_read, Notification.created_at,
+        )
+    )
+    return [notification_out(row) for row in result]
+
+
+async def notify_chat_messages(db: AsyncSession, messages: Iterable[dict]) -> List[dict]:
+    """One notification per receiver and conversation, for the newest message of the batch."""
+    latest: Dict[Tuple[int, int, int], dict] = {}
+    for m in messages:
+        key = (m["receiver_id"], m["sender_id"], m["listing_id"])
+        if key not in latest or m["id"] > latest[key]["id"]:
+            latest[key] = m
+    return await create_notifications(db, [
+        (m["receiver_id"], "chat_message", {
+            "message_id": m["id"],
+            "sender_id": m["sender_id"],
+            "listing_id": m["listing_id"],
+            "preview": m["content"][:CHAT_PREVIEW_LENGTH],
+        })
+        for m in latest.values()
+    ])
+
+
+async def mark_read(db: AsyncSession, user_id: int, up_to_id: int) -> int:
+    """Mark every unread notification with id <= up_to_id as read, in one UPDATE. Does not commit."""
+    result = await db.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.id <= up_to_id, ~Notification.is_read)
+        .values(is_read=True)
+    )
+    return result.rowcount
+
+
+class NotificationHub:
+    """This worker's notification streams and its cache of unread counts."""
+
+    CHANNEL = "notifications"
+
+    def __init__(self, broker: Broker, session_factory: async_sessionmaker, queue_size: int, unread_ttl: int, max_size: int):
+        self.broker = broker
+        self.session_factory = session_factory
+        self.queue_size = queue_size
+        self.unread_ttl = unread_ttl
+        self.max_size = max_size
+        # user id -> that user's open streams on this worker
+        self.streams: Dict[int, Set[EventQueue]] = {}
+        self._unread: "OrderedDict[int, tuple[float, int]]" = OrderedDict()
+
+    async def start(self) -> None:
+        await self.broker.subscribe(self.CHANNEL, self._on_message)
+
+    def connect(self, user_id: int) -> EventQueue:
+        queue = EventQueue(self.queue_size)
+        self.streams.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def disconnect(self, user_id: int, queue: EventQueue) -> None:
+        queues = self.streams.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.streams[user_id]
+
+    async def publish(self, events: Iterable[dict]) -> None:
+        """Deliver committed notifications to their users on every worker."""
+        for event in events:
+            await self.broker.publish(self.CHANNEL, {"new": event})
+
+    async def read(self, user_id: int, up_to_id: int, unread: int) -> None:
+        """Announce a mark-read so every worker updates its count and the user's other devices."""
+        await self.broker.publish(self.CHANNEL, {"read": {"user_id": user_id, "up_to_id": up_to_id, "unread": unread}})
+
+    async def unread_count(self, user_id: int) -> int:
+        entry = self._unread.get(user_id)
+        if entry is not None and entry[0] >= time.monotonic():
+            self._unread.move_to_end(user_id)
+            return entry[1]
+        async with self.session_factory() as db:
+            count = await db.scalar(
+                select(func.count())
+                .select_from(Notification)
+                .where(Notification.user_id == user_id, ~Notification.is_read)
+            )
+        self._set_unread(user_id, count)
+        return count
+
+    def _set_unread(self, user_id: int, count: int) -> None:
+        self._unread[user_id] = (time.monotonic() + self.unread_ttl, count)
+        self._unread.move_to_end(user_id)
+        while len(self._unread) > self.max_size:
+            self._unread.popitem(last=False)
+
+    async def _on_message(self, message: dict) -> None:
+        if "new" in message:
+            event = message["new"]
+            user_id = event["user_id"]
+            entry = self._unread.get(user_id)
+            if entry is not None:
+                # A count loaded while this event was in flight may include it; the TTL bounds that
+                self._unread[user_id] = (entry[0], entry[1] + 1)
+            event_id = event["id"]
+            frame = format_event(event, event="notification", id=event_id)
+        elif "read" in message:
+            event = message["read"]
+            user_id = event["user_id"]
+            self._set_unread(user_id, event["unread"])
+            event_id = None
+            frame = format_event(event, event="read")
+        else:
+            return
+        for queue in list(self.streams.get(user_id, ())):
+            if queue.overflowed:
+                continue  # already being closed
+            if not queue.offer(frame, event_id):
+                logger.info("Notification stream for user %s fell behind; closing it", user_id)
+
+
+notification_hub = NotificationHub(
+    broker,
+    AsyncSessionLocal,
+    queue_size=settings.NOTIFICATION_QUEUE_SIZE,
+    unread_ttl=settings.NOTIFICATION_UNREAD_TTL_SECONDS,
+    max_size=settings.NOTIFICATION_UNREAD_CACHE_SIZE,
+)
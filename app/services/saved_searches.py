@@ -0,0 +1,88 @@
+"""
+Saved searches, matched incrementally against each new listing.
+
+Instead of re-running every saved search, a new listing is looked up in the saved
+searches themselves: the category index (probed once for the listing's category and
+once for searches without one) and the GiST index on price_range narrow the candidates
+to searches whose category and price bounds admit the listing, and only those are
+checked against the listing's search_vector with their stored tsquery.
+Matches are delivered as notifications, one per user.
+"""
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, func, literal_column, or_, select, union_all
+from sqlalchemy.dialects.postgresql import Range
+
+from app.db.session import AsyncSessionLocal
+from app.models.listing import Listing
+from app.models.saved_search import SavedSearch
+from app.schemas.saved_search import SavedSearchCreate
+from app.services.notifications import create_notifications, notification_hub
+
+logger = logging.getLogger("saved_searches")
+
+
+def build_saved_search(user_id: int, data: SavedSearchCreate) -> SavedSearch:
+    return SavedSearch(
+        user_id=user_id,
+        name=data.name,
+        q=data.q,
+        # Stop-word-only keywords give an empty tsquery, which would never match; store NULL instead
+        query=func.nullif(func.plainto_tsquery("english", data.q), literal_column("''::tsquery")) if data.q else None,
+        category=data.category,
+        university=data.university,
+        price_range=Range(data.min_price, data.max_price, bounds="[]"),
+    )
+
+
+def match_statement(listing_id: int, university: Optional[str]):
+    """
+    Saved searches (id, user_id) that a listing satisfies, excluding its owner's. Searches
+    in the listing's category and searches without one are separate branches of a UNION
+    ALL (they are disjoint), so each is a plain lookup on the category index instead of
+    an OR the planner may answer with a scan.
+    """
+    listing = (
+        select(Listing.category, Listing.price, Listing.owner_id, Listing.search_vector)
+        .where(Listing.id == listing_id)
+        .subquery("listing")
+    )
+
+    def candidates(category_matches):
+        return (
+            select(SavedSearch.id, SavedSearch.user_id)
+            .join(listing, and_(
+                category_matches,
+                SavedSearch.price_range.contains(listing.c.price),
+                SavedSearch.user_id != listing.c.owner_id,
+            ))
+            .where(
+                or_(SavedSearch.university.is_(None), SavedSearch.university == university),
+                or_(SavedSearch.query.is_(None), listing.c.search_vector.op("@@")(SavedSearch.query)),
+            )
+        )
+
+    return union_all(
+        candidates(SavedSearch.category == listing.c.category),
+        candidates(SavedSearch.category.is_(None)),
+    )
+
+
+async def notify_matches(listing_id: int, university: Optional[str]) -> None:
+    """Background stage after create_listing: notify every user with a matching saved search."""
+    async with AsyncSessionLocal() as db:
+        listing = await db.get(Listing, listing_id)
+        if listing is None:
+            return
+        matches: Dict[int, List[int]] = {}
+        for search_id, user_id in await db.execute(match_statement(listing_id, university)):
+            matches.setdefault(user_id, []).append(search_id)
+        events = await create_notifications(db, [
+            (user_id, "saved_search", {"listing_id": listing_id, "title": listing.title[:100], "saved_search_ids": ids[:10]})
+            for user_id, ids in matches.items()
+        ])
+        await db.commit()
+    await notification_hub.publish(events)
+    if matches:
+        logger.info("Listing %s matched saved searches of %s users", listing_id, len(matches))
@@ -1,33 +1,201 @@
 import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart # Import MIMEMultipart for proper email construction
+from typing import Iterator, List, Optional, Sequence, Tuple
 from app.core.config import settings
 
-def send_email(to_email: str, subject: str, body: str) -> None:
-    # Check if necessary email settings are configured
-    if not settings.MAIL_SERVER or not settings.MAIL_USERNAME or not settings.MAIL_PASSWORD:
-        print(f"[EMAIL-DEBUG] Email not configured. To: {to_email}\nSubject: {subject}\n\n{body}")
-        return
+# Errors after which the session is unusable; the message is retried once on a fresh connection
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+@dataclass
+class _PooledConnection:
+    smtp: smtplib.SMTP
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    messages: int = 0
+
+
+class SMTPPool:
+    """
+    Thread-safe pool of connected, authenticated SMTP sessions, so each message costs one
+    MAIL/RCPT/DATA exchange instead of connect + STARTTLS + login. A session is replaced
+    after `max_messages` messages or `idle_timeout` seconds unused (servers drop idle
+    clients), and whenever it fails at the connection level.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        ssl: bool = False,
+        size: int = 4,
+        max_messages: int = 100,
+        idle_timeout: float = 60.0,
+        timeout: float = 30.0,
+    ):
+        self.host, self.port = host, port
+        self.username, self.password = username, password
+        self.starttls, self.ssl = starttls, ssl
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: List[_PooledConnection] = []
+        self._lock = threading.Lock()
+        # Metrics
+        self.sent = 0
+        self.failed = 0
+        self.connections_opened = 0
+        self.reconnects = 0
+        self.send_seconds = 0.0
+        self.started_at = time.monotonic()
+
+    def _connect(self) -> _PooledConnection:
+        if self.ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                smtp.starttls()
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        with self._lock:
+            self.connections_opened += 1
+        return _PooledConnection(smtp)
+
+    @staticmethod
+    def _close(conn: _PooledConnection) -> None:
+        try:
+            conn.smtp.quit()
+        except Exception:
+            conn.smtp.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[_PooledConnection]:
+        """Borrow a session (at most `size` are out at once); it goes back to the pool unless it broke."""
+        self._slots.acquire()
+        conn = None
+        try:
+            with self._lock:
+                while self._idle and conn is None:
+                    candidate = self._idle.pop()  # most recently used first: the likeliest to be alive
+                    if time.monotonic() - candidate.last_used > self.idle_timeout:
+                        self._close(candidate)
+                    else:
+                        conn = candidate
+            if conn is None:
+                conn = self._connect()
+            yield conn
+            conn.last_used = time.monotonic()
+            if conn.messages >= self.max_messages:
+                self._close(conn)
+            else:
+                with self._lock:
+                    self._idle.append(conn)
+        except BaseException:
+            if conn is not None:
+                self._close(conn)
+            raise
+        finally:
+            self._slots.release()
+
+    def _send_one(self, conn: _PooledConnection, from_addr: str, to_addrs: Sequence[str], message: str) -> None:
+        started = time.monotonic()
+        conn.smtp.sendmail(from_addr, list(to_addrs), message)
+        conn.messages += 1
+        with self._lock:
+            self.sent += 1
+            self.send_seconds += time.monotonic() - started
 
+    def send(self, from_addr: str, to_addrs: Sequence[str], message: str) -> None:
+        self.send_many([(from_addr, to_addrs, message)])
+
+    def send_many(self, messages: Sequence[Tuple[str, Sequence[str], str]]) -> None:
+        """Send messages in order over one session, reconnecting (once per message) if it drops."""
+        pending = list(messages)
+        retried = False
+        while pending:
+            try:
+                with self.connection() as conn:
+                    while pending:
+                        self._send_one(conn, *pending[0])
+                        pending.pop(0)
+                        retried = False
+            except _CONNECTION_ERRORS:
+                if retried:
+                    with self._lock:
+                        self.failed += 1
+                    raise
+                retried = True
+                with self._lock:
+                    self.reconnects += 1
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close(conn)
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        with self._lock:
+            return {
+                "sent": self.sent,
+                "failed": self.failed,
+                "connections_opened": self.connections_opened,
+                "reconnects": self.reconnects,
+                "idle_connections": len(self._idle),
+                "messages_per_connection": round(self.sent / self.connections_opened, 2) if self.connections_opened else 0.0,
+                "avg_send_ms": round(self.send_seconds / self.sent * 1000, 2) if self.sent else 0.0,
+                "messages_per_second": round(self.sent / elapsed, 2) if elapsed else 0.0,
+            }
+
+
+email_pool = SMTPPool(
+    settings.MAIL_SERVER,
+    settings.MAIL_PORT,
+    username=settings.MAIL_USERNAME,
+    password=settings.MAIL_PASSWORD,
+    starttls=settings.MAIL_STARTTLS,
+    ssl=settings.MAIL_SSL_TLS,
+    size=settings.MAIL_POOL_SIZE,
+    max_messages=settings.MAIL_POOL_MAX_MESSAGES,
+    idle_timeout=settings.MAIL_POOL_IDLE_SECONDS,
+)
+
+
+def build_message(to_email: str, subject: str, body: str) -> str:
     # Create a MIMEText object for the email body
     msg = MIMEMultipart()
     msg['Subject'] = subject
     msg['From'] = settings.MAIL_FROM # Corrected: Use MAIL_FROM
     msg['To'] = to_email
     msg.attach(MIMEText(body, 'plain')) # Attach the plain text body
+    return msg.as_string()
+
+
+def send_email(to_email: str, subject: str, body: str) -> None:
+    # Check if necessary email settings are configured
+    if not settings.MAIL_SERVER or not settings.MAIL_USERNAME or not settings.MAIL_PASSWORD:
+        print(f"[EMAIL-DEBUG] Email not configured. To: {to_email}\nSubject: {subject}\n\n{body}")
+        return
 
     try:
-        # Establish SMTP connection
-        # Corrected: Use MAIL_SERVER and MAIL_PORT
-        with smtplib.SMTP(settings.MAIL_SERVER, settings.MAIL_PORT) as s:
-            # Start TLS encryption if enabled in settings
-            if settings.MAIL_STARTTLS: # Check for MAIL_STARTTLS setting
-                s.starttls()
-            # Login to the SMTP server
-            # Corrected: Use MAIL_USERNAME and MAIL_PASSWORD
-            s.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
-            # Send the email
-            s.sendmail(settings.MAIL_FROM, [to_email], msg.as_string())
-            print(f"Email sent successfully to {to_email}")
+        # Reuses a pooled, already authenticated session when one is free
+        email_pool.send(settings.MAIL_FROM, [to_email], build_message(to_email, subject, body))
+        print(f"Email sent successfully to {to_email}")
     except Exception as e:
-        print(f"Failed to send email to {to_email}: {e}")
\ No newline at end of file
+        print(f"Failed to send email to {to_email}: {e}")
+        raise  # callers (the send_email job) retry
@@ -0,0 +1,162 @@
+"""
+CPU-bound image work for listing uploads: EXIF stripping, resized WebP variants
+and a blurhash placeholder. Runs in a process pool so it never holds the event
+loop or the GIL of the serving process.
+"""
+import io
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.core.config import settings
+
+# name -> longest edge in pixels
+VARIANTS = {"thumb": 320, "medium": 1024}
+WEBP_QUALITY = 80
+
+# Formats originals are published in (re-encoded without metadata), and their extensions;
+# anything else Pillow decodes is converted to one of them, never published as uploaded
+ORIGINAL_CONTENT_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+ORIGINAL_EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}
+
+# Reject decompression bombs well below Pillow's own hard limit
+Image.MAX_IMAGE_PIXELS = 50_000_000
+
+
+class InvalidImage(Exception):
+    """The upload is not an image Pillow can decode."""
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Content type of an upload from its first 12 bytes, for the formats accepted as uploads; None otherwise."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def image_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and DB pools is not safe
+        _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_image_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+def process_image(data: bytes) -> dict:
+    """
+    Decode an upload and return its dimensions, blurhash, a metadata-free re-encode of
+    the original (JPEG, PNG or WebP, with its content type and extension) and every WebP
+    variant. The upload's own bytes are never part of the result.
+    """
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise InvalidImage(str(e)) from None
+
+    fmt = "JPEG" if img.format == "MPO" else img.format  # MPO: the multi-picture JPEG phone cameras write
+    img = ImageOps.exif_transpose(img)  # bake the orientation in before EXIF is dropped
+    icc_profile = img.info.get("icc_profile")
+    # Keep only what affects rendering; EXIF (GPS, device, timestamps) and XMP go
+    img.info = {k: v for k, v in img.info.items() if k in ("icc_profile", "transparency")}
+
+    if fmt not in ORIGINAL_CONTENT_TYPES:
+        # GIF, TIFF, BMP, ...: converted to PNG if it has transparency, JPEG otherwise
+        if "A" in img.getbands() or "transparency" in img.info:
+            fmt, img_out = "PNG", img.convert("RGBA")
+        else:
+            fmt, img_out = "JPEG", img
+    else:
+        img_out = img
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        img_out.convert("RGB").save(buf, "JPEG", quality=90, optimize=True, icc_profile=icc_profile)
+    else:
+        img_out.save(buf, fmt, icc_profile=icc_profile)
+    content_type = ORIGINAL_CONTENT_TYPES[fmt]
+    original = {"data": buf.getvalue(), "content_type": content_type, "extension": ORIGINAL_EXTENSIONS[content_type]}
+
+    variants = {}
+    for name, edge in VARIANTS.items():
+        v = img.copy()
+        v.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        if v.mode not in ("RGB", "RGBA"):
+            v = v.convert("RGBA" if "A" in v.getbands() or "transparency" in v.info else "RGB")
+        buf = io.BytesIO()
+        v.save(buf, "WEBP", quality=WEBP_QUALITY, method=4, icc_profile=icc_profile)
+        variants[name] = {"data": buf.getvalue(), "width": v.width, "height": v.height}
+
+    return {
+        "width": img.width,
+        "height": img.height,
+        "blurhash": blurhash(img),
+        "original": original,
+        "variants": variants,
+    }
+
+
+# --- blurhash (https://blurha.sh), encoded from a 32x32 downsample ---
+
+_B83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _b83(value: int, length: int) -> str:
+    return "".join(_B83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _to_linear(v: int) -> float:
+    v = v / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _to_srgb(v: float) -> int:
+    v = max(0.0, min(1.0, v))
+    return int(round((v * 12.92 if v <= 0.0031308 else 1.055 * v ** (1 / 2.4) - 0.055) * 255))
+
+
+def blurhash(img: Image.Image, x_components: int = 4, y_components: int = 3) -> str:
+    size = 32
+    pixels = [tuple(_to_linear(c) for c in p) for p in img.convert("RGB").resize((size, size)).getdata()]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            r = g = b = 0.0
+            for y in range(size):
+                cy = math.cos(math.pi * j * y / size)
+                for x in range(size):
+                    basis = cy * math.cos(math.pi * i * x / size)
+                    pr, pg, pb = pixels[y * size + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = (1 if i == 0 and j == 0 else 2) / (size * size)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _b83((x_components - 1) + (y_components - 1) * 9, 1)
+    quant_max = max(0, min(82, int(math.floor(max(abs(c) for f in ac for c in f) * 166 - 0.5))))
+    max_value = (quant_max + 1) / 166
+    result += _b83(quant_max, 1)
+    result += _b83((_to_srgb(dc[0]) << 16) + (_to_srgb(dc[1]) << 8) + _to_srgb(dc[2]), 4)
+    for f in ac:
+        q = [max(0, min(18, int(math.floor(math.copysign(abs(c / max_value) ** 0.5, c) * 9 + 9.5)))) for c in f]
+        result += _b83(q[0] * 19 * 19 + q[1] * 19 + q[2], 2)
+    return result
@@ -0,0 +1,93 @@
+"""
+Server-Sent Events helpers shared by the streaming endpoints.
+
+Each client gets a bounded EventQueue. A client that falls behind is dropped instead of
+being buffered without limit; EventSource reconnects on its own with Last-Event-ID and
+the endpoint replays what it missed.
+"""
+import asyncio
+import json
+from typing import AsyncIterator, Callable, Iterable, Optional, Tuple, Union
+
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+
+def format_event(data, event: Optional[str] = None, id: Optional[Union[int, str]] = None) -> str:
+    """One SSE frame; `data` is serialized as JSON unless it is already a string."""
+    if not isinstance(data, str):
+        data = json.dumps(data, separators=(",", ":"), default=str)
+    lines = []
+    if id is not None:
+        lines.append(f"id: {id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+class EventQueue:
+    """Bounded queue of formatted frames for one client."""
+
+    def __init__(self, maxsize: int):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def offer(self, frame: str, id: Optional[int] = None) -> bool:
+        """Queue a frame (with its event id, if any); once one does not fit the client is marked to be dropped."""
+        if self.overflowed:
+            return False
+        try:
+            self._queue.put_nowait((id, frame))
+            return True
+        except asyncio.QueueFull:
+            self.overflowed = True
+            return False
+
+    async def get(self, timeout: float) -> Optional[Tuple[Optional[int], str]]:
+        """Next (id, frame), or None after `timeout` seconds without one."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+
+async def stream(
+    queue: EventQueue,
+    heartbeat: float,
+    initial: Iterable[str] = (),
+    sent_through: Optional[int] = None,
+    retry_ms: int = 3000,
+) -> AsyncIterator[str]:
+    """
+    Yield `initial` frames (a replay through event id `sent_through`), then the queue's
+    frames as they arrive, skipping ids the replay already covered. A comment line goes
+    out every `heartbeat` idle seconds so proxies keep the connection open. Ends once an
+    overflowed queue is drained; everything sent before that is contiguous, so resuming
+    from the last delivered id loses nothing.
+    """
+    yield f"retry: {retry_ms}\n\n"
+    for frame in initial:
+        yield frame
+    while not (queue.overflowed and queue.empty()):
+        item = await queue.get(heartbeat)
+        if item is None:
+            yield ": ping\n\n"
+        elif item[0] is None or sent_through is None or item[0] > sent_through:
+            yield item[1]
+
+
+def sse_response(frames: AsyncIterator[str], on_close: Optional[Callable[[], None]] = None) -> StreamingResponse:
+    """
+    Stream `frames` as text/event-stream. `on_close` runs once the stream ends for any
+    reason, including a client that disconnects before the first frame is sent.
+    """
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # no proxy buffering (nginx)
+        background=BackgroundTask(on_close) if on_close else None,
+    )
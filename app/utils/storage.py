@@ -1,10 +1,13 @@
-import os
+import asyncio
+import hashlib
+import hmac
 import uuid
-from typing import Tuple
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional, Sequence, Tuple
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
-import boto3  # type: ignore
-from botocore.config import Config  # type: ignore
+from app.utils.images import VARIANTS, image_pool, process_image
+from app.utils.storage_backends import S3Storage, storage
 
 
 def gen_object_key(prefix: str, filename: str) -> str:
@@ -15,70 +18,196 @@ def gen_object_key(prefix: str, filename: str) -> str:
 
 def public_url_for_key(key: str) -> str:
     """Return public URL for stored object."""
-    if settings.STORAGE_BACKEND == "S3":
-        if settings.S3_PUBLIC_BASE_URL:
-            base = settings.S3_PUBLIC_BASE_URL.rstrip("/")
-            return f"{base}/{key}"
-        return f"https://{settings.S3_BUCKET}.s3.{settings.S3_REGION}.amazonaws.com/{key}"
-    return f"/uploads/{key.removeprefix('listings/')}"
+    return storage.public_url(key)
 
 
 def get_s3_client():
-    """Return a configured boto3 S3 client."""
-    return boto3.client(
-        "s3",
-        region_name=settings.S3_REGION,
-        aws_access_key_id=settings.S3_ACCESS_KEY,
-        aws_secret_access_key=settings.S3_SECRET_KEY,
-        config=Config(signature_version="s3v4"),
-    )
+    """Return the process-wide boto3 S3 client (STORAGE_BACKEND=S3 only)."""
+    if not isinstance(storage, S3Storage):
+        raise RuntimeError("STORAGE_BACKEND is not S3")
+    return storage.client
+
+
+class UploadTooLarge(Exception):
+    """Raised while streaming an upload once it exceeds MAX_UPLOAD_BYTES."""
+
+
+class _LimitedReader:
+    """Read-only file wrapper that raises UploadTooLarge once more than `limit` bytes were read."""
+
+    def __init__(self, fileobj: BinaryIO, limit: int):
+        self.fileobj = fileobj
+        self.limit = limit
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.limit - self.bytes_read + 1  # never more than enough to detect the overflow
+        data = self.fileobj.read(size)
+        self.bytes_read += len(data)
+        if self.bytes_read > self.limit:
+            raise UploadTooLarge(f"Upload exceeds {self.limit} bytes")
+        return data
+
+
+def _store(src: BinaryIO, key: str) -> None:
+    """Stream `src` to storage under `key`, one chunk at a time. Blocking; run it in a thread."""
+    storage.put_stream(key, _LimitedReader(src, settings.MAX_UPLOAD_BYTES))
+
+
+def delete_key(key: str) -> None:
+    """Remove a stored object; missing objects are ignored."""
+    storage.delete(key)
 
 
 def save_upload(file: UploadFile, subdir: str = "uploads") -> str:
     """
     Save a file either to local storage or S3 depending on STORAGE_BACKEND.
-    Returns the public URL of the stored file.
+    Returns the public URL of the stored file. Blocking; raises UploadTooLarge.
     """
-    key = gen_object_key(subdir, file.filename)
-
-    if settings.STORAGE_BACKEND == "S3":
-        s3 = get_s3_client()
-        s3.upload_fileobj(file.file, settings.S3_BUCKET, key)
-    else:
-        base = settings.UPLOAD_DIR or "./uploads"
-        abs_path = os.path.join(base, key)
-        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
-        with open(abs_path, "wb") as f:
-            f.write(file.file.read())
-
-    return public_url_for_key(key)
+    return save_upload_with_key(file, subdir)[1]
 
 
-def save_upload_with_key(file: UploadFile, subdir: str = "uploads") -> Tuple[str, str]:
+def save_upload_with_key(file: UploadFile, subdir: str = "uploads", extension: Optional[str] = None) -> Tuple[str, str]:
     """
     Save file and return both (key, public_url).
     Useful if you need to store the key in DB for later S3 operations.
+    The key gets `extension` if given (one derived from the content, not the client's filename).
     """
-    key = gen_object_key(subdir, file.filename)
-
-    if settings.STORAGE_BACKEND == "S3":
-        s3 = get_s3_client()
-        s3.upload_fileobj(file.file, settings.S3_BUCKET, key)
-    else:
-        base = settings.UPLOAD_DIR or "./uploads"
-        abs_path = os.path.join(base, key)
-        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
-        with open(abs_path, "wb") as f:
-            f.write(file.file.read())
-
+    if file.size is not None and file.size > settings.MAX_UPLOAD_BYTES:
+        raise UploadTooLarge(f"Upload exceeds {settings.MAX_UPLOAD_BYTES} bytes")
+    key = gen_object_key(subdir, f"upload.{extension}" if extension else file.filename)
+    _store(file.file, key)
     return key, public_url_for_key(key)
 
 
-def create_presigned_put(key: str, content_type: str, expires: int = 3600) -> str:
-    """Generate a presigned PUT URL for AWS S3."""
-    client = get_s3_client()
-    return client.generate_presigned_url(
-        "put_object",
-        Params={"Bucket": settings.S3_BUCKET, "Key": key, "ContentType": content_type},
-        ExpiresIn=expires,
+async def save_uploads(
+    files: Sequence[UploadFile], subdir: str = "uploads", extensions: Optional[Sequence[str]] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Store several uploads concurrently, each streamed in a worker thread, and return their
+    (key, public_url) pairs in order. If any upload fails, the ones already stored are removed.
+    `extensions`, if given, holds one key extension per file (see save_upload_with_key).
+    """
+    extensions = extensions or [None] * len(files)
+    results = await asyncio.gather(
+        *(run_in_threadpool(save_upload_with_key, f, subdir, ext) for f, ext in zip(files, extensions)),
+        return_exceptions=True,
     )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        stored = [r[0] for r in results if not isinstance(r, BaseException)]
+        await asyncio.gather(*(run_in_threadpool(delete_key, key) for key in stored), return_exceptions=True)
+        raise errors[0]
+    return list(results)
+
+
+def read_key(key: str) -> bytes:
+    """Return a stored object's bytes. Blocking."""
+    return storage.get_bytes(key)
+
+
+def put_key(key: str, data: bytes, content_type: str) -> None:
+    """Store `data` under `key`, replacing any existing object. Blocking."""
+    storage.put_bytes(key, data, content_type)
+
+
+def variant_key(key: str, name: str) -> str:
+    """Key of a derivative: listings/<uuid>.jpg -> listings/<uuid>.<name>.webp"""
+    return f"{key.rsplit('.', 1)[0]}.{name}.webp"
+
+
+async def ingest_image(key: str, dest_prefix: str) -> Tuple[str, Dict]:
+    """
+    Derive the web renditions of the upload stored under `key` and return the key of its
+    published copy with that copy's manifest:
+    {url, width, height, blurhash, variants: {name: {url, width, height}}}.
+
+    Decoding and encoding run in the image process pool. The original is always re-encoded
+    (JPEG, PNG or WebP, without EXIF) and written, with its variants, under a new key in
+    `dest_prefix` whose extension and content type come from the re-encode, never from the
+    upload; only then is the upload deleted. Nothing is ever rewritten in place, so
+    published URLs stay immutable. Raises images.InvalidImage if the object is not an
+    image (the upload is kept).
+    """
+    data = await run_in_threadpool(read_key, key)
+    result = await asyncio.get_running_loop().run_in_executor(image_pool(), process_image, data)
+    del data
+
+    original = result["original"]
+    dest_key = gen_object_key(dest_prefix, f"original.{original['extension']}")
+    writes = [run_in_threadpool(put_key, dest_key, original["data"], original["content_type"])]
+    variants = {}
+    for name, v in result["variants"].items():
+        vkey = variant_key(dest_key, name)
+        writes.append(run_in_threadpool(put_key, vkey, v["data"], "image/webp"))
+        variants[name] = {"url": public_url_for_key(vkey), "width": v["width"], "height": v["height"]}
+    try:
+        await asyncio.gather(*writes)
+    except BaseException:
+        await delete_renditions(dest_key)
+        raise
+    await run_in_threadpool(delete_key, key)
+
+    return dest_key, {
+        "url": public_url_for_key(dest_key),
+        "width": result["width"],
+        "height": result["height"],
+        "blurhash": result["blurhash"],
+        "variants": variants,
+    }
+
+
+async def ingest_images(keys: Sequence[str], dest_prefix: str) -> List[Tuple[str, Dict]]:
+    """Ingest several stored uploads concurrently; (published key, manifest) pairs are returned in order."""
+    return list(await asyncio.gather(*(ingest_image(key, dest_prefix) for key in keys)))
+
+
+async def delete_renditions(key: str) -> None:
+    """Remove an ingested image and its variants; missing objects are ignored."""
+    keys = [key] + [variant_key(key, name) for name in VARIANTS]
+    await asyncio.gather(*(run_in_threadpool(delete_key, k) for k in keys), return_exceptions=True)
+
+
+def head_key(key: str) -> Optional[int]:
+    """Return the size of a stored object, or None if it does not exist. Blocking."""
+    return storage.head(key)
+
+
+def create_presigned_put(key: str, content_type: str, expires: int = 3600, content_length: Optional[int] = None) -> Optional[str]:
+    """
+    Generate a presigned PUT URL, or None if the backend has no native one (LOCAL, MEMORY);
+    those use the app's signed upload endpoint instead (see sign_local_put).
+    """
+    return storage.presigned_put(key, content_type, expires, content_length)
+
+
+# --- Stand-in for presigned PUTs on LOCAL/MEMORY: an HMAC over the same fields S3 would sign ---
+
+def sign_local_put(key: str, content_type: str, content_length: int, expires_at: int) -> str:
+    msg = f"{key}\n{content_type}\n{content_length}\n{expires_at}".encode()
+    return hmac.new(settings.JWT_SECRET.encode(), msg, hashlib.sha256).hexdigest()
+
+
+def verify_local_put(key: str, content_type: str, content_length: int, expires_at: int, signature: str) -> bool:
+    return hmac.compare_digest(sign_local_put(key, content_type, content_length, expires_at), signature)
+
+
+async def write_stream(key: str, chunks: AsyncIterator[bytes], limit: int) -> int:
+    """
+    Write an async byte stream to storage under `key`, each chunk in a worker thread.
+    Raises UploadTooLarge past `limit` bytes; a partial object is never left behind.
+    """
+    f = await run_in_threadpool(storage.open_write, key)
+    written = 0
+    try:
+        async for chunk in chunks:
+            written += len(chunk)
+            if written > limit:
+                raise UploadTooLarge(f"Upload exceeds {limit} bytes")
+            await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        await run_in_threadpool(f.discard)
+        raise
+    await run_in_threadpool(f.close)
+    return written
@@ -0,0 +1,369 @@
+"""
+Object storage backends behind app.utils.storage. All methods are blocking and
+thread-safe; async callers run them through the thread pool.
+"""
+import abc
+import io
+import os
+import shutil
+import tempfile
+import threading
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+class StorageBackend(abc.ABC):
+    """Blocking object storage keyed by object key (e.g. listings/<user>/<uuid>.jpg)."""
+
+    @abc.abstractmethod
+    def put_stream(self, key: str, fileobj: BinaryIO, content_type: Optional[str] = None) -> None:
+        """Store everything read from `fileobj`, streaming it in chunks."""
+
+    @abc.abstractmethod
+    def put_bytes(self, key: str, data: bytes, content_type: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def open_write(self, key: str) -> BinaryIO:
+        """
+        Writable handle for `key`. The object appears, complete, only once the handle is
+        closed; `discard()` (or leaving its `with` block on an exception) drops it instead.
+        """
+
+    @abc.abstractmethod
+    def get_bytes(self, key: str) -> bytes:
+        ...
+
+    @abc.abstractmethod
+    def head(self, key: str) -> Optional[int]:
+        """Size of the object in bytes, or None if it does not exist."""
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove an object; missing objects are ignored."""
+
+    @abc.abstractmethod
+    def public_url(self, key: str) -> str:
+        ...
+
+    def presigned_put(self, key: str, content_type: str, expires: int, content_length: Optional[int] = None) -> Optional[str]:
+        """URL the client can PUT the object to directly, or None if the backend has none."""
+        return None
+
+
+class _AtomicFile:
+    """
+    Writes to a temporary file next to `path` and renames it over `path` on close, so
+    readers (and a crash mid-write) only ever see the previous object or the whole new one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def write(self, data: bytes) -> int:
+        return self._file.write(data)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self.tmp_path, self.path)
+        except BaseException:
+            self.discard()
+            raise
+
+    def discard(self) -> None:
+        self._file.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "_AtomicFile":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class LocalStorage(StorageBackend):
+    """Files under UPLOAD_DIR, served by the app itself."""
+
+    def __init__(self, root: str, chunk_size: int):
+        self.root = root
+        self.chunk_size = chunk_size
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def put_stream(self, key: str, fileobj: BinaryIO, content_type: Optional[str] = None) -> None:
+        with self.open_write(key) as f:
+            shutil.copyfileobj(fileobj, f, self.chunk_size)
+
+    def put_bytes(self, key: str, data: bytes, content_type: str) -> None:
+        with self.open_write(key) as f:
+            f.write(data)
+
+    def open_write(self, key: str) -> BinaryIO:
+        abs_path = self.path(key)
+        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+        return _AtomicFile(abs_path)
+
+    def get_bytes(self, key: str) -> bytes:
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def head(self, key: str) -> Optional[int]:
+        try:
+            return os.stat(self.path(key)).st_size
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def public_url(self, key: str) -> str:
+        return f"/uploads/{key}"  # served by app/api/v1/uploads.py
+
+
+class _S3MultipartWriter:
+    """
+    Buffers writes into parts of `part_size` bytes and uploads each as it fills, so memory
+    stays bounded by one part. The multipart upload is only started once a first part is
+    full; a smaller object is sent with a single PUT on close. S3 shows the object only
+    when the upload completes, and `discard()` aborts it so no parts are left billed.
+    """
+
+    def __init__(self, client, bucket: str, key: str, part_size: int):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.closed = False
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Dict] = []
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            try:
+                self._upload_part(bytes(self._buffer[:self.part_size]))
+            except BaseException:
+                self.discard()
+                raise
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def _upload_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            self._upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)["UploadId"]
+        number = len(self._parts) + 1
+        result = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, PartNumber=number, Body=data,
+        )
+        self._parts.append({"PartNumber": number, "ETag": result["ETag"]})
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))  # the last part may be smaller than 5MB
+                self.client.complete_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                    MultipartUpload={"Parts": self._parts},
+                )
+        except BaseException:
+            self.discard()
+            raise
+        self.closed = True
+        self._buffer = bytearray()
+
+    def discard(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._buffer = bytearray()
+        if self._upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+
+    def __enter__(self) -> "_S3MultipartWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class S3Storage(StorageBackend):
+    """
+    AWS S3 (or any S3-compatible endpoint). One boto3 client per process, created on
+    first use and shared by every thread, so connections and TLS sessions are pooled.
+    """
+
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+        self._client = None
+        self._transfer_config = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3  # type: ignore
+                    from boto3.s3.transfer import TransferConfig  # type: ignore
+                    from botocore.config import Config  # type: ignore
+
+                    # Clients are thread-safe; sessions are not, so build it from a private one
+                    self._client = boto3.session.Session().client(
+                        "s3",
+                        region_name=settings.S3_REGION,
+                        endpoint_url=settings.S3_ENDPOINT_URL,
+                        aws_access_key_id=settings.S3_ACCESS_KEY,
+                        aws_secret_access_key=settings.S3_SECRET_KEY,
+                        config=Config(
+                            signature_version="s3v4",
+                            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                            retries={"max_attempts": settings.S3_MAX_ATTEMPTS, "mode": settings.S3_RETRY_MODE},
+                        ),
+                    )
+                    self._transfer_config = TransferConfig(
+                        multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+                        multipart_chunksize=settings.S3_MULTIPART_CHUNKSIZE,
+                        max_concurrency=settings.S3_MAX_CONCURRENCY,
+                    )
+        return self._client
+
+    def put_stream(self, key: str, fileobj: BinaryIO, content_type: Optional[str] = None) -> None:
+        client = self.client
+        extra = {"ContentType": content_type} if content_type else None
+        client.upload_fileobj(fileobj, self.bucket, key, ExtraArgs=extra, Config=self._transfer_config)
+
+    def put_bytes(self, key: str, data: bytes, content_type: str) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type)
+
+    def open_write(self, key: str) -> BinaryIO:
+        # S3 rejects parts (other than the last) below 5MB
+        return _S3MultipartWriter(self.client, self.bucket, key, max(settings.S3_MULTIPART_CHUNKSIZE, 5 * 1024 * 1024))
+
+    def get_bytes(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def head(self, key: str) -> Optional[int]:
+        from botocore.exceptions import ClientError  # type: ignore
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def public_url(self, key: str) -> str:
+        if settings.S3_PUBLIC_BASE_URL:
+            base = settings.S3_PUBLIC_BASE_URL.rstrip("/")
+            return f"{base}/{key}"
+        return f"https://{self.bucket}.s3.{settings.S3_REGION}.amazonaws.com/{key}"
+
+    def presigned_put(self, key: str, content_type: str, expires: int, content_length: Optional[int] = None) -> Optional[str]:
+        params = {"Bucket": self.bucket, "Key": key, "ContentType": content_type}
+        if content_length is not None:
+            params["ContentLength"] = content_length  # S3 rejects a body of any other size
+        return self.client.generate_presigned_url("put_object", Params=params, ExpiresIn=expires)
+
+
+class _MemoryWriter(io.BytesIO):
+    def __init__(self, storage: "MemoryStorage", key: str):
+        super().__init__()
+        self.storage = storage
+        self.key = key
+
+    def close(self) -> None:
+        if not self.closed:
+            self.storage.put_bytes(self.key, self.getvalue(), "application/octet-stream")
+        super().close()
+
+    def discard(self) -> None:
+        super().close()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class MemoryStorage(StorageBackend):
+    """Process-local dict of objects, for tests and benchmarks without a filesystem or S3."""
+
+    def __init__(self):
+        self.objects: Dict[str, Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    def put_stream(self, key: str, fileobj: BinaryIO, content_type: Optional[str] = None) -> None:
+        buf = io.BytesIO()
+        shutil.copyfileobj(fileobj, buf, settings.UPLOAD_CHUNK_SIZE)
+        self.put_bytes(key, buf.getvalue(), content_type or "application/octet-stream")
+
+    def put_bytes(self, key: str, data: bytes, content_type: str) -> None:
+        with self._lock:
+            self.objects[key] = (data, content_type)
+
+    def open_write(self, key: str) -> BinaryIO:
+        return _MemoryWriter(self, key)
+
+    def get_bytes(self, key: str) -> bytes:
+        with self._lock:
+            if key not in self.objects:
+                raise FileNotFoundError(key)
+            return self.objects[key][0]
+
+    def head(self, key: str) -> Optional[int]:
+        with self._lock:
+            obj = self.objects.get(key)
+        return len(obj[0]) if obj else None
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self.objects.pop(key, None)
+
+    def public_url(self, key: str) -> str:
+        return f"/uploads/{key}"  # served by app/api/v1/uploads.py
+
+
+def create_storage() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "S3":
+        return S3Storage(settings.S3_BUCKET)
+    if settings.STORAGE_BACKEND == "MEMORY":
+        return MemoryStorage()
+    return LocalStorage(settings.UPLOAD_DIR or "./uploads", settings.UPLOAD_CHUNK_SIZE)
+
+
+storage = create_storage()
@@ -0,0 +1,36 @@
+"""
+Background job worker: `python -m app.worker`. Run as many as needed; they share the
+jobs table safely. SIGINT/SIGTERM finish the jobs in hand and exit.
+"""
+import asyncio
+import logging
+import signal
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services import favorites  # noqa: F401  (registers its job handlers)
+from app.services.jobs import JobWorker
+from app.utils.emailer import email_pool
+
+
+async def main() -> None:
+    worker = JobWorker(
+        AsyncSessionLocal,
+        concurrency=settings.JOB_WORKER_CONCURRENCY,
+        poll_interval=settings.JOB_POLL_INTERVAL_SECONDS,
+        lock_timeout=settings.JOB_LOCK_TIMEOUT_SECONDS,
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        email_pool.close()
+        logging.getLogger("jobs").info("SMTP pool: %s", email_pool.stats())
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+Authenticated request throughput with and without the principal cache (app.core.principal).
+
+`uncached` loads the user from the database on every request, as get_current_user did
+before the cache; `cached` serves repeat requests from the per-process cache. Requests go
+to GET /api/v1/auth/me, whose only work is authentication, through the app in-process
+(httpx ASGI transport), so the numbers isolate the auth cost from the network:
+
+    python -m scripts.auth_benchmark --requests 5000 --users 50 --concurrency 20
+
+Seeds the users (committed, so the app's own sessions see them) and deletes them at the
+end. Needs a migrated database at DATABASE_URL.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+from sqlalchemy import text
+
+from app.core.principal import principal_cache
+from app.core.security import create_access_token
+from app.db.session import async_engine, engine
+from app.main import app
+
+EMAIL_PATTERN = "authbench-%@bench.invalid"
+
+
+def seed(users: int) -> list:
+    with engine.begin() as conn:
+        return conn.execute(text(
+            """
+            INSERT INTO users (email, hashed_password, is_active, is_admin, is_verified)
+            SELECT 'authbench-' || g || '@bench.invalid', 'x', true, false, true
+            FROM generate_series(1, :users) g
+            RETURNING id
+            """
+        ), {"users": users}).scalars().all()
+
+
+def cleanup() -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM users WHERE email LIKE :p"), {"p": EMAIL_PATTERN})
+
+
+async def run(label: str, tokens: list, requests: int, concurrency: int) -> None:
+    principal_cache.clear()
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one() -> None:
+            async with semaphore:
+                response = await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {random.choice(tokens)}"})
+                response.raise_for_status()
+
+        await one()  # warm up the connection pool
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+    print(f"{label:<10} {requests} requests in {elapsed:.2f}s  ->  {requests / elapsed:.0f} req/s")
+
+
+async def compare(tokens: list, requests: int, concurrency: int) -> None:
+    ttl = principal_cache.ttl_seconds
+    try:
+        principal_cache.ttl_seconds = 0  # set() is a no-op, so every request loads the user
+        await run("uncached", tokens, requests, concurrency)
+        principal_cache.ttl_seconds = max(ttl, 60)
+        await run("cached", tokens, requests, concurrency)
+    finally:
+        principal_cache.ttl_seconds = ttl
+        await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=50, help="distinct users the requests are spread over")
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    cleanup()  # leftovers of an interrupted run
+    tokens = [create_access_token(str(user_id)) for user_id in seed(args.users)]
+    try:
+        asyncio.run(compare(tokens, args.requests, args.concurrency))
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
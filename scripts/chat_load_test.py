@@ -0,0 +1,133 @@
+"""
+Chat load test: many concurrent rooms against a running server, measuring the time from
+a message being sent to its broadcast arriving at the peer, plus per-second throughput.
+
+Seeds two users and one listing per room (committed, so the server sees them, and
+removed again at the end with their messages, inbox rows and notifications). Run the
+server the way production does, e.g. several workers sharing a broker:
+
+    BROKER_BACKEND=POSTGRES uvicorn app.main:app --workers 4 --port 8000
+    python -m scripts.chat_load_test --url ws://localhost:8000 --rooms 500 --messages 20
+
+Compare CHAT_WRITE_BEHIND on and off, or DB_POOL_* settings, by restarting the server
+between runs. Needs the same DATABASE_URL and JWT_SECRET as the server.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List, Tuple
+
+import websockets
+from sqlalchemy import text
+
+from app.core.security import create_access_token
+from app.db.session import engine
+
+EMAIL_PATTERN = "chatload-%@bench.invalid"
+
+
+def seed(rooms: int) -> List[Tuple[int, int, int]]:
+    """Create the users and listings; returns (listing_id, owner_id, buyer_id) per room."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            """
+            INSERT INTO users (email, hashed_password, is_active, is_admin, is_verified)
+            SELECT 'chatload-' || g || '@bench.invalid', 'x', true, false, true
+            FROM generate_series(1, :users) g
+            """
+        ), {"users": rooms * 2})
+        ids = conn.execute(text("SELECT id FROM users WHERE email LIKE :p ORDER BY id"), {"p": EMAIL_PATTERN}).scalars().all()
+        pairs = list(zip(ids[0::2], ids[1::2]))
+        listing_ids = conn.execute(text(
+            """
+            INSERT INTO listings (title, description, category, price, status, owner_id)
+            SELECT 'Load test', 'Load test listing', 'Other', 1, 'ACTIVE', owner
+            FROM unnest(CAST(:owners AS int[])) AS owner
+            RETURNING id
+            """
+        ), {"owners": [owner for owner, _ in pairs]}).scalars().all()
+    return [(listing_id, owner, buyer) for listing_id, (owner, buyer) in zip(listing_ids, pairs)]
+
+
+def cleanup() -> None:
+    with engine.begin() as conn:
+        users = "SELECT id FROM users WHERE email LIKE :p"
+        conn.execute(text(f"DELETE FROM notifications WHERE user_id IN ({users})"), {"p": EMAIL_PATTERN})
+        conn.execute(text(f"DELETE FROM conversations WHERE user_id IN ({users})"), {"p": EMAIL_PATTERN})
+        conn.execute(text(f"DELETE FROM chat_messages WHERE sender_id IN ({users})"), {"p": EMAIL_PATTERN})
+        conn.execute(text(f"DELETE FROM listings WHERE owner_id IN ({users})"), {"p": EMAIL_PATTERN})
+        conn.execute(text("DELETE FROM users WHERE email LIKE :p"), {"p": EMAIL_PATTERN})
+
+
+async def run_room(url: str, room: Tuple[int, int, int], messages: int, interval: float, latencies: List[float], errors: List[str]) -> None:
+    listing_id, owner, buyer = room
+
+    def connect(user_id: int, peer_id: int):
+        headers = {"Authorization": f"Bearer {create_access_token(str(user_id))}"}
+        return websockets.connect(f"{url}/api/v1/ws/chat/{listing_id}/{peer_id}", additional_headers=headers)
+
+    async with connect(owner, buyer) as sender, connect(buyer, owner) as receiver:
+        async def receive() -> None:
+            received = 0
+            while received < messages:
+                frame = json.loads(await asyncio.wait_for(receiver.recv(), timeout=30))
+                if "error" in frame:
+                    errors.append(frame["error"])
+                    received += 1
+                elif frame.get("sender_id") == owner and frame.get("content", "").startswith("t="):
+                    latencies.append(time.time() - float(frame["content"][2:]))
+                    received += 1
+
+        reader = asyncio.create_task(receive())
+        for _ in range(messages):
+            await sender.send(json.dumps({"content": f"t={time.time():.6f}"}))
+            await asyncio.sleep(interval)
+        try:
+            await reader
+        except asyncio.TimeoutError:
+            errors.append("timed out waiting for broadcasts")
+
+
+async def load(args, rooms: List[Tuple[int, int, int]]) -> None:
+    latencies: List[float] = []
+    errors: List[str] = []
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(run_room(args.url, room, args.messages, args.interval, latencies, errors) for room in rooms),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - started
+    failed = [r for r in results if isinstance(r, BaseException)]
+
+    print(f"{len(rooms)} rooms x {args.messages} messages in {elapsed:.1f}s: {len(latencies) / elapsed:.0f} delivered/s")
+    if latencies:
+        latencies.sort()
+        ms = [x * 1000 for x in latencies]
+        print(
+            f"send -> peer latency: mean {statistics.mean(ms):.1f} ms, p50 {ms[len(ms) // 2]:.1f} ms, "
+            f"p95 {ms[int(len(ms) * 0.95) - 1]:.1f} ms, p99 {ms[int(len(ms) * 0.99) - 1]:.1f} ms"
+        )
+    if errors or failed:
+        print(f"{len(errors)} error frames, {len(failed)} rooms failed; first: {(errors + [repr(e) for e in failed])[0]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:8000", help="server base URL")
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=20, help="messages sent per room")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between a room's messages")
+    args = parser.parse_args()
+
+    cleanup()  # leftovers of an interrupted run
+    rooms = seed(args.rooms)
+    try:
+        asyncio.run(load(args, rooms))
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
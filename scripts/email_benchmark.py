@@ -0,0 +1,65 @@
+"""
+SMTP throughput: one connection per message (connect, STARTTLS, login, send, quit)
+versus the pooled sessions in app.utils.emailer.
+
+Point it at a local server, e.g. `python -m aiosmtpd -n -l localhost:8025`, then:
+
+    python -m scripts.email_benchmark --host localhost --port 8025 --count 500 --no-starttls
+
+Credentials default to MAIL_USERNAME/MAIL_PASSWORD; pass --no-login for servers without auth.
+"""
+import argparse
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.utils.emailer import SMTPPool, build_message
+
+
+def send_unpooled(args, message: str) -> None:
+    with smtplib.SMTP(args.host, args.port, timeout=30) as s:
+        if args.starttls:
+            s.starttls()
+        if args.login:
+            s.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
+        s.sendmail(settings.MAIL_FROM, [args.to], message)
+
+
+def run(label: str, send, count: int, threads: int) -> None:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: send(), range(count)))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10} {count} messages in {elapsed:.2f}s  ->  {count / elapsed:.1f} msg/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=settings.MAIL_SERVER)
+    parser.add_argument("--port", type=int, default=settings.MAIL_PORT)
+    parser.add_argument("--to", default="benchmark@example.com")
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=settings.MAIL_POOL_SIZE)
+    parser.add_argument("--no-starttls", dest="starttls", action="store_false")
+    parser.add_argument("--no-login", dest="login", action="store_false")
+    args = parser.parse_args()
+
+    message = build_message(args.to, "Benchmark", "x" * 512)
+    run("unpooled", lambda: send_unpooled(args, message), args.count, args.threads)
+
+    pool = SMTPPool(
+        args.host, args.port,
+        username=settings.MAIL_USERNAME if args.login else None,
+        password=settings.MAIL_PASSWORD if args.login else None,
+        starttls=args.starttls,
+        size=args.threads,
+        max_messages=settings.MAIL_POOL_MAX_MESSAGES,
+    )
+    run("pooled", lambda: pool.send(settings.MAIL_FROM, [args.to], message), args.count, args.threads)
+    pool.close()
+    print(pool.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Index advisor: EXPLAIN the representative hot query of each router and fail
+if any of them can only be answered by a sequential scan of a hot table.
+
+Usage (from the repo root, with DATABASE_URL pointing at a migrated database):
+
+    python -m scripts.index_advisor            # exit code 1 on regression
+    python -m scripts.index_advisor --verbose  # also print every plan
+
+Sequential scans are disabled for the session while explaining, so the planner
+picks an index whenever one is usable. A Seq Scan that survives means no index
+matches the query shape, regardless of how small the local tables are.
+"""
+import argparse
+import json
+import sys
+
+from sqlalchemy import func, literal_column, or_, select, text
+
+from app.db.session import engine
+from app.models.chat import BlockedUser, ChatMessage
+from app.models.conversation import Conversation
+from app.models.favorite import Favorite
+from app.models.job import Job
+from app.models.listing import Listing
+from app.models.notification import Notification
+from app.models.saved_search import SavedSearch
+
+HOT_TABLES = {"listings", "notifications", "chat_messages", "conversations", "favorites", "blocked_users", "jobs", "saved_searches"}
+
+# Representative shapes taken from the routers in app/api/v1
+HOT_QUERIES = {
+    "search: latest listings": (
+        select(Listing.id).order_by(Listing.created_at.desc(), Listing.id.desc()).limit(10)
+    ),
+    "search: category, latest first": (
+        select(Listing.id).where(Listing.category == "Books")
+        .order_by(Listing.created_at.desc(), Listing.id.desc()).limit(10)
+    ),
+    "search: active in category, latest first": (
+        select(Listing.id).where(Listing.status == "ACTIVE", Listing.category == "Books")
+        .order_by(Listing.created_at.desc(), Listing.id.desc()).limit(10)
+    ),
+    "search: category with price range": (
+        select(Listing.id).where(Listing.category == "Books", Listing.price.between(100, 1000))
+        .order_by(Listing.price.asc(), Listing.id.asc()).limit(10)
+    ),
+    "search: most popular": (
+        select(Listing.id).order_by(Listing.favorite_count.desc(), Listing.id.desc()).limit(10)
+    ),
+    "search: category, most popular": (
+        select(Listing.id).where(Listing.category == "Books")
+        .order_by(Listing.favorite_count.desc(), Listing.id.desc()).limit(10)
+    ),
+    "search: full text": (
+        select(Listing.id).where(Listing.search_vector.op("@@")(func.plainto_tsquery("english", "book"))).limit(10)
+    ),
+    "notifications: latest for user": (
+        select(Notification.id).where(Notification.user_id == 1).order_by(Notification.id.desc()).limit(50)
+    ),
+    "notifications: unread count": (
+        select(func.count()).select_from(Notification).where(Notification.user_id == 1, Notification.is_read.is_(False))
+    ),
+    "chat: conversation history page": (
+        select(ChatMessage.id).where(
+            ChatMessage.listing_id == 1,
+            ChatMessage.deleted == False,  # noqa: E712
+            or_(
+                (ChatMessage.sender_id == 1) & (ChatMessage.receiver_id == 2),
+                (ChatMessage.sender_id == 2) & (ChatMessage.receiver_id == 1),
+            ),
+        ).order_by(ChatMessage.id.desc()).limit(50)
+    ),
+    "chat: inbox page": (
+        select(Conversation.id).where(Conversation.user_id == 1)
+        .order_by(Conversation.last_message_at.desc(), Conversation.id.desc()).limit(20)
+    ),
+    "chat: block graph for user": (
+        select(BlockedUser.user_id, BlockedUser.blocked_by)
+        .where(or_(BlockedUser.user_id == 1, BlockedUser.blocked_by == 1))
+    ),
+    "favorites: membership": (
+        select(Favorite.id).where(Favorite.user_id == 1, Favorite.listing_id == 1)
+    ),
+    "favorites: contains for results page": (
+        select(Favorite.listing_id).where(Favorite.user_id == 1, Favorite.listing_id.in_(list(range(1, 21))))
+    ),
+    "saved_searches: candidates for new listing": (
+        select(SavedSearch.id).where(
+            or_(SavedSearch.category == "Books", SavedSearch.category.is_(None)),
+            SavedSearch.price_range.contains(literal_column("250.00::numeric")),
+        )
+    ),
+    "jobs: claim runnable": (
+        select(Job.id).where(Job.status == "queued", Job.run_at <= func.now())
+        .order_by(Job.run_at, Job.id).limit(4).with_for_update(skip_locked=True)
+    ),
+}
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Return the hot relations that are read with a Seq Scan anywhere in the plan tree."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in HOT_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="print the full plan of every query")
+    args = parser.parse_args()
+
+    failures = 0
+    with engine.connect() as conn:
+        conn.execute(text("SET enable_seqscan = off"))
+        for name, stmt in HOT_QUERIES.items():
+            sql = stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+            plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+            plan = plan if isinstance(plan, list) else json.loads(plan)
+            scans = seq_scans(plan[0]["Plan"])
+            if scans:
+                failures += 1
+                print(f"FAIL  {name}: sequential scan on {', '.join(sorted(set(scans)))}")
+            else:
+                print(f"ok    {name}")
+            if args.verbose or scans:
+                print(json.dumps(plan[0]["Plan"], indent=2))
+
+    print(f"\n{len(HOT_QUERIES) - failures}/{len(HOT_QUERIES)} hot queries use an index")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
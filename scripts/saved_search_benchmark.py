@@ -0,0 +1,128 @@
+"""
+Cost of matching one new listing against the saved searches, as done after every
+create_listing (app.services.saved_searches.match_statement).
+
+Seeds synthetic users, saved searches and listings inside a transaction that is rolled
+back at the end, so it can run against any migrated database (DATABASE_URL):
+
+    python -m scripts.saved_search_benchmark --searches 100000 --listings 200
+    python -m scripts.saved_search_benchmark --explain   # also print one plan
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app.db.session import engine
+from app.services.saved_searches import match_statement
+
+CATEGORIES = [
+    "Books", "Electronics", "Furniture", "Clothing", "Bikes", "Sports", "Music", "Kitchen",
+    "Stationery", "Tickets", "Games", "Phones", "Laptops", "Decor", "Shoes", "Bags",
+    "Tools", "Cameras", "Appliances", "Other",
+]
+WORDS = [
+    "calculus", "textbook", "desk", "lamp", "iphone", "macbook", "guitar", "bicycle", "jacket",
+    "chair", "monitor", "headphones", "kettle", "novel", "camera", "backpack", "sneakers", "printer",
+]
+UNIVERSITIES = ["uni-a", "uni-b", "uni-c", "uni-d"]
+
+
+def seed(conn, searches: int) -> int:
+    users = max(searches // 20, 1)
+    conn.execute(text(
+        """
+        INSERT INTO users (email, hashed_password, is_active, is_admin, is_verified, university)
+        SELECT 'bench-' || g || '@bench.invalid', 'x', true, false, true, (:unis)[1 + g % cardinality(:unis)]
+        FROM generate_series(1, :users) g
+        """
+    ), {"users": users, "unis": UNIVERSITIES})
+    first_user = conn.execute(text("SELECT min(id) FROM users WHERE email LIKE 'bench-%@bench.invalid'")).scalar()
+
+    # Roughly: 30% without a category, 40% with keywords, 20% limited to a university,
+    # and price ranges from open-ended to narrow
+    conn.execute(text(
+        """
+        INSERT INTO saved_searches (user_id, q, query, category, university, price_range)
+        SELECT
+            :first_user + g % :users,
+            kw,
+            CASE WHEN kw IS NULL THEN NULL ELSE plainto_tsquery('english', kw) END,
+            CASE WHEN random() < 0.3 THEN NULL ELSE (:cats)[1 + floor(random() * cardinality(:cats))::int] END,
+            CASE WHEN random() < 0.2 THEN (:unis)[1 + floor(random() * cardinality(:unis))::int] END,
+            CASE
+                WHEN random() < 0.3 THEN numrange(NULL, NULL)
+                ELSE numrange(lo, lo + (random() * 500)::numeric(10, 2), '[]')
+            END
+        FROM (
+            SELECT g,
+                   CASE WHEN random() < 0.4 THEN (:words)[1 + floor(random() * cardinality(:words))::int] END AS kw,
+                   (random() * 1000)::numeric(10, 2) AS lo
+            FROM generate_series(1, :searches) g
+        ) s
+        """
+    ), {"first_user": first_user, "users": users, "searches": searches, "cats": CATEGORIES, "words": WORDS, "unis": UNIVERSITIES})
+    conn.execute(text("ANALYZE saved_searches"))
+    return first_user
+
+
+def insert_listing(conn, owner_id: int) -> int:
+    words = random.sample(WORDS, 3)
+    return conn.execute(text(
+        """
+        INSERT INTO listings (title, description, category, price, status, owner_id)
+        VALUES (:title, :description, :category, :price, 'ACTIVE', :owner_id)
+        RETURNING id
+        """
+    ), {
+        "title": " ".join(words[:2]),
+        "description": " ".join(words),
+        "category": random.choice(CATEGORIES),
+        "price": round(random.uniform(0, 1500), 2),
+        "owner_id": owner_id,
+    }).scalar()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--searches", type=int, default=100_000)
+    parser.add_argument("--listings", type=int, default=200, help="new listings to match")
+    parser.add_argument("--explain", action="store_true", help="print EXPLAIN ANALYZE of one match")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            started = time.perf_counter()
+            owner_id = seed(conn, args.searches)
+            print(f"seeded {args.searches} saved searches in {time.perf_counter() - started:.1f}s")
+
+            timings, matched = [], []
+            for _ in range(args.listings):
+                listing_id = insert_listing(conn, owner_id)
+                university = random.choice(UNIVERSITIES)
+                t = time.perf_counter()
+                rows = conn.execute(match_statement(listing_id, university)).all()
+                timings.append((time.perf_counter() - t) * 1000)
+                matched.append(len(rows))
+
+            timings.sort()
+            print(
+                f"match per insert over {args.listings} listings: "
+                f"mean {statistics.mean(timings):.2f} ms, p50 {timings[len(timings) // 2]:.2f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms; "
+                f"{statistics.mean(matched):.0f} matching searches on average"
+            )
+
+            if args.explain:
+                sql = match_statement(listing_id, university).compile(engine, compile_kwargs={"literal_binds": True})
+                for line in conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).scalars():
+                    print(line)
+        finally:
+            trans.rollback()
+
+
+if __name__ == "__main__":
+    main()
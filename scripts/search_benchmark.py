@@ -0,0 +1,126 @@
+"""
+Full-text search latency with and without the maintained search_vector column.
+
+`indexed` is what /listings/search runs: `search_vector @@ plainto_tsquery(q)`, served by
+the ix_listings_search_vector GIN index. `before` computes the same weighted tsvector on
+the fly for every row, which is what searching cost before the column was maintained.
+Each search runs the page query (relevance order, LIMIT page size) and the exact count,
+as the endpoint does by default.
+
+Seeds synthetic listings inside a transaction that is rolled back at the end, so it can
+run against any migrated database (DATABASE_URL). With several sizes the table is grown
+between rounds:
+
+    python -m scripts.search_benchmark --listings 100000 1000000
+    python -m scripts.search_benchmark --listings 100000 --explain   # also print both plans
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app.db.session import engine
+
+CATEGORIES = ["Books", "Electronics", "Furniture", "Clothing", "Bikes", "Sports", "Music", "Kitchen", "Phones", "Other"]
+WORDS = [
+    "calculus", "textbook", "desk", "lamp", "iphone", "macbook", "guitar", "bicycle", "jacket",
+    "chair", "monitor", "headphones", "kettle", "novel", "camera", "backpack", "sneakers", "printer",
+    "used", "new", "cheap", "barely", "pickup", "campus", "condition", "great", "selling", "moving",
+    "semester", "edition", "charger", "case", "wooden", "black", "white", "small", "large", "vintage",
+]
+
+# Same expression as the listings_search_vector_trigger (alembic migration 1fffde72dba6)
+ON_THE_FLY_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+VECTORS = {"indexed": "search_vector", "before": f"({ON_THE_FLY_VECTOR})"}
+
+
+def seed(conn, owner_id: int, count: int) -> None:
+    conn.execute(text(
+        """
+        INSERT INTO listings (title, description, category, price, status, owner_id)
+        SELECT
+            (:words)[1 + floor(random() * cardinality(:words))::int] || ' ' || (:words)[1 + floor(random() * cardinality(:words))::int],
+            (SELECT string_agg((:words)[1 + floor(random() * cardinality(:words))::int], ' ') FROM generate_series(1, 12 + g % 2)),
+            (:cats)[1 + floor(random() * cardinality(:cats))::int],
+            (random() * 1000)::numeric(10, 2),
+            'ACTIVE',
+            :owner_id
+        FROM generate_series(1, :count) g
+        """
+    ), {"count": count, "owner_id": owner_id, "words": WORDS, "cats": CATEGORIES})
+    conn.execute(text("ANALYZE listings"))
+
+
+def statements(vector: str, page_size: int):
+    where = f"{vector} @@ plainto_tsquery('english', :q)"
+    page = text(
+        f"SELECT id FROM listings WHERE {where} "
+        f"ORDER BY ts_rank({vector}, plainto_tsquery('english', :q)) DESC, id DESC LIMIT {page_size}"
+    )
+    count = text(f"SELECT count(*) FROM listings WHERE {where}")
+    return page, count
+
+
+def run(conn, mode: str, terms, page_size: int) -> list:
+    page, count = statements(VECTORS[mode], page_size)
+    timings = []
+    for q in terms:
+        t = time.perf_counter()
+        conn.execute(page, {"q": q}).all()
+        conn.execute(count, {"q": q}).scalar()
+        timings.append((time.perf_counter() - t) * 1000)
+    return sorted(timings)
+
+
+def report(size: int, mode: str, timings: list) -> None:
+    print(
+        f"{size:>9} listings  {mode:<8} mean {statistics.mean(timings):8.2f} ms, "
+        f"p50 {timings[len(timings) // 2]:8.2f} ms, p95 {timings[int(len(timings) * 0.95) - 1]:8.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, nargs="+", default=[100_000, 1_000_000], help="table sizes to measure at")
+    parser.add_argument("--searches", type=int, default=200, help="searches per mode and size")
+    parser.add_argument("--before-searches", type=int, default=20, help="searches for the unindexed mode, which is slow")
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--explain", action="store_true", help="print EXPLAIN ANALYZE of one search per mode")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            owner_id = conn.execute(text(
+                "INSERT INTO users (email, hashed_password, is_active, is_admin, is_verified) "
+                "VALUES ('search-bench@bench.invalid', 'x', true, false, true) RETURNING id"
+            )).scalar()
+            seeded = 0
+            for size in sorted(args.listings):
+                started = time.perf_counter()
+                seed(conn, owner_id, size - seeded)
+                seeded = size
+                print(f"seeded {size} listings in {time.perf_counter() - started:.1f}s")
+
+                terms = [" ".join(random.sample(WORDS, random.choice([1, 2]))) for _ in range(args.searches)]
+                report(size, "indexed", run(conn, "indexed", terms, args.page_size))
+                report(size, "before", run(conn, "before", terms[:args.before_searches], args.page_size))
+
+            if args.explain:
+                for mode in VECTORS:
+                    page, _ = statements(VECTORS[mode], args.page_size)
+                    print(f"-- {mode}")
+                    for line in conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {page.text}"), {"q": terms[0]}).scalars():
+                        print(line)
+        finally:
+            trans.rollback()
+
+
+if __name__ == "__main__":
+    main()
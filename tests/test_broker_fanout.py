@@ -0,0 +1,104 @@
+"""
+Chat fan-out across workers on a real broker: two broker instances, each with its own
+connections and its own ChatHub, exactly as two worker processes run them. Set
+TEST_BROKER_DATABASE_URL (postgresql://...) and/or TEST_REDIS_URL to run these.
+"""
+import asyncio
+import json
+import os
+
+import pytest
+import pytest_asyncio
+from starlette.websockets import WebSocketState
+
+from app.api.v1.chat import fits_broadcast
+from app.core.config import settings
+from app.services.broker import PostgresBroker, RedisBroker
+from app.services.chat_hub import ChatHub
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.application_state = WebSocketState.CONNECTED
+        self.sent = []
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(json.loads(text))
+
+    async def close(self, code: int = 1000) -> None:
+        self.application_state = WebSocketState.DISCONNECTED
+
+
+def _make_broker(backend: str):
+    if backend == "postgres":
+        dsn = os.environ.get("TEST_BROKER_DATABASE_URL")
+        if not dsn:
+            pytest.skip("TEST_BROKER_DATABASE_URL not set")
+        return PostgresBroker(dsn)
+    url = os.environ.get("TEST_REDIS_URL")
+    if not url:
+        pytest.skip("TEST_REDIS_URL not set")
+    pytest.importorskip("redis")
+    return RedisBroker(url)
+
+
+async def _wait_for(predicate, timeout: float = 5.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("timed out waiting for delivery")
+        await asyncio.sleep(0.02)
+
+
+@pytest_asyncio.fixture(params=["postgres", "redis"])
+async def workers(request):
+    brokers = [_make_broker(request.param), _make_broker(request.param)]
+    hubs = [ChatHub(b) for b in brokers]
+    for b, hub in zip(brokers, hubs):
+        await b.start()
+        await hub.start()
+    yield hubs
+    for b in brokers:
+        await b.stop()
+
+
+def _largest_message() -> dict:
+    content = "x" * (settings.CHAT_MAX_MESSAGE_BYTES - 2)  # exactly at the limit once JSON-encoded
+    assert fits_broadcast(content) and not fits_broadcast(content + "x")
+    return {
+        "id": 2**31 - 1, "listing_id": 2**31 - 1, "sender_id": 2**31 - 1, "receiver_id": 2**31 - 1,
+        "content": content + " (edited)", "timestamp": "2025-01-01T00:00:00.000000+00:00",
+        "edited": True, "deleted": False,
+    }
+
+
+def test_largest_accepted_message_fits_notify_payload():
+    event = {"room": "2147483647-2147483647-2147483647", "skip": "f" * 32, "data": {"edit_message": _largest_message()}}
+    assert len(json.dumps(event, separators=(",", ":"))) <= PostgresBroker.MAX_PAYLOAD_BYTES
+
+
+@pytest.mark.asyncio
+async def test_broadcast_crosses_to_the_other_worker(workers):
+    a, b = workers
+    local, remote = FakeWebSocket(), FakeWebSocket()
+    a.join("1-2-3", local)
+    b.join("1-2-3", remote)
+
+    await a.broadcast("1-2-3", {"content": "hi"})
+    await _wait_for(lambda: local.sent and remote.sent)
+
+    assert local.sent == [{"content": "hi"}]
+    assert remote.sent == [{"content": "hi"}]
+
+
+@pytest.mark.asyncio
+async def test_largest_message_crosses_to_the_other_worker(workers):
+    a, b = workers
+    remote = FakeWebSocket()
+    b.join("1-2-3", remote)
+    message = _largest_message()
+
+    await a.broadcast("1-2-3", message)
+    await _wait_for(lambda: remote.sent)
+
+    assert remote.sent == [message]
@@ -0,0 +1,88 @@
+"""Chat broadcasts fan out through the broker to every worker's sockets in the room."""
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+from starlette.websockets import WebSocketState
+
+from app.services.broker import InMemoryBroker
+from app.services.chat_hub import ChatHub
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.application_state = WebSocketState.CONNECTED
+        self.sent = []
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(json.loads(text))
+
+    async def close(self, code: int = 1000) -> None:
+        self.application_state = WebSocketState.DISCONNECTED
+
+
+async def _drain():
+    # Let every connection's writer task send what it has queued
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest_asyncio.fixture
+async def workers():
+    # Two hubs sharing one broker stand in for two worker processes behind Postgres/Redis
+    broker = InMemoryBroker()
+    hubs = [ChatHub(broker), ChatHub(broker)]
+    for hub in hubs:
+        await hub.start()
+    yield hubs
+    for hub in hubs:
+        for rid, room in list(hub.rooms.items()):
+            for conn in list(room.values()):
+                hub.leave(rid, conn)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_sockets_on_every_worker(workers):
+    a, b = workers
+    ws_a, ws_b = FakeWebSocket(), FakeWebSocket()
+    a.join("1-2-3", ws_a)
+    b.join("1-2-3", ws_b)
+
+    await a.broadcast("1-2-3", {"content": "hi"})
+    await _drain()
+
+    assert ws_a.sent == [{"content": "hi"}]
+    assert ws_b.sent == [{"content": "hi"}]
+
+
+@pytest.mark.asyncio
+async def test_broadcast_skips_sender_and_other_rooms(workers):
+    a, b = workers
+    sender, peer, elsewhere = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    conn = a.join("1-2-3", sender)
+    b.join("1-2-3", peer)
+    b.join("9-2-3", elsewhere)
+
+    await a.broadcast("1-2-3", {"typing": True, "user": 2}, skip=conn.id)
+    await _drain()
+
+    assert sender.sent == []
+    assert peer.sent == [{"typing": True, "user": 2}]
+    assert elsewhere.sent == []
+
+
+@pytest.mark.asyncio
+async def test_left_socket_no_longer_receives(workers):
+    a, b = workers
+    ws_a, ws_b = FakeWebSocket(), FakeWebSocket()
+    a.join("1-2-3", ws_a)
+    conn_b = b.join("1-2-3", ws_b)
+    b.leave("1-2-3", conn_b)
+
+    await a.broadcast("1-2-3", {"content": "bye"})
+    await _drain()
+
+    assert ws_a.sent == [{"content": "bye"}]
+    assert ws_b.sent == []
+    assert "1-2-3" not in b.rooms
@@ -0,0 +1,11 @@
+from app.core.config import Settings
+
+
+def test_async_uri_translates_libpq_parameters():
+    s = Settings(DATABASE_URL="postgres://u:p@db:5432/app?sslmode=require&connect_timeout=10&application_name=web")
+    assert s.SQLALCHEMY_ASYNC_DATABASE_URI == "postgresql+asyncpg://u:p@db:5432/app?ssl=require"
+
+
+def test_async_uri_without_parameters():
+    s = Settings(DATABASE_URL="postgresql+psycopg2://u:p@db/app")
+    assert s.SQLALCHEMY_ASYNC_DATABASE_URI == "postgresql+asyncpg://u:p@db/app"
@@ -0,0 +1,60 @@
+"""Ingest never publishes upload bytes: originals are always re-encoded into an allowed format."""
+import io
+
+import pytest
+from PIL import Image
+
+from app.utils import storage as storage_module
+from app.utils.images import process_image, sniff_image_type
+from app.utils.storage_backends import storage
+
+
+def _encode(img: Image.Image, fmt: str, **params) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, fmt, **params)
+    return buf.getvalue()
+
+
+def test_gif_is_converted_and_trailing_bytes_dropped():
+    data = _encode(Image.new("P", (8, 8)), "GIF") + b"<script>alert(1)</script>"
+    original = process_image(data)["original"]
+    assert original["content_type"] in ("image/png", "image/jpeg")
+    assert b"<script>" not in original["data"]
+
+
+def test_transparent_image_becomes_png():
+    data = _encode(Image.new("RGBA", (8, 8), (255, 0, 0, 0)), "TIFF")
+    original = process_image(data)["original"]
+    assert (original["content_type"], original["extension"]) == ("image/png", "png")
+
+
+def test_mpo_is_reencoded_as_jpeg_without_exif():
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"  # Make
+    data = _encode(Image.new("RGB", (8, 8)), "MPO", exif=exif)
+    original = process_image(data)["original"]
+    assert (original["content_type"], original["extension"]) == ("image/jpeg", "jpg")
+    assert b"PhoneMaker" not in original["data"]
+
+
+@pytest.mark.asyncio
+async def test_ingest_publishes_under_reencoded_extension(monkeypatch):
+    monkeypatch.setattr(storage_module, "image_pool", lambda: None)  # default executor; no process pool in tests
+    data = _encode(Image.new("P", (8, 8)), "GIF") + b"<script>alert(1)</script>"
+    storage.put_bytes("incoming/1/x.html", data, "text/html")
+
+    dest_key, manifest = await storage_module.ingest_image("incoming/1/x.html", "listings/1")
+
+    assert dest_key.startswith("listings/1/") and dest_key.endswith(".jpg")
+    body, content_type = storage.objects[dest_key]
+    assert content_type == "image/jpeg" and b"<script>" not in body
+    assert storage.head("incoming/1/x.html") is None
+    assert manifest["url"].endswith(dest_key)
+
+
+def test_sniff_accepts_only_upload_formats():
+    assert sniff_image_type(_encode(Image.new("RGB", (4, 4)), "JPEG")[:12]) == "image/jpeg"
+    assert sniff_image_type(_encode(Image.new("RGB", (4, 4)), "PNG")[:12]) == "image/png"
+    assert sniff_image_type(_encode(Image.new("RGB", (4, 4)), "WEBP")[:12]) == "image/webp"
+    assert sniff_image_type(_encode(Image.new("P", (4, 4)), "GIF")[:12]) is None
+    assert sniff_image_type(b"<html><script>") is None
@@ -0,0 +1,64 @@
+"""A job handler that outlives its lease fails the attempt instead of holding the worker."""
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from app.models.job import Job
+from app.services import jobs
+from app.services.jobs import JobWorker
+
+
+class RecordingSession:
+    def __init__(self, statements: list):
+        self.statements = statements
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+
+        class Result:
+            rowcount = 1
+        return Result()
+
+    async def commit(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_hung_handler_times_out_and_is_retried(monkeypatch):
+    async def hang(payload: dict) -> None:
+        await asyncio.sleep(60)
+
+    monkeypatch.setitem(jobs.HANDLERS, "test_hang", hang)
+    statements = []
+    worker = JobWorker(lambda: RecordingSession(statements), concurrency=1, poll_interval=1, lock_timeout=0.05)
+    job = Job(id=1, kind="test_hang", payload={}, attempts=1, max_attempts=3, locked_at=datetime.now(timezone.utc))
+
+    await asyncio.wait_for(worker.execute(job), timeout=5)
+
+    values = statements[0].compile().params
+    assert values["status"] == "queued"
+    assert values["last_error"] == "Handler timed out after 0.05s"
+
+
+@pytest.mark.asyncio
+async def test_timeout_raised_by_handler_keeps_its_traceback(monkeypatch):
+    async def fail(payload: dict) -> None:
+        raise asyncio.TimeoutError("smtp read")
+
+    monkeypatch.setitem(jobs.HANDLERS, "test_fail", fail)
+    statements = []
+    worker = JobWorker(lambda: RecordingSession(statements), concurrency=1, poll_interval=1, lock_timeout=60)
+    job = Job(id=1, kind="test_fail", payload={}, attempts=3, max_attempts=3, locked_at=datetime.now(timezone.utc))
+
+    await worker.execute(job)
+
+    values = statements[0].compile().params
+    assert values["status"] == "failed"
+    assert "smtp read" in values["last_error"]
@@ -0,0 +1,50 @@
+"""A principal loaded before its user changed is not cached over the invalidation."""
+import pytest
+
+from app.core import principal as principal_module
+from app.core.principal import PrincipalCache, load_principal
+from app.models.user import User
+from app.services.broker import InMemoryBroker
+
+
+class RacingSession:
+    """Returns the user as read before `changed` runs, as if the admin change committed mid-load."""
+
+    def __init__(self, cache: PrincipalCache, user: User):
+        self.cache = cache
+        self.user = user
+
+    async def get(self, model, user_id):
+        await self.cache.changed(user_id)
+        return self.user
+
+
+def _user(is_admin: bool) -> User:
+    return User(id=7, email="u@uni.edu", hashed_password="x", is_active=True, is_admin=is_admin, is_verified=True)
+
+
+@pytest.mark.asyncio
+async def test_load_racing_invalidation_is_not_cached(monkeypatch):
+    cache = PrincipalCache(InMemoryBroker(), ttl_seconds=60, max_size=100)
+    await cache.start()
+    monkeypatch.setattr(principal_module, "principal_cache", cache)
+
+    stale = await load_principal(RacingSession(cache, _user(is_admin=True)), 7)
+    assert stale.is_admin  # the caller gets what it read...
+    assert cache.get(7) is None  # ...but the next request reloads
+
+    class Session:
+        async def get(self, model, user_id):
+            return _user(is_admin=False)
+
+    assert not (await load_principal(Session(), 7)).is_admin
+    assert cache.get(7) is not None
+
+
+def test_generation_trim_starts_new_epoch():
+    cache = PrincipalCache(InMemoryBroker(), ttl_seconds=60, max_size=2)
+    before = cache.generation(1)
+    cache.invalidate(2)
+    cache.invalidate(3)
+    cache.invalidate(4)  # trims, so user 1's generation token no longer matches either
+    assert cache.generation(1) != before